@@ -0,0 +1,249 @@
+"""Offline benchmark of playlist resolution, download, transcode and merge.
+
+YouTube is replaced by a local HTTP server that serves generated MP3 files and by a fake
+extractor that resolves synthetic playlists, so runs need no network and are repeatable.
+With ``--engine yt-dlp`` downloads go through yt-dlp's real HTTP downloader against the
+local server instead of the fake extractor. When ffmpeg is not installed the transcode
+stage is skipped, and only MP3 outputs are merged, with the built-in MP3 concatenator.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'src'))
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, no padding: 417-byte frames of silence.
+MP3_FRAME_HEADER = bytes([0xFF, 0xFB, 0x90, 0x64])
+MP3_FRAME_SIZE = 417
+MP3_FRAMES_PER_SECOND = 44100 / 1152
+
+PLAYLIST_PREFIX = 'BENCH'
+WATCH_URL = re.compile(r'watch\?v=(?P<id>[\w-]+)')
+PLAYLIST_URL = re.compile(r'list=(?P<id>[\w-]+)')
+
+def make_mp3(seconds):
+    """Return a valid MP3 stream of ``seconds`` of silence."""
+    frame = MP3_FRAME_HEADER + bytes(MP3_FRAME_SIZE - len(MP3_FRAME_HEADER))
+    return frame * max(1, round(seconds * MP3_FRAMES_PER_SECOND))
+
+def playlist_id_for(tracks):
+    return f"{PLAYLIST_PREFIX}-{tracks}"
+
+def video_id_for(index):
+    return f"vid{index:07d}"
+
+class AudioServer:
+    """Serves the same generated MP3 under ``/<video_id>.mp3`` on a local port."""
+
+    def __init__(self, payload):
+        class Handler(BaseHTTPRequestHandler):
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header('Content-Type', 'audio/mpeg')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+
+            def do_GET(self):
+                self.do_HEAD()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="audio-server", daemon=True)
+
+    def url(self, video_id):
+        return f"http://127.0.0.1:{self.server.server_port}/{video_id}.mp3"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+class FakeYoutubeDL:
+    """Stand-in for YoutubeDL that resolves synthetic playlists and downloads from an AudioServer."""
+
+    def __init__(self, ydl_opts, server, page_size, page_latency):
+        self.ydl_opts = ydl_opts
+        self.server = server
+        self.page_size = page_size
+        self.page_latency = page_latency
+
+    def _entries(self, tracks):
+        for index in range(tracks):
+            if index % self.page_size == 0 and self.page_latency:
+                time.sleep(self.page_latency)
+            yield {'id': video_id_for(index), 'title': f"Track {index}", 'uploader': "Benchmark"}
+
+    def extract_info(self, url, download=True, process=True, ie_key=None):
+        match = PLAYLIST_URL.search(url)
+        if match:
+            tracks = int(match.group('id').rsplit('-', 1)[1])
+            return {'_type': 'playlist', 'title': f"Benchmark {tracks}", 'entries': self._entries(tracks)}
+
+        video_id = WATCH_URL.search(url).group('id')
+        info = {'id': video_id, 'ext': 'mp3', 'acodec': 'mp3'}
+        if download:
+            path = self.ydl_opts['outtmpl'] % info
+            with urllib.request.urlopen(self.server.url(video_id)) as response, open(path, 'wb') as f:
+                shutil.copyfileobj(response, f)
+            info['requested_downloads'] = [{'filepath': path}]
+        return info
+
+    def close(self):
+        pass
+
+def make_factory(engine, server, page_size, page_latency):
+    """Return a session factory: the fake extractor, or yt-dlp downloading from the local server."""
+    from yt_dlp import YoutubeDL
+
+    class LocalYoutubeDL(YoutubeDL):
+        def extract_info(self, url, *args, **kwargs):
+            match = WATCH_URL.search(url)
+            if match:
+                url = server.url(match.group('id'))
+            return super().extract_info(url, *args, **kwargs)
+
+    def factory(ydl_opts):
+        if engine == 'yt-dlp' and 'outtmpl' in ydl_opts:
+            return LocalYoutubeDL(ydl_opts)
+        return FakeYoutubeDL(ydl_opts, server, page_size, page_latency)
+
+    return factory
+
+def download_only(videos, download_dir, workers, audio_format):
+    """Download every track without transcoding, for machines without ffmpeg."""
+    from backend.downloader import _download_source, get_download_pool
+    from tools.metrics import STATUS_FAILED, file_size, measure
+
+    os.makedirs(download_dir, exist_ok=True)
+    pool = get_download_pool(download_dir, audio_format, workers)
+
+    def download(video):
+        with measure('download', video_id=video[2]) as sample:
+            source_path, _info, _error = _download_source(pool, video)
+            if source_path is None:
+                sample['status'] = STATUS_FAILED
+            sample['bytes'] = file_size(source_path)
+        return source_path
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return [path for path in executor.map(download, videos) if path]
+
+def run_size(tracks, args, has_ffmpeg):
+    from backend.downloader import download_videos, merge_files
+    from backend.youtube_service import get_playlist
+    from tools.metrics import job_metrics
+
+    result = {'tracks': tracks}
+    with job_metrics(f"benchmark {tracks} tracks") as metrics:
+        started = time.perf_counter()
+        playlist_name, videos = get_playlist(playlist_id_for(tracks), refresh=True)
+        result['resolve_s'] = round(time.perf_counter() - started, 3)
+        if not videos:
+            raise RuntimeError(f"Resolving the synthetic playlist of {tracks} tracks failed.")
+
+        started = time.perf_counter()
+        if has_ffmpeg:
+            paths = download_videos(videos, download_dir='./data/downloads', max_workers=args.workers, use_cache=False, audio_format=args.audio_format)
+        else:
+            paths = download_only(videos, './data/downloads', args.workers, args.audio_format)
+        result['pipeline_s'] = round(time.perf_counter() - started, 3)
+        result['processed'] = len(paths)
+
+        if has_ffmpeg or args.output_format == 'mp3':
+            started = time.perf_counter()
+            output = merge_files(playlist_name, paths, output_format=args.output_format)
+            result['merge_s'] = round(time.perf_counter() - started, 3)
+            if output:
+                os.remove(output)
+        else:
+            for path in paths:
+                os.remove(path)
+
+    summary = metrics.summary()
+    result['stages'] = summary['stages']
+    result['tracks_per_s'] = round(len(paths) / result['pipeline_s'], 1) if result['pipeline_s'] else None
+    result['resolve_entries_per_s'] = round(tracks / result['resolve_s'], 1) if result['resolve_s'] else None
+    return result
+
+def print_result(result):
+    print(f"{result['tracks']} tracks:")
+    print(f"  resolve   {result['resolve_s'] * 1000:9.1f} ms  ({result['resolve_entries_per_s']} entries/s)")
+    print(f"  pipeline  {result['pipeline_s'] * 1000:9.1f} ms  ({result['processed']} processed, {result['tracks_per_s']} tracks/s)")
+    if 'merge_s' in result:
+        print(f"  merge     {result['merge_s'] * 1000:9.1f} ms")
+    for stage in ('download', 'transcode', 'normalize', 'merge', 'cleanup'):
+        stats = result['stages'].get(stage)
+        if stats:
+            throughput = f", {stats['mb_per_s']} MB/s per worker" if stats['mb_per_s'] else ""
+            print(
+                f"    {stage:<10} n={stats['count']:<5} failed={stats['failed']:<3} "
+                f"p50 {stats['p50_ms']} ms, p90 {stats['p90_ms']} ms, p99 {stats['p99_ms']} ms{throughput}"
+            )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the processing pipeline offline against local stand-ins.")
+    parser.add_argument('--tracks', type=int, nargs='+', default=[10, 100, 1000], help="Playlist sizes to run (default: 10 100 1000).")
+    parser.add_argument('--track-seconds', type=float, default=10, help="Length of each generated track (default: 10).")
+    parser.add_argument('--engine', choices=['fake', 'yt-dlp'], default='fake', help="Download through the fake extractor or through yt-dlp.")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--audio-format', choices=['mp3', 'native'], default='mp3')
+    parser.add_argument('--output-format', choices=['mp3', 'opus', 'm4a'], default='mp3')
+    parser.add_argument('--page-size', type=int, default=100, help="Playlist entries per simulated page (default: 100).")
+    parser.add_argument('--page-latency-ms', type=float, default=0, help="Simulated delay before each playlist page.")
+    parser.add_argument('--keep-workdir', action='store_true', help="Keep the temporary directory with logs and metrics.")
+    parser.add_argument('--output', help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    output_path = os.path.abspath(args.output) if args.output else None
+    workdir = tempfile.mkdtemp(prefix='ytmt-bench-')
+    os.chdir(workdir)
+
+    from backend.session_pool import close_session_pools, set_session_factory
+    from tools.logger import LoggerSetup
+
+    LoggerSetup.initialize_logger('latest.log', 'logs', redirect_output=False)
+    has_ffmpeg = shutil.which('ffmpeg') is not None
+    if not has_ffmpeg:
+        print("ffmpeg not found: transcodes are skipped and only MP3 outputs are merged.")
+
+    results = {'engine': args.engine, 'workers': args.workers, 'track_seconds': args.track_seconds, 'ffmpeg': has_ffmpeg, 'runs': []}
+    try:
+        with AudioServer(make_mp3(args.track_seconds)) as server:
+            set_session_factory(make_factory(args.engine, server, args.page_size, args.page_latency_ms / 1000))
+            for tracks in args.tracks:
+                result = run_size(tracks, args, has_ffmpeg)
+                print_result(result)
+                results['runs'].append(result)
+    finally:
+        close_session_pools()
+        LoggerSetup.shutdown()
+        os.chdir(REPO_ROOT)
+        if args.keep_workdir:
+            print(f"Logs and metrics kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
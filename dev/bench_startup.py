@@ -0,0 +1,101 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+STARTUP_BENCHMARK_ENV = 'YTMT_STARTUP_BENCHMARK'
+EXE_SUFFIX = '.exe' if os.name == 'nt' else ''
+DEFAULT_BINARY = os.path.join(REPO_ROOT, 'ytmtools.dist', 'main.dist', f'ytmtools{EXE_SUFFIX}')
+
+def measure_once(command, timeout):
+    """Start the app once and return the seconds until its first frame, or None on failure."""
+    fd, report_path = tempfile.mkstemp(prefix='ytmt-startup-', suffix='.jsonl')
+    os.close(fd)
+    env = dict(os.environ, **{STARTUP_BENCHMARK_ENV: report_path})
+    try:
+        started = time.time()
+        try:
+            subprocess.run(command, cwd=REPO_ROOT, env=env, timeout=timeout, check=False,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except subprocess.TimeoutExpired:
+            print(f"Timed out after {timeout}s: {' '.join(command)}")
+            return None
+        with open(report_path, 'r', encoding='utf-8') as f:
+            lines = [line for line in f if line.strip()]
+        if not lines:
+            print(f"No first frame was reported by: {' '.join(command)}")
+            return None
+        return json.loads(lines[0])['first_frame'] - started
+    finally:
+        os.remove(report_path)
+
+def measure(name, command, runs, timeout):
+    print(f"Measuring {name}: {' '.join(command)}")
+    samples = []
+    for run in range(1, runs + 1):
+        seconds = measure_once(command, timeout)
+        if seconds is None:
+            continue
+        samples.append(seconds)
+        print(f"  run {run}: {seconds * 1000:.0f} ms")
+    if not samples:
+        return None
+    return {
+        'command': command,
+        'runs': len(samples),
+        'median_ms': round(statistics.median(samples) * 1000, 1),
+        'min_ms': round(min(samples) * 1000, 1),
+        'max_ms': round(max(samples) * 1000, 1),
+    }
+
+def check_regressions(results, budget_ms, baseline, tolerance):
+    failures = []
+    for name, result in results.items():
+        if result is None:
+            failures.append(f"{name}: no successful runs")
+            continue
+        if budget_ms is not None and result['median_ms'] > budget_ms:
+            failures.append(f"{name}: median {result['median_ms']} ms exceeds the {budget_ms} ms budget")
+        previous = (baseline or {}).get(name)
+        if previous and result['median_ms'] > previous['median_ms'] * (1 + tolerance):
+            failures.append(f"{name}: median {result['median_ms']} ms regressed from {previous['median_ms']} ms")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time-to-first-frame of the GUI.")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--binary', default=DEFAULT_BINARY, help="Nuitka build to measure; skipped if it does not exist.")
+    parser.add_argument('--budget-ms', type=float, help="Fail if a median exceeds this many milliseconds.")
+    parser.add_argument('--baseline', help="Results file of an earlier run to compare against.")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed slowdown against the baseline (default: 0.2).")
+    parser.add_argument('--output', help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    results = {'source': measure('source', [sys.executable, os.path.join('src', 'main.py')], args.runs, args.timeout)}
+    if os.path.exists(args.binary):
+        results['nuitka'] = measure('nuitka', [args.binary], args.runs, args.timeout)
+    else:
+        print(f"Nuitka build not found at {args.binary}; run dev/build_nuitka.py first to include it.")
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    failures = check_regressions(results, args.budget_ms, baseline, args.tolerance)
+    for failure in failures:
+        print(f"Startup regression: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
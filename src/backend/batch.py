@@ -0,0 +1,156 @@
+import hashlib
+import os
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.downloader import DEFAULT_AUDIO_FORMAT, DEFAULT_MAX_WORKERS, DEFAULT_OUTPUT_FORMAT, download_videos, merge_volumes
+from backend.file_handler import write_to_file
+from backend.job_journal import get_job_journal
+from backend.playlist_sync import save_snapshot
+from backend.track_store import get_track_store
+from backend.youtube_service import get_playlist
+from tools.logger import get_logger
+
+logger = get_logger()
+
+DEFAULT_RESOLVE_WORKERS = 4
+
+class BatchPlaylist(namedtuple('BatchPlaylist', ['playlist_id', 'name', 'videos'])):
+    __slots__ = ()
+
+    @property
+    def video_ids(self):
+        return list(dict.fromkeys(video[2] for video in self.videos))
+
+class BatchPlan:
+    """The resolved playlists of a batch run and the union of their tracks."""
+
+    def __init__(self, playlists, failed=()):
+        self.playlists = list(playlists)
+        self.failed = list(failed)
+
+    def drop(self, playlist_id):
+        """Leave a playlist out of the run, for example because it did not change."""
+        self.playlists = [playlist for playlist in self.playlists if playlist.playlist_id != playlist_id]
+
+    @property
+    def entries(self):
+        return sum(len(playlist.videos) for playlist in self.playlists)
+
+    @property
+    def unique_videos(self):
+        """Every track of the batch once, in the order it first appears."""
+        videos = {}
+        for playlist in self.playlists:
+            for video in playlist.videos:
+                videos.setdefault(video[2], video)
+        return list(videos.values())
+
+    @property
+    def job_key(self):
+        """Journal key of the batch, the same for every run over the same playlists."""
+        ids = ','.join(sorted(playlist.playlist_id for playlist in self.playlists))
+        return f"batch:{hashlib.sha1(ids.encode('utf-8')).hexdigest()[:16]}"
+
+def resolve_batch(playlist_ids, refresh=False, max_workers=DEFAULT_RESOLVE_WORKERS, cancel_event=None):
+    """Resolve the playlists of a batch concurrently and return a ``BatchPlan``."""
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(playlist_ids))), thread_name_prefix="resolver") as executor:
+        results = list(executor.map(lambda playlist_id: get_playlist(playlist_id, refresh=refresh, cancel_event=cancel_event), playlist_ids))
+
+    playlists = []
+    failed = []
+    for playlist_id, (name, videos) in zip(playlist_ids, results):
+        if not name or not videos:
+            logger.error(f"Failed to resolve playlist {playlist_id} for the batch.")
+            failed.append(playlist_id)
+        else:
+            playlists.append(BatchPlaylist(playlist_id, name, videos))
+    plan = BatchPlan(playlists, failed)
+    unique = len(plan.unique_videos)
+    if plan.entries:
+        logger.info(
+            f"Batch of {len(playlists)} playlists: {plan.entries} entries, {unique} unique tracks "
+            f"({100 * (plan.entries - unique) / plan.entries:.0f}% shared)."
+        )
+    return plan
+
+def _release(paths, track_store):
+    """Delete the tracks the track store does not own and unpin the others."""
+    for path in paths:
+        if not track_store.owns(path) and os.path.exists(path):
+            os.remove(path)
+    track_store.release(paths)
+
+def run_batch(plan, download_dir="./data/downloads", output_dir="./data/output", max_workers=DEFAULT_MAX_WORKERS, progress_callback=None, cancel_event=None, use_cache=True, audio_format=DEFAULT_AUDIO_FORMAT, output_format=DEFAULT_OUTPUT_FORMAT, merge_callback=None, failures=None, **merge_options):
+    """Export, download and merge every playlist of ``plan``, processing each unique track once.
+
+    The union of the playlists' tracks goes through a single ``download_videos`` run, then
+    each playlist is merged from its share of the tracks. A track is deleted or released
+    from the track store only after the last playlist that contains it has been merged.
+    ``merge_callback(playlist_id, output_paths)`` is called after each merge and
+    ``merge_options`` are passed on to ``merge_volumes``. Tracks that could not be processed
+    are appended to ``failures`` as by ``download_videos``. Returns
+    ``{playlist_id: output_paths}`` for the playlists merged before ``cancel_event`` was
+    set, if it was; a canceled run keeps its remaining tracks for a resumed batch.
+    """
+    for playlist in plan.playlists:
+        write_to_file(playlist.videos, playlist.name)
+
+    paths = {}
+
+    def track_ready(video_id, path):
+        paths[video_id] = path
+
+    journal = get_job_journal()
+    job_id = journal.start_job(plan.job_key, f"Batch of {len(plan.playlists)} playlists", (), audio_format, output_format)
+    download_videos(
+        plan.unique_videos,
+        download_dir=download_dir,
+        max_workers=max_workers,
+        progress_callback=progress_callback,
+        cancel_event=cancel_event,
+        use_cache=use_cache,
+        audio_format=audio_format,
+        journal=journal,
+        job_id=job_id,
+        track_callback=track_ready,
+        failures=failures,
+    )
+
+    track_store = get_track_store()
+    remaining = Counter(video_id for playlist in plan.playlists for video_id in playlist.video_ids)
+    results = {}
+    for playlist in plan.playlists:
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        files = [paths[video[2]] for video in playlist.videos if paths.get(video[2])]
+        output_paths = []
+        if files:
+            output_paths = merge_volumes(
+                playlist.name, files, download_dir, output_dir, output_format,
+                playlist_id=playlist.playlist_id, keep_tracks=True, cancel_event=cancel_event, **merge_options,
+            )
+            if cancel_event is not None and cancel_event.is_set():
+                break
+        if output_paths:
+            save_snapshot(playlist.playlist_id, playlist.name, playlist.videos)
+        else:
+            logger.error(f"Merging playlist '{playlist.name}' failed.")
+        results[playlist.playlist_id] = output_paths
+        if merge_callback is not None:
+            merge_callback(playlist.playlist_id, output_paths)
+
+        done = []
+        for video_id in playlist.video_ids:
+            remaining[video_id] -= 1
+            if remaining[video_id] == 0 and paths.get(video_id):
+                done.append(paths[video_id])
+        _release(done, track_store)
+
+    if cancel_event is not None and cancel_event.is_set():
+        logger.info("Batch canceled.")
+        track_store.release([path for video_id, path in paths.items() if path and remaining[video_id] > 0])
+        return results
+    if all(results.values()):
+        journal.finish_job(job_id)
+    return results
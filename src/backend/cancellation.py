@@ -0,0 +1,64 @@
+import os
+import subprocess
+import threading
+from contextlib import contextmanager
+
+from tools.logger import get_logger
+
+logger = get_logger()
+
+# Seconds between checks of the cancel event while a subprocess runs.
+POLL_INTERVAL = 0.1
+
+class OperationCanceled(Exception):
+    """Raised inside a job's worker threads to stop the current step once the job is canceled."""
+
+def is_canceled(cancel_event):
+    return cancel_event is not None and cancel_event.is_set()
+
+# The cancel event of the job that the current thread downloads for, read by the progress hook.
+_current = threading.local()
+
+@contextmanager
+def cancel_downloads(cancel_event):
+    """Let ``download_progress_hook`` stop yt-dlp downloads in this thread once ``cancel_event`` is set."""
+    previous = getattr(_current, 'cancel_event', None)
+    _current.cancel_event = cancel_event
+    try:
+        yield
+    finally:
+        _current.cancel_event = previous
+
+def download_progress_hook(status):
+    """yt-dlp progress hook that aborts the running download of a canceled job.
+
+    yt-dlp calls it for every block it receives, in the thread that downloads, so a
+    download stops within one block of ``cancel_event`` being set.
+    """
+    if is_canceled(getattr(_current, 'cancel_event', None)):
+        raise OperationCanceled("Download canceled.")
+
+def _creationflags():
+    return subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+
+def run_process(args, cancel_event=None, output_path=None):
+    """Run ``args`` to completion, killing the process as soon as ``cancel_event`` is set.
+
+    Raises ``subprocess.CalledProcessError`` if the process fails and ``OperationCanceled``
+    if it was canceled, after deleting its partial ``output_path``.
+    """
+    process = subprocess.Popen(args, stdin=subprocess.DEVNULL, creationflags=_creationflags())
+    while True:
+        try:
+            returncode = process.wait(timeout=POLL_INTERVAL if cancel_event is not None else None)
+            break
+        except subprocess.TimeoutExpired:
+            if cancel_event.is_set():
+                process.kill()
+                process.wait()
+                if output_path and os.path.exists(output_path):
+                    os.remove(output_path)
+                logger.debug(f"Killed {args[0]} (pid {process.pid}) after cancellation.")
+                raise OperationCanceled(f"{args[0]} canceled.") from None
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, args)
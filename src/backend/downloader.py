@@ -1,85 +1,614 @@
+import glob
 import os
 import subprocess
-import uuid
-
-from yt_dlp import YoutubeDL
-from yt_dlp.utils import DownloadError
+import tempfile
+import threading
+import time
+from collections import Counter, namedtuple
+from contextlib import nullcontext
+from concurrent.futures import Future, ThreadPoolExecutor
 
+from backend.cancellation import OperationCanceled, cancel_downloads, download_progress_hook, is_canceled, run_process
+from backend.job_journal import STATE_DOWNLOADED, STATE_FAILED, STATE_TRANSCODED
+from backend.library_index import KIND_OUTPUT, KIND_TRACK, get_library_index, probe_duration
+from backend.mp3_concat import Mp3FormatError, concat_mp3
+from backend.rate_limit import ERROR_PERMANENT, AdaptiveLimiter, backoff_delay, classify_error
+from backend.session_pool import get_session_pool
+from backend.track_store import get_track_store
 from tools.logger import get_logger
+from tools.metrics import STATUS_CANCELED, STATUS_FAILED, file_size, measure
 
 logger = get_logger()
 
-def download_videos(videos, download_dir="./data/downloads"):
-    os.makedirs(download_dir, exist_ok=True)
-    
-    ydl_opts = {
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_TRANSCODE_WORKERS = os.cpu_count() or 1
+
+# Immediate retries of a throttled or transient download failure. Tracks that still fail
+# are retried once more after every other track is done.
+DEFAULT_RETRIES = 2
+
+# Playlists with more tracks than this are merged in parallel chunks.
+DEFAULT_MERGE_CHUNK_SIZE = 200
+
+DEFAULT_AUDIO_FORMAT = 'mp3'
+DEFAULT_OUTPUT_FORMAT = 'mp3'
+
+# 'mp3' transcodes every track to MP3 after downloading. 'native' keeps the downloaded
+# audio stream (opus or m4a) and leaves any encoding to merge_files.
+AUDIO_FORMATS = {
+    'mp3': {
         'format': 'bestaudio/best',
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '320',
-        }]
+        'codec': 'mp3',
+    },
+    'native': {
+        'format': 'bestaudio[acodec=opus]/bestaudio/best',
+        'codec': None,
+    },
+}
+
+# Encoder arguments for each supported container, used to transcode tracks and whenever
+# the merged tracks are not already in the output container's codec.
+AUDIO_ENCODERS = {
+    'mp3': ['-c:a', 'libmp3lame', '-b:a', '320k'],
+    'opus': ['-c:a', 'libopus', '-b:a', '160k'],
+    'm4a': ['-c:a', 'aac', '-b:a', '256k'],
+}
+
+# Containers used when a track keeps its native codec, keyed by yt-dlp's acodec prefix.
+NATIVE_CONTAINERS = {
+    'opus': 'opus',
+    'mp4a': 'm4a',
+    'vorbis': 'ogg',
+    'mp3': 'mp3',
+}
+
+# Native containers guessed from the extension of a raw download.
+SOURCE_CONTAINERS = {
+    'webm': 'opus',
+    'm4a': 'm4a',
+    'mp4': 'm4a',
+    'mp3': 'mp3',
+    'ogg': 'ogg',
+}
+
+DownloadFailure = namedtuple('DownloadFailure', ['video', 'reason'])
+
+# Result of a download that failed for now and waits for the deferred retry pass.
+DEFERRED = object()
+
+def get_download_pool(download_dir, audio_format=DEFAULT_AUDIO_FORMAT, max_workers=DEFAULT_MAX_WORKERS):
+    """Return the YoutubeDL session pool that downloads raw ``audio_format`` streams into ``download_dir``."""
+    download_dir = os.path.abspath(download_dir)
+    ydl_opts = {
+        'format': AUDIO_FORMATS[audio_format]['format'],
+        'outtmpl': os.path.join(download_dir, "%(id)s.source.%(ext)s"),
+        'progress_hooks': [download_progress_hook],
+        # Progress and errors go to the log; stdout carries the CLI's JSON lines.
+        'quiet': True,
+        'no_warnings': True,
+        'noprogress': True,
     }
-    
-    downloaded_files = {}
-    
-    for title, artist, video_id in videos:
+    return get_session_pool(f"download:{audio_format}:{download_dir}", ydl_opts, max_size=max_workers)
+
+def output_filename(playlist_name, output_format=DEFAULT_OUTPUT_FORMAT):
+    """Return the file name merge_files writes for a playlist."""
+    return f"{playlist_name}.{output_format}"
+
+def _file_format(path):
+    return os.path.splitext(path)[1].lstrip('.').lower()
+
+def _downloaded_filepath(info):
+    for download in (info or {}).get('requested_downloads') or []:
+        if download.get('filepath'):
+            return download['filepath']
+    return None
+
+def _native_container(info, source_path):
+    acodec = (info or {}).get('acodec') or ''
+    for prefix, container in NATIVE_CONTAINERS.items():
+        if acodec.startswith(prefix):
+            return container
+    # Sources resumed from the job journal come without their info dict.
+    return SOURCE_CONTAINERS.get(_file_format(source_path), 'mka')
+
+def _run_ffmpeg(args, cancel_event=None):
+    """Run ffmpeg with ``args``, whose last one is the output; setting ``cancel_event`` kills it and deletes the output."""
+    run_process(['ffmpeg', '-y', '-loglevel', 'error', *args], cancel_event, output_path=args[-1])
+
+def _fetch_source(pool, video, cancel_event=None):
+    """Download the raw audio stream of a track once and return its path and info dict.
+
+    Raises ``OperationCanceled`` from within yt-dlp when ``cancel_event`` is set mid-download.
+    """
+    video_url = f"https://www.youtube.com/watch?v={video[2]}"
+    with cancel_downloads(cancel_event), pool.session() as ydl:
+        info = ydl.extract_info(video_url, download=True)
+
+    source_path = _downloaded_filepath(info)
+    if not source_path or not os.path.exists(source_path):
+        raise OSError("the download produced no file")
+    return os.path.abspath(source_path), info
+
+def _remove_partial_source(pool, video_id):
+    """Delete what an interrupted download of ``video_id`` left behind (.part and .ytdl files)."""
+    directory = os.path.dirname(pool.ydl_opts['outtmpl'])
+    for path in glob.glob(os.path.join(glob.escape(directory), f"{glob.escape(video_id)}.source.*")):
         try:
-            video_url = f"https://www.youtube.com/watch?v={video_id}"
-            unique_id = str(uuid.uuid4())
-            ydl_opts['outtmpl'] = os.path.join(download_dir, f"{unique_id}.%(ext)s")
-            
-            with YoutubeDL(ydl_opts) as ydl:
-                ydl.download([video_url])
-            
-            downloaded_filename = f"{unique_id}.mp3"
-            downloaded_files[downloaded_filename] = title
-            logger.info(f"Downloaded: {title} by {artist} as {downloaded_filename}")
-        
-        except DownloadError as e:
-            logger.error(f"Download Error for {title} by {artist}: {e}")
-        except Exception as e:
-            logger.error(f"Error downloading {title} by {artist}: {e}")
-    
-    return downloaded_files
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"Failed to remove partial download {path}: {e}")
+
+def _download_source(pool, video, cancel_event=None, limiter=None, retries=DEFAULT_RETRIES):
+    """Download the raw audio stream of a track and return its path, info dict and last error.
+
+    Throttled and transient failures are retried up to ``retries`` times with jittered
+    exponential backoff, and reported to ``limiter``, which also bounds how many downloads
+    run at once. On failure the path and info are None and the error is returned; all
+    three are None when ``cancel_event`` stopped the download, whose partial files are
+    then deleted.
+    """
+    title, artist, video_id = video
+    error = None
+    for attempt in range(retries + 1):
+        if cancel_event is not None and cancel_event.is_set():
+            return None, None, None
+        with limiter.slot(cancel_event) if limiter is not None else nullcontext(True) as acquired:
+            if not acquired:
+                return None, None, None
+            started = time.perf_counter()
+            try:
+                source_path, info = _fetch_source(pool, video, cancel_event)
+            except OperationCanceled:
+                logger.info(f"Download of {title} by {artist} canceled.")
+                _remove_partial_source(pool, video_id)
+                return None, None, None
+            except Exception as e:
+                error = e
+            else:
+                if limiter is not None:
+                    limiter.success(time.perf_counter() - started, file_size(source_path))
+                logger.info(f"Downloaded: {title} by {artist} as {source_path}")
+                return source_path, info, None
+
+        kind = classify_error(error)
+        if limiter is not None:
+            limiter.failure(kind)
+        if kind == ERROR_PERMANENT:
+            logger.error(f"Download Error for {title} by {artist}: {error}")
+            break
+        if attempt == retries:
+            logger.warning(f"Download of {title} by {artist} still failing after {retries + 1} attempts: {error}")
+            break
+        delay = backoff_delay(attempt)
+        logger.warning(f"Download of {title} by {artist} failed ({kind}), retrying in {delay:.1f} s: {error}")
+        if cancel_event is not None:
+            cancel_event.wait(delay)
+        else:
+            time.sleep(delay)
+    return None, None, error
+
+def _transcode_track(video, source_path, info, download_dir, audio_format, track_store=None, cancel_event=None):
+    """Convert a raw download into its final audio file and return its path, or None on failure.
+
+    Setting ``cancel_event`` stops ffmpeg and deletes the partial file; the raw download is
+    then kept so that a resumed job can transcode it.
+    """
+    title, artist, video_id = video
+    codec = AUDIO_FORMATS[audio_format]['codec']
+    if codec:
+        container = codec
+        codec_args = AUDIO_ENCODERS[codec]
+    else:
+        container = _native_container(info, source_path)
+        codec_args = ['-c:a', 'copy']
+    track_path = os.path.abspath(os.path.join(download_dir, f"{video_id}.{container}"))
+
+    keep_source = False
+    try:
+        _run_ffmpeg(['-i', source_path, '-vn', *codec_args, track_path], cancel_event)
+        if track_store is not None:
+            track_path = track_store.put(video_id, AUDIO_FORMATS[audio_format], track_path)
+            get_library_index().record(track_path, KIND_TRACK, duration=(info or {}).get('duration'))
+        logger.info(f"Processed: {title} by {artist} as {track_path}")
+        return track_path
+    except OperationCanceled:
+        logger.info(f"Processing of {title} by {artist} canceled.")
+        keep_source = True
+    except subprocess.CalledProcessError as e:
+        logger.error(f"FFmpeg failed for {title} by {artist}: {e}")
+    except Exception as e:
+        logger.error(f"Error processing {title} by {artist}: {e}")
+    finally:
+        if not keep_source and os.path.exists(source_path):
+            os.remove(source_path)
+    return None
+
+def download_videos(videos, download_dir="./data/downloads", max_workers=DEFAULT_MAX_WORKERS, progress_callback=None, cancel_event=None, use_cache=True, audio_format=DEFAULT_AUDIO_FORMAT, transcode_workers=DEFAULT_TRANSCODE_WORKERS, max_pending=None, journal=None, job_id=None, track_callback=None, retries=DEFAULT_RETRIES, failures=None):
+    """Download and process the audio of each video and return the paths in playlist order.
+
+    Up to ``max_workers`` threads download raw streams for ``transcode_workers`` ffmpeg
+    threads; at most ``max_pending`` finished downloads wait for a transcoder. ``videos``
+    may be the lazy entries of ``stream_playlist``, so downloads start while the playlist
+    is still being read. Tracks come from the track store with ``use_cache`` and are
+    resumed from ``journal`` for ``job_id``. ``progress_callback(completed, total)`` and
+    ``track_callback(video_id, path)`` are called from the worker threads; ``path`` is None
+    for failed tracks. Setting ``cancel_event`` stops running downloads and ffmpeg
+    processes. An ``AdaptiveLimiter`` adjusts concurrency; throttled and transient errors
+    are retried ``retries`` times, then once more at the end, and the tracks that still
+    fail are appended to ``failures`` as ``DownloadFailure`` entries.
+    """
+    os.makedirs(download_dir, exist_ok=True)
+
+    total = 0
+    completed = 0
+    progress_lock = threading.Lock()
 
-def merge_files(playlist_name, downloaded_files, download_dir="./data/downloads", output_dir="./data/output"):
+    workers = max(1, max_workers)
+    transcode_workers = max(1, transcode_workers)
+    pending_slots = threading.BoundedSemaphore(max_pending or 2 * transcode_workers)
+    pool = get_download_pool(download_dir, audio_format, max_workers)
+    limiter = AdaptiveLimiter(workers)
+    deferred = []
+    failed = {}
+    track_store = get_track_store() if use_cache else None
+    resumed = journal.track_states(job_id) if journal is not None else {}
+
+    def record(video_id, state, path=None):
+        if journal is not None:
+            journal.mark(job_id, video_id, state, path)
+
+    def finish(video_id, path):
+        nonlocal completed
+        if track_callback is not None:
+            track_callback(video_id, path)
+        with progress_lock:
+            completed += 1
+            if progress_callback is not None:
+                progress_callback(completed, total)
+        return path
+
+    def transcode(video, source_path, info):
+        try:
+            with measure('transcode', video_id=video[2]) as sample:
+                path = _transcode_track(video, source_path, info, download_dir, audio_format, track_store, cancel_event)
+                if path is None and is_canceled(cancel_event):
+                    sample['status'] = STATUS_CANCELED
+                    return finish(video[2], None)
+                if path is None:
+                    sample['status'] = STATUS_FAILED
+                    failed[video[2]] = DownloadFailure(video, "processing failed")
+                sample['bytes'] = file_size(path)
+            record(video[2], STATE_TRANSCODED if path else STATE_FAILED, path)
+            return finish(video[2], path)
+        finally:
+            pending_slots.release()
+
+    def download(video, final=False):
+        title, artist, video_id = video
+        if track_store is not None:
+            cached_path = track_store.get(video_id, AUDIO_FORMATS[audio_format])
+            if cached_path:
+                logger.info(f"Using cached track for {title} by {artist}: {cached_path}")
+                record(video_id, STATE_TRANSCODED, cached_path)
+                return finish(video_id, cached_path)
+
+        state, resumed_path = resumed.get(video_id, (None, None))
+        if state == STATE_TRANSCODED and resumed_path and os.path.exists(resumed_path):
+            logger.info(f"Resuming with processed track for {title} by {artist}: {resumed_path}")
+            return finish(video_id, resumed_path)
+
+        if state == STATE_DOWNLOADED and resumed_path and os.path.exists(resumed_path):
+            logger.info(f"Resuming with downloaded source for {title} by {artist}: {resumed_path}")
+            pending_slots.acquire()
+            return transcoder.submit(transcode, video, resumed_path, None)
+
+        with measure('download', video_id=video_id, deferred=final) as sample:
+            source_path, info, error = _download_source(pool, video, cancel_event, limiter, retries)
+            if source_path is None:
+                sample['status'] = STATUS_CANCELED if error is None else STATUS_FAILED
+            sample['bytes'] = file_size(source_path)
+        if source_path is None:
+            if error is not None and not final and classify_error(error) != ERROR_PERMANENT:
+                deferred.append(video)
+                return DEFERRED
+            if error is not None:
+                record(video_id, STATE_FAILED)
+                failed[video_id] = DownloadFailure(video, str(error))
+            return finish(video_id, None)
+        record(video_id, STATE_DOWNLOADED, source_path)
+        pending_slots.acquire()
+        return transcoder.submit(transcode, video, source_path, info)
+
+    logger.info(f"Processing tracks with {workers} download and {transcode_workers} transcode workers.")
+    order = []
+    stages = {}
+    with measure('download_videos', workers=workers, transcode_workers=transcode_workers) as sample:
+        with ThreadPoolExecutor(max_workers=transcode_workers, thread_name_prefix="transcoder") as transcoder:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="downloader") as downloader:
+                for position, video in enumerate(videos):
+                    video_id = video[2]
+                    order.append(video_id)
+                    if video_id in stages:
+                        continue
+                    if journal is not None:
+                        journal.add_track(job_id, position, video)
+                    with progress_lock:
+                        total += 1
+                    stages[video_id] = downloader.submit(download, video)
+            stages = {video_id: stage.result() for video_id, stage in stages.items()}
+            if deferred and (cancel_event is None or not cancel_event.is_set()):
+                logger.info(f"Retrying {len(deferred)} deferred tracks.")
+                limiter.wait_for_pause(cancel_event)
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="downloader") as downloader:
+                    retried = {video[2]: downloader.submit(download, video, True) for video in deferred}
+                stages.update((video_id, stage.result()) for video_id, stage in retried.items())
+            paths = {video_id: stage.result() if isinstance(stage, Future) else stage for video_id, stage in stages.items()}
+            paths = {video_id: None if path is DEFERRED else path for video_id, path in paths.items()}
+        logger.info(f"Processed {total} tracks.")
+        report = [failed[video_id] for video_id in dict.fromkeys(order) if video_id in failed]
+        if report:
+            logger.warning(f"{len(report)} tracks failed:")
+            for failure in report:
+                title, artist, video_id = failure.video
+                logger.warning(f"  {title} by {artist} ({video_id}): {failure.reason}")
+        if failures is not None:
+            failures.extend(report)
+        sample.update(
+            tracks=total,
+            processed=sum(1 for path in paths.values() if path),
+            failed=sum(1 for path in paths.values() if not path),
+            bytes=sum(file_size(path) for path in paths.values()),
+        )
+
+    return [paths[video_id] for video_id in order if paths.get(video_id)]
+
+def _normalize_formats(paths, download_dir, cancel_event=None):
+    """Re-encode the tracks that are not in the most common format of ``paths``.
+
+    The concat demuxer needs every input in the same codec, so a playlist that mixes opus
+    and m4a tracks gets its minority tracks converted. Returns the new list of paths and the
+    temporary files that were created.
+    """
+    formats = Counter(_file_format(path) for path in paths)
+    target = next((fmt for fmt, _count in formats.most_common() if fmt in AUDIO_ENCODERS), DEFAULT_OUTPUT_FORMAT)
+    normalized = []
+    temporary = []
+    for path in paths:
+        if _file_format(path) == target:
+            normalized.append(path)
+            continue
+        converted = os.path.abspath(os.path.join(download_dir, f"{os.path.splitext(os.path.basename(path))[0]}.merge.{target}"))
+        logger.info(f"Converting {path} to {target} for merging.")
+        with measure('normalize', target=target) as sample:
+            _run_ffmpeg(['-i', path, '-vn', *AUDIO_ENCODERS[target], converted], cancel_event)
+            sample['bytes'] = file_size(converted)
+        normalized.append(converted)
+        temporary.append(converted)
+    return normalized, temporary
+
+def volume_filename(playlist_name, number, output_format=DEFAULT_OUTPUT_FORMAT):
+    """Return the file name of one volume of a playlist that was split by merge_volumes."""
+    return f"{playlist_name} - Vol. {number}.{output_format}"
+
+def existing_output(playlist_name, output_dir="./data/output", output_format=DEFAULT_OUTPUT_FORMAT):
+    """Return the merged output of a playlist, or its first volume, if one exists in ``output_dir``; else None."""
+    for name in (output_filename(playlist_name, output_format), volume_filename(playlist_name, 1, output_format)):
+        path = os.path.join(output_dir, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+def _write_concat_list(paths, directory):
+    """Write an ffmpeg concat list for ``paths`` to a new file in ``directory`` and return its path."""
+    fd, list_path = tempfile.mkstemp(prefix='concat-', suffix='.txt', dir=directory)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        for path in paths:
+            escaped = path.replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    return list_path
+
+def _concat(paths, output_path, codec_args, work_dir, cancel_event=None):
+    """Concatenate ``paths`` into ``output_path`` with ffmpeg, or frame by frame for an MP3 stream copy.
+
+    Returns the duration of the output in seconds when the frame copy measured it, else None.
+    """
+    if codec_args == ['-c', 'copy'] and all(_file_format(path) == 'mp3' for path in paths + [output_path]):
+        try:
+            return concat_mp3(paths, output_path)
+        except Mp3FormatError as e:
+            logger.info(f"Falling back to ffmpeg for merging: {e}")
+    list_path = _write_concat_list(paths, work_dir)
+    try:
+        _run_ffmpeg(['-f', 'concat', '-safe', '0', '-i', list_path, *codec_args, output_path], cancel_event)
+    finally:
+        os.remove(list_path)
+    return None
+
+class _MergeInputs:
+    """Tracks which merge inputs are still needed and deletes the ones that are not.
+
+    Per-track files that the track store does not own are deleted as soon as every chunk
+    that contains them has been merged, unless ``keep_tracks`` is set; ``temporary`` files
+    and intermediate chunk files are deleted once the next level has consumed them.
+    """
+
+    def __init__(self, paths, track_store, temporary=(), keep_tracks=False):
+        self.track_store = track_store
+        self.keep_tracks = keep_tracks
+        self.freed_bytes = 0
+        self._references = Counter(paths)
+        self._temporary = set(temporary)
+        self._lock = threading.Lock()
+
+    def add_temporary(self, path):
+        with self._lock:
+            self._temporary.add(path)
+            self._references[path] += 1
+
+    def consumed(self, paths):
+        removable = []
+        with self._lock:
+            for path in paths:
+                self._references[path] -= 1
+                if self._references[path] <= 0:
+                    del self._references[path]
+                    if path in self._temporary or not (self.keep_tracks or self.track_store.owns(path)):
+                        self._temporary.discard(path)
+                        removable.append(path)
+        for path in removable:
+            if os.path.exists(path):
+                size = file_size(path)
+                os.remove(path)
+                with self._lock:
+                    self.freed_bytes += size
+
+    def remove_temporary(self):
+        with self._lock:
+            temporary, self._temporary = self._temporary, set()
+        for path in temporary:
+            if os.path.exists(path):
+                os.remove(path)
+
+def _concat_chunked(paths, output_path, codec_args, work_dir, chunk_size, executor, inputs, cancel_event=None):
+    """Concatenate ``paths`` into ``output_path``, first in parallel chunks of ``chunk_size`` when there are more.
+
+    Chunks are stream-copied into intermediate files, which are combined level by level;
+    only the final concat applies ``codec_args``. Inputs are released through ``inputs``
+    as soon as the chunk that reads them is done. Returns the duration ``_concat``
+    measured for the output, or None.
+    """
+    extension = _file_format(paths[0])
+
+    def merge_chunk(chunk):
+        if is_canceled(cancel_event):
+            raise OperationCanceled("Merge canceled.")
+        fd, chunk_path = tempfile.mkstemp(prefix='chunk-', suffix=f'.{extension}', dir=work_dir)
+        os.close(fd)
+        inputs.add_temporary(chunk_path)
+        _concat(chunk, chunk_path, ['-c', 'copy'], work_dir, cancel_event)
+        inputs.consumed(chunk)
+        return chunk_path
+
+    level = 0
+    while len(paths) > chunk_size:
+        chunks = [paths[start:start + chunk_size] for start in range(0, len(paths), chunk_size)]
+        logger.info(f"Merging {len(paths)} inputs in {len(chunks)} chunks (level {level}).")
+        paths = list(executor.map(merge_chunk, chunks))
+        level += 1
+    duration = _concat(paths, output_path, codec_args, work_dir, cancel_event)
+    inputs.consumed(paths)
+    return duration
+
+def _plan_volumes(paths, max_seconds=None, max_bytes=None):
+    """Split ``paths`` into consecutive groups that stay under the duration and size limits.
+
+    Durations come from the library index or, for tracks it has no duration for, from
+    ffprobe; sizes are those of the input files. A single track over a limit gets a volume
+    of its own.
+    """
+    if not max_seconds and not max_bytes:
+        return [paths]
+    durations = get_library_index().durations(paths) if max_seconds else {}
+    volumes = [[]]
+    seconds = size = 0
+    for path in paths:
+        track_seconds = (durations.get(path) or probe_duration(path) or 0) if max_seconds else 0
+        track_bytes = file_size(path)
+        over = (max_seconds and seconds + track_seconds > max_seconds) or (max_bytes and size + track_bytes > max_bytes)
+        if over and volumes[-1]:
+            volumes.append([])
+            seconds = size = 0
+        volumes[-1].append(path)
+        seconds += track_seconds
+        size += track_bytes
+    return volumes
+
+def merge_volumes(playlist_name, downloaded_files, download_dir="./data/downloads", output_dir="./data/output", output_format=DEFAULT_OUTPUT_FORMAT, playlist_id=None, max_volume_seconds=None, max_volume_bytes=None, chunk_size=DEFAULT_MERGE_CHUNK_SIZE, merge_workers=DEFAULT_TRANSCODE_WORKERS, keep_tracks=False, cancel_event=None):
+    """Concatenate the downloaded tracks into one file, or into volumes, and return their paths.
+
+    Tracks already in ``output_format`` are stream-copied; otherwise the output is encoded
+    once. ``max_volume_seconds`` and ``max_volume_bytes`` split the output into volumes.
+    More than ``chunk_size`` tracks are merged in chunks by ``merge_workers`` processes,
+    deleting tracks as their chunk is done unless ``keep_tracks`` is set. Outputs are added
+    to the library index. Setting ``cancel_event`` stops the merge and keeps the tracks not
+    merged yet. Returns an empty list on failure or cancellation.
+    """
     os.makedirs(output_dir, exist_ok=True)
     
     logger.info("Merging all files into one...")
     logger.debug(f"Files to merge: {downloaded_files}")
     
+    output_paths = []
     if downloaded_files:
+        work_dir = os.path.abspath(download_dir)
+        track_store = get_track_store()
+        temporary = []
+        inputs = None
         try:
-            with open("filelist.txt", "w") as f:
-                for filename in downloaded_files:
-                    path = os.path.abspath(os.path.join(download_dir, filename))
-                    if os.path.exists(path):
-                        f.write(f"file '{path}'\n")
-                    else:
-                        logger.warning(f"File {path} not found.")
-                        
-            output_path = os.path.abspath(os.path.join(output_dir, f"{playlist_name}.mp3"))
-            creationflags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-            subprocess.run(
-                ['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', 'filelist.txt', '-c', 'copy', output_path],
-                check=True,
-                creationflags=creationflags
-            )
-            logger.info(f"All files have been merged into {output_path}")
+            paths = []
+            for filename in downloaded_files:
+                path = os.path.abspath(os.path.join(download_dir, filename))
+                if os.path.exists(path):
+                    paths.append(path)
+                else:
+                    logger.warning(f"File {path} not found.")
+
+            if len({_file_format(path) for path in paths}) > 1:
+                paths, temporary = _normalize_formats(paths, download_dir, cancel_event)
+
+            if paths and _file_format(paths[0]) == output_format:
+                codec_args = ['-c', 'copy']
+            else:
+                codec_args = ['-vn', *AUDIO_ENCODERS[output_format]]
+                logger.info(f"Encoding merged output to {output_format}.")
+
+            library = get_library_index()
+            library.tag_playlist(paths, playlist_id, playlist_name)
+            volumes = _plan_volumes(paths, max_volume_seconds, max_volume_bytes)
+            durations = [library.total_duration(volume) for volume in volumes]
+            inputs = _MergeInputs(paths, track_store, temporary, keep_tracks)
+            with ThreadPoolExecutor(max_workers=max(1, merge_workers), thread_name_prefix="merger") as executor:
+                for number, volume in enumerate(volumes, 1):
+                    name = output_filename(playlist_name, output_format) if len(volumes) == 1 else volume_filename(playlist_name, number, output_format)
+                    merged_path = os.path.abspath(os.path.join(output_dir, name))
+                    with measure('merge', tracks=len(volume), output_format=output_format, copy=codec_args[0] == '-c') as sample:
+                        duration = _concat_chunked(volume, merged_path, codec_args, work_dir, max(2, chunk_size), executor, inputs, cancel_event)
+                        sample['bytes'] = file_size(merged_path)
+                    logger.info(f"Merged {len(volume)} tracks into {merged_path}")
+                    library.record(merged_path, KIND_OUTPUT, duration=duration or durations[number - 1], playlist_id=playlist_id, playlist_name=playlist_name)
+                    output_paths.append(merged_path)
+            logger.info(f"All files have been merged into {len(output_paths)} file(s).")
         
+        except OperationCanceled:
+            logger.info("Merging canceled.")
+            output_paths = []
         except subprocess.CalledProcessError as e:
             logger.error(f"FFmpeg failed with error: {e}")
+            output_paths = []
         except Exception as e:
             logger.error(f"An unexpected error occurred during merging: {e}")
+            output_paths = []
         
-        finally:
-            if os.path.exists("filelist.txt"):
-                os.remove("filelist.txt")
-        
-        for filename in downloaded_files:
-            mp3_path = os.path.join(download_dir, filename)
-            if os.path.exists(mp3_path):
-                os.remove(mp3_path)
+        with measure('cleanup') as sample:
+            if inputs is not None:
+                inputs.remove_temporary()
+                sample['bytes'] += inputs.freed_bytes
+            paths = [] if keep_tracks else [os.path.join(download_dir, filename) for filename in downloaded_files]
+            for track_path in ([] if is_canceled(cancel_event) else paths) + temporary:
+                if track_store.owns(track_path):
+                    continue
+                if os.path.exists(track_path):
+                    sample['bytes'] += file_size(track_path)
+                    os.remove(track_path)
+            track_store.release(list(dict.fromkeys(paths)))
     else:
-        logger.info("No files found to merge.")
\ No newline at end of file
+        logger.info("No files found to merge.")
+    return output_paths
+
+def merge_files(playlist_name, downloaded_files, download_dir="./data/downloads", output_dir="./data/output", output_format=DEFAULT_OUTPUT_FORMAT, playlist_id=None, chunk_size=DEFAULT_MERGE_CHUNK_SIZE, merge_workers=DEFAULT_TRANSCODE_WORKERS, cancel_event=None):
+    """Concatenate the downloaded tracks into one file and return its path, or None on failure.
+
+    See ``merge_volumes`` for the merge itself.
+    """
+    output_paths = merge_volumes(playlist_name, downloaded_files, download_dir, output_dir, output_format, playlist_id, chunk_size=chunk_size, merge_workers=merge_workers, cancel_event=cancel_event)
+    return output_paths[0] if output_paths else None
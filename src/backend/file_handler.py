@@ -12,22 +12,44 @@ def sanitize_filename(name, max_length=255):
     sanitized_name = re.sub(r'\s+', '_', sanitized_name).strip('_')
     return sanitized_name[:max_length]
 
-def write_to_file(videos, playlist_name):
-    """Write video information to a file."""
-    sanitized_name = sanitize_filename(playlist_name)
-    filename = sanitized_name + '.txt'
-   
-    output_dir = './data/output'
-    os.makedirs(output_dir, exist_ok=True)
-   
-    filepath = os.path.join(output_dir, filename)
+def export_path(playlist_name, output_dir='./data/output'):
+    """Return the path of the text export of a playlist."""
+    return os.path.join(output_dir, sanitize_filename(playlist_name) + '.txt')
+
+def export_entries(videos, playlist_name):
+    """Write video information to a file while passing each video through.
+
+    The export is written as the videos are consumed, so a streamed playlist can feed the
+    exporter and the downloader at the same time.
+    """
+    filepath = export_path(playlist_name)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
     
+    file = None
     try:
-        with open(filepath, 'w', encoding='utf-8') as file:
-            file.write(f'{playlist_name}\n\n')
-            for title, artist, video_id in videos:
-                file.write(f'Title: {title}\nArtist: {artist}\nVideo ID: {video_id}\n\n')
-        
-        logger.info(f'Playlist titles and artists have been written to {os.path.abspath(filepath)}.')
+        file = open(filepath, 'w', encoding='utf-8')
+        file.write(f'{playlist_name}\n\n')
     except IOError as e:
-        logger.error(f"An error occurred while writing to the file: {e}")
\ No newline at end of file
+        logger.error(f"An error occurred while writing to the file: {e}")
+        file = None
+
+    try:
+        for video in videos:
+            if file is not None:
+                title, artist, video_id = video
+                try:
+                    file.write(f'Title: {title}\nArtist: {artist}\nVideo ID: {video_id}\n\n')
+                except IOError as e:
+                    logger.error(f"An error occurred while writing to the file: {e}")
+                    file.close()
+                    file = None
+            yield video
+    finally:
+        if file is not None:
+            file.close()
+            logger.info(f'Playlist titles and artists have been written to {os.path.abspath(filepath)}.')
+
+def write_to_file(videos, playlist_name):
+    """Write video information to a file."""
+    for _video in export_entries(videos, playlist_name):
+        pass
@@ -0,0 +1,112 @@
+import json
+import socket
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+JOB_CANCELED = 'canceled'
+FINAL_STATES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELED)
+
+DEFAULT_TIMEOUT = 5.0
+# How often a watch checks its cancel event while no events arrive.
+WATCH_POLL_INTERVAL = 0.5
+
+class JobServerError(RuntimeError):
+    """Raised when the job server rejects a request or cannot be reached."""
+
+class JobClient:
+    """Client for the local job server; every request uses a new connection."""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def _connect(self):
+        try:
+            return socket.create_connection((self.host, self.port), timeout=self.timeout)
+        except OSError as e:
+            raise JobServerError(f"Cannot reach the job server at {self.host}:{self.port}: {e}") from e
+
+    @staticmethod
+    def _send(sock, request):
+        sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+
+    def request(self, op, **fields):
+        """Send one request and return the server's reply; raises ``JobServerError`` if it failed."""
+        with self._connect() as sock:
+            try:
+                self._send(sock, {'op': op, **fields})
+                with sock.makefile('rb') as reader:
+                    line = reader.readline()
+            except OSError as e:
+                raise JobServerError(f"Request {op!r} to the job server failed: {e}") from e
+        if not line:
+            raise JobServerError(f"The job server closed the connection during {op!r}.")
+        reply = json.loads(line)
+        if not reply.get('ok'):
+            raise JobServerError(reply.get('error') or f"Request {op!r} failed.")
+        return reply
+
+    def ping(self):
+        """Return True if a job server answers."""
+        try:
+            self.request('ping')
+        except JobServerError:
+            return False
+        return True
+
+    def submit(self, playlist_id, **options):
+        return self.request('submit', playlist_id=playlist_id, options=options)['job']
+
+    def jobs(self):
+        return self.request('jobs')['jobs']
+
+    def status(self, job_id):
+        return self.request('status', job_id=job_id)['job']
+
+    def cancel(self, job_id):
+        return self.request('cancel', job_id=job_id)['job']
+
+    def watch(self, job_id, cancel_event=None, since=0):
+        """Yield the events of a job numbered after ``since`` until the job is over.
+
+        The server keeps only the latest progress event of a job, so a watch that starts
+        late sees the current progress rather than every step.
+
+        Setting ``cancel_event`` asks the server to cancel the job; the events it emits
+        while stopping are still yielded.
+        """
+        cancel_sent = False
+        state = None
+        with self._connect() as sock:
+            self._send(sock, {'op': 'watch', 'job_id': job_id, 'since': since})
+            sock.settimeout(WATCH_POLL_INTERVAL)
+            buffer = b''
+            while True:
+                if cancel_event is not None and cancel_event.is_set() and not cancel_sent:
+                    self.cancel(job_id)
+                    cancel_sent = True
+                try:
+                    chunk = sock.recv(65536)
+                except socket.timeout:
+                    continue
+                except OSError as e:
+                    raise JobServerError(f"Lost the connection to the job server: {e}") from e
+                if not chunk:
+                    break
+                buffer += chunk
+                *lines, buffer = buffer.split(b'\n')
+                for line in lines:
+                    event = json.loads(line)
+                    if event.get('ok') is False:
+                        raise JobServerError(event.get('error') or "Watching the job failed.")
+                    if event.get('event') == 'state':
+                        state = event['state']
+                    yield event
+        if state not in FINAL_STATES:
+            raise JobServerError(f"The job server stopped sending events for job {job_id}.")
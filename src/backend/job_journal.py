@@ -0,0 +1,157 @@
+import os
+import sqlite3
+import threading
+import time
+
+from tools.logger import get_logger
+
+logger = get_logger()
+
+DEFAULT_JOURNAL_PATH = './data/jobs.sqlite3'
+
+STATE_PENDING = 'pending'
+STATE_DOWNLOADED = 'downloaded'
+STATE_TRANSCODED = 'transcoded'
+STATE_MERGED = 'merged'
+STATE_FAILED = 'failed'
+
+JOB_RUNNING = 'running'
+JOB_FINISHED = 'finished'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    playlist_id TEXT NOT NULL,
+    playlist_name TEXT,
+    audio_format TEXT NOT NULL,
+    output_format TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    job_id INTEGER NOT NULL REFERENCES jobs(job_id) ON DELETE CASCADE,
+    video_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    title TEXT,
+    artist TEXT,
+    state TEXT NOT NULL,
+    path TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, video_id)
+);
+CREATE INDEX IF NOT EXISTS jobs_by_playlist ON jobs (playlist_id, status);
+'''
+
+class JobJournal:
+    """Persistent record of each job's tracks and how far each of them got.
+
+    A job is restarted by calling ``start_job`` again for the same playlist and formats:
+    the unfinished job is reused, so tracks that were already downloaded or transcoded
+    are not fetched again.
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute('PRAGMA foreign_keys=ON')
+        with self._connection:
+            self._connection.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def start_job(self, playlist_id, playlist_name, videos, audio_format, output_format):
+        """Return the ID of the unfinished job for this playlist, or of a new one.
+
+        Tracks can be registered up front through ``videos``, or one at a time with
+        ``add_track`` as the playlist streams in (pass an empty ``videos`` then).
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                'SELECT job_id FROM jobs WHERE playlist_id = ? AND audio_format = ? AND output_format = ? AND status = ? '
+                'ORDER BY job_id DESC LIMIT 1',
+                (playlist_id, audio_format, output_format, JOB_RUNNING),
+            ).fetchone()
+            if row:
+                job_id = row[0]
+                self._connection.execute('UPDATE jobs SET playlist_name = ?, updated_at = ? WHERE job_id = ?', (playlist_name, now, job_id))
+            else:
+                job_id = self._connection.execute(
+                    'INSERT INTO jobs (playlist_id, playlist_name, audio_format, output_format, status, created_at, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (playlist_id, playlist_name, audio_format, output_format, JOB_RUNNING, now, now),
+                ).lastrowid
+
+            seen = set()
+            for position, video in enumerate(videos):
+                if video[2] not in seen:
+                    seen.add(video[2])
+                    self._insert_track(job_id, position, video, now)
+
+        if row:
+            done = sum(1 for state, _path in self.track_states(job_id).values() if state == STATE_TRANSCODED)
+            logger.info(f"Resuming job {job_id} for playlist {playlist_id}: {done} tracks already processed.")
+        else:
+            logger.info(f"Started job {job_id} for playlist {playlist_id}.")
+        return job_id
+
+    def _insert_track(self, job_id, position, video, now):
+        title, artist, video_id = video
+        self._connection.execute(
+            'INSERT INTO tracks (job_id, video_id, position, title, artist, state, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (job_id, video_id) DO UPDATE SET position = excluded.position, title = excluded.title, artist = excluded.artist',
+            (job_id, video_id, position, title, artist, STATE_PENDING, now),
+        )
+
+    def add_track(self, job_id, position, video):
+        """Register the first occurrence of a track in a job; a known track keeps its state."""
+        with self._lock, self._connection:
+            self._insert_track(job_id, position, video, time.time())
+
+    def mark(self, job_id, video_id, state, path=None):
+        with self._lock, self._connection:
+            self._connection.execute(
+                'UPDATE tracks SET state = ?, path = ?, updated_at = ? WHERE job_id = ? AND video_id = ?',
+                (state, path, time.time(), job_id, video_id),
+            )
+
+    def track_states(self, job_id):
+        """Return ``{video_id: (state, path)}`` for every track of a job."""
+        with self._lock:
+            rows = self._connection.execute('SELECT video_id, state, path FROM tracks WHERE job_id = ?', (job_id,)).fetchall()
+        return {video_id: (state, path) for video_id, state, path in rows}
+
+    def finish_job(self, job_id):
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute('UPDATE tracks SET state = ?, updated_at = ? WHERE job_id = ? AND state = ?', (STATE_MERGED, now, job_id, STATE_TRANSCODED))
+            self._connection.execute('UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ?', (JOB_FINISHED, now, job_id))
+        logger.info(f"Job {job_id} finished.")
+
+_journal = None
+_journal_lock = threading.Lock()
+
+def configure_job_journal(path=DEFAULT_JOURNAL_PATH):
+    """Replace the shared job journal with one stored at ``path``."""
+    global _journal
+    with _journal_lock:
+        if _journal is not None:
+            _journal.close()
+        _journal = JobJournal(path)
+        return _journal
+
+def get_job_journal():
+    """Return the shared job journal, opening the default database on first use."""
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = JobJournal()
+        return _journal
@@ -0,0 +1,228 @@
+import json
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.job_client import DEFAULT_HOST, DEFAULT_PORT, FINAL_STATES, JOB_CANCELED, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED
+from backend.jobs import JOB_OPTIONS, job_options, process_playlist, validate_options
+from tools.logger import get_logger
+from tools.metrics import job_metrics
+
+logger = get_logger()
+
+# Each job already downloads in parallel, and the timing summary of a job would also
+# count the samples of any job running next to it.
+DEFAULT_MAX_JOBS = 1
+PROTOCOL_VERSION = 1
+
+# Directories belong to the server; clients only choose how a playlist is processed.
+REMOTE_OPTIONS = tuple(name for name in JOB_OPTIONS if not name.endswith('_dir'))
+
+# Seconds a watcher waits for new events before checking whether it is still connected.
+WATCH_INTERVAL = 1.0
+
+# Finished jobs are forgotten once there are more than this many or after this many seconds.
+MAX_FINISHED_JOBS = 100
+FINISHED_JOB_TTL = 24 * 60 * 60
+
+# Events of which a job only keeps the latest one.
+REPLACED_EVENTS = ('progress',)
+
+class Job:
+    """One submitted playlist and the events it has emitted so far.
+
+    Every event gets a sequence number. Of the events in ``REPLACED_EVENTS`` only the
+    latest is kept, so a job's history stays small however many tracks it has.
+    """
+
+    def __init__(self, job_id, playlist_id, options):
+        self.job_id = job_id
+        self.playlist_id = playlist_id
+        self.options = options
+        self.state = JOB_QUEUED
+        self.events = []
+        self._seq = 0
+        self.cancel_event = threading.Event()
+        self.created_at = time.time()
+        self.finished_at = None
+        self._condition = threading.Condition()
+
+    def _append(self, event, fields):
+        """Add an event and wake the watchers. Call with the condition held."""
+        if event in REPLACED_EVENTS and self.events and self.events[-1]['event'] == event:
+            self.events.pop()
+        self._seq += 1
+        self.events.append({'event': event, 'seq': self._seq, 'time': round(time.time(), 3), 'job_id': self.job_id, **fields})
+        self._condition.notify_all()
+
+    def emit(self, event, **fields):
+        with self._condition:
+            self._append(event, fields)
+
+    def set_state(self, state):
+        with self._condition:
+            self.state = state
+            if state in FINAL_STATES:
+                self.finished_at = time.time()
+            self._append('state', {'state': state})
+
+    def events_since(self, seq, timeout):
+        """Wait up to ``timeout`` for events numbered after ``seq``; return them and whether the job is over."""
+        with self._condition:
+            if self._seq <= seq and self.state not in FINAL_STATES:
+                self._condition.wait(timeout)
+            return [event for event in self.events if event['seq'] > seq], self.state in FINAL_STATES
+
+    def describe(self):
+        with self._condition:
+            progress = next((event for event in reversed(self.events) if event['event'] == 'progress'), None)
+            return {
+                'job_id': self.job_id,
+                'playlist_id': self.playlist_id,
+                'state': self.state,
+                'created_at': self.created_at,
+                'finished_at': self.finished_at,
+                'completed': progress['completed'] if progress else 0,
+                'total': progress['total'] if progress else None,
+                'options': {name: getattr(self.options, name) for name in REMOTE_OPTIONS},
+            }
+
+class JobQueue:
+    """Runs submitted playlist jobs, at most ``max_jobs`` at a time, in submission order."""
+
+    def __init__(self, max_jobs=DEFAULT_MAX_JOBS, download_dir=JOB_OPTIONS['download_dir'], output_dir=JOB_OPTIONS['output_dir']):
+        self.download_dir = download_dir
+        self.output_dir = output_dir
+        self._jobs = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_jobs), thread_name_prefix="job")
+
+    def submit(self, playlist_id, options):
+        """Queue a playlist with the client ``options``; raises ValueError for invalid ones."""
+        unknown = set(options) - set(REMOTE_OPTIONS)
+        if unknown:
+            raise ValueError(f"Options not accepted by the server: {', '.join(sorted(unknown))}.")
+        options = job_options(**options, download_dir=self.download_dir, output_dir=self.output_dir)
+        message = validate_options(options)
+        if message:
+            raise ValueError(message)
+        with self._lock:
+            self._evict_finished()
+            job = Job(self._next_id, playlist_id, options)
+            self._jobs[job.job_id] = job
+            self._next_id += 1
+        job.emit('queued', playlist_id=playlist_id)
+        self._executor.submit(self._run, job)
+        logger.info(f"Queued job {job.job_id} for playlist {playlist_id}.")
+        return job
+
+    def _run(self, job):
+        if job.cancel_event.is_set():
+            job.set_state(JOB_CANCELED)
+            return
+        job.set_state(JOB_RUNNING)
+        job.emit('start', playlist_id=job.playlist_id)
+        with job_metrics(f"job {job.job_id} (playlist {job.playlist_id})") as metrics:
+            try:
+                ok = process_playlist(job.playlist_id, job.options, job.emit, job.cancel_event)
+            except Exception as e:
+                logger.error(f"Job {job.job_id} for playlist {job.playlist_id} failed: {e}")
+                job.emit('error', playlist_id=job.playlist_id, message=str(e))
+                ok = False
+        job.emit('metrics', playlist_id=job.playlist_id, **metrics.summary())
+        job.set_state(JOB_SUCCEEDED if ok else JOB_CANCELED if job.cancel_event.is_set() else JOB_FAILED)
+
+    def _evict_finished(self):
+        """Forget old finished jobs. Call with the lock held."""
+        finished = sorted((job for job in self._jobs.values() if job.finished_at is not None), key=lambda job: job.finished_at)
+        expired = time.time() - FINISHED_JOB_TTL
+        for index, job in enumerate(finished):
+            if len(finished) - index > MAX_FINISHED_JOBS or job.finished_at < expired:
+                del self._jobs[job.job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"No job {job_id}.")
+        return job
+
+    def jobs(self):
+        with self._lock:
+            self._evict_finished()
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        job.cancel_event.set()
+        logger.info(f"Cancel requested for job {job_id}.")
+        return job
+
+    def close(self):
+        for job in self.jobs():
+            job.cancel_event.set()
+        self._executor.shutdown(wait=True)
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Serves newline-delimited JSON requests; each request gets one JSON line back.
+
+    A 'watch' request is answered with the job's events, one per line, until the job is
+    over, and then the connection is closed.
+    """
+
+    def send(self, message):
+        self.wfile.write(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.wfile.flush()
+
+    def handle(self):
+        queue = self.server.queue
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                op = request.get('op')
+                if op == 'watch':
+                    self.watch(queue.get(int(request['job_id'])), int(request.get('since', 0)))
+                    return
+                self.send({'ok': True, **self.dispatch(queue, op, request)})
+            except (KeyError, ValueError, TypeError) as e:
+                self.send({'ok': False, 'error': str(e).strip('"\'')})
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+    def dispatch(self, queue, op, request):
+        if op == 'ping':
+            return {'version': PROTOCOL_VERSION}
+        if op == 'submit':
+            return {'job': queue.submit(str(request['playlist_id']), request.get('options') or {}).describe()}
+        if op == 'jobs':
+            return {'jobs': [job.describe() for job in queue.jobs()]}
+        if op == 'status':
+            return {'job': queue.get(int(request['job_id'])).describe()}
+        if op == 'cancel':
+            return {'job': queue.cancel(int(request['job_id'])).describe()}
+        raise ValueError(f"Unknown request {op!r}.")
+
+    def watch(self, job, seq):
+        while True:
+            events, over = job.events_since(seq, WATCH_INTERVAL)
+            for event in events:
+                self.send(event)
+                seq = event['seq']
+            if over and not events:
+                return
+
+class JobServer(socketserver.ThreadingTCPServer):
+    """Local TCP server that exposes a ``JobQueue`` to GUI and CLI clients.
+
+    It binds to the loopback interface by default, so only processes on this machine can
+    submit jobs; every client shares the server's track store, caches and journal.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, queue, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        super().__init__((host, port), _RequestHandler)
+        self.queue = queue
@@ -0,0 +1,163 @@
+import os
+from types import SimpleNamespace
+
+from backend.downloader import DEFAULT_MAX_WORKERS, DEFAULT_MERGE_CHUNK_SIZE, download_videos, existing_output, merge_volumes
+from backend.file_handler import export_entries
+from backend.job_journal import get_job_journal
+from backend.playlist_sync import plan_sync, snapshot_writer
+from backend.stream_merge import StreamingMerger
+from backend.track_store import PinnedTracks
+from backend.youtube_service import get_playlist, stream_playlist
+
+# Options of a playlist job and their defaults, shared by the CLI and the job server.
+JOB_OPTIONS = {
+    'sync': False,
+    'refresh': False,
+    'no_download': False,
+    'workers': DEFAULT_MAX_WORKERS,
+    'audio_format': 'mp3',
+    'output_format': 'mp3',
+    'download_dir': './data/downloads',
+    'output_dir': './data/output',
+    'stream_merge': False,
+    'chunk_size': DEFAULT_MERGE_CHUNK_SIZE,
+    'max_volume_minutes': None,
+    'max_volume_mb': None,
+}
+
+AUDIO_FORMAT_CHOICES = ('mp3', 'native')
+OUTPUT_FORMAT_CHOICES = ('mp3', 'opus', 'm4a')
+
+def job_options(**options):
+    """Return the options of a job as a namespace, with defaults for the ones not given."""
+    unknown = set(options) - set(JOB_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown job options: {', '.join(sorted(unknown))}.")
+    return SimpleNamespace(**{**JOB_OPTIONS, **options})
+
+def validate_options(options):
+    """Return a message describing the first invalid option, or None if they are all valid."""
+    if options.workers < 1:
+        return "--workers must be at least 1."
+    if options.audio_format not in AUDIO_FORMAT_CHOICES:
+        return f"--audio-format must be one of {', '.join(AUDIO_FORMAT_CHOICES)}."
+    if options.output_format not in OUTPUT_FORMAT_CHOICES:
+        return f"--output-format must be one of {', '.join(OUTPUT_FORMAT_CHOICES)}."
+    if options.stream_merge and (options.max_volume_minutes or options.max_volume_mb):
+        return "--stream-merge writes a single output and cannot split volumes."
+    if options.chunk_size < 2:
+        return "--chunk-size must be at least 2."
+    return None
+
+def failure_fields(failures):
+    """Describe ``DownloadFailure`` entries as JSON-serializable dicts."""
+    return [{'video_id': failure.video[2], 'title': failure.video[0], 'reason': failure.reason} for failure in failures]
+
+def process_playlist(playlist_id, options, emit, cancel_event=None):
+    """Resolve, export, download and merge one playlist. Returns True on success.
+
+    ``options`` has the attributes named in ``JOB_OPTIONS``, and progress is reported as
+    ``emit(event, **fields)`` calls. Outside of ``sync`` the playlist is streamed: entries
+    are exported and queued for download as yt-dlp reads them. A sync needs the whole
+    playlist up front to diff it. Setting ``cancel_event`` stops the job, which then
+    emits 'canceled' and returns False.
+    """
+
+    def progress(completed, total):
+        emit('progress', playlist_id=playlist_id, completed=completed, total=total)
+
+    if options.sync:
+        playlist_name, videos = get_playlist(playlist_id, refresh=True, cancel_event=cancel_event)
+        if cancel_event is not None and cancel_event.is_set():
+            emit('canceled', playlist_id=playlist_id)
+            return False
+        if not playlist_name or videos is None:
+            emit('error', playlist_id=playlist_id, message="Failed to retrieve playlist.")
+            return False
+        emit('resolved', playlist_id=playlist_id, name=playlist_name, videos=len(videos))
+        diff = plan_sync(playlist_id, videos)
+        emit('diff', playlist_id=playlist_id, added=len(diff.added), removed=len(diff.removed), moved=len(diff.moved), renamed=len(diff.renamed))
+        existing = existing_output(playlist_name, options.output_dir, options.output_format)
+        if not diff.changed and existing:
+            emit('done', playlist_id=playlist_id, status='unchanged', output=os.path.abspath(existing))
+            return True
+    else:
+        playlist_name, videos = stream_playlist(playlist_id, refresh=options.refresh, cancel_event=cancel_event)
+        if cancel_event is not None and cancel_event.is_set():
+            emit('canceled', playlist_id=playlist_id)
+            return False
+        if not playlist_name:
+            emit('error', playlist_id=playlist_id, message="Failed to retrieve playlist.")
+            return False
+        emit('resolved', playlist_id=playlist_id, name=playlist_name)
+
+    snapshot = snapshot_writer(playlist_id, playlist_name)
+    try:
+        entries = export_entries(snapshot.record(videos), playlist_name)
+        if options.no_download:
+            for _video in entries:
+                pass
+            emit('done', playlist_id=playlist_id, status='exported', videos=snapshot.count)
+            return True
+
+        merger = StreamingMerger(playlist_name, options.output_dir, options.output_format, options.audio_format, playlist_id) if options.stream_merge else None
+        journal = get_job_journal()
+        job_id = journal.start_job(playlist_id, playlist_name, (), options.audio_format, options.output_format)
+        failures = []
+        # The streaming merger releases the tracks it was handed itself, even when aborted.
+        pinned = PinnedTracks() if merger is None else None
+        try:
+            downloaded_files = download_videos(
+                merger.track_order(entries) if merger else entries,
+                download_dir=options.download_dir,
+                max_workers=options.workers,
+                progress_callback=progress,
+                cancel_event=cancel_event,
+                audio_format=options.audio_format,
+                journal=journal,
+                job_id=job_id,
+                track_callback=merger.track_ready if merger else pinned.track_ready,
+                failures=failures,
+            )
+            if cancel_event is not None and cancel_event.is_set():
+                emit('canceled', playlist_id=playlist_id)
+                return False
+            if not snapshot.count:
+                emit('error', playlist_id=playlist_id, message="Failed to retrieve playlist items.")
+                return False
+            if merger:
+                output_path = merger.finish()
+                output_paths = [output_path] if output_path else []
+            else:
+                pinned.handed_off()
+                output_paths = merge_volumes(
+                    playlist_name,
+                    downloaded_files,
+                    options.download_dir,
+                    options.output_dir,
+                    options.output_format,
+                    playlist_id=playlist_id,
+                    max_volume_seconds=options.max_volume_minutes * 60 if options.max_volume_minutes else None,
+                    max_volume_bytes=options.max_volume_mb * 1024 * 1024 if options.max_volume_mb else None,
+                    chunk_size=options.chunk_size,
+                    cancel_event=cancel_event,
+                )
+        finally:
+            if merger:
+                merger.abort()
+            else:
+                pinned.release()
+        if cancel_event is not None and cancel_event.is_set():
+            emit('canceled', playlist_id=playlist_id)
+            return False
+        if not output_paths:
+            emit('error', playlist_id=playlist_id, message="Failed to merge tracks.", downloaded=len(downloaded_files))
+            return False
+
+        journal.finish_job(job_id)
+        snapshot.commit()
+        emit('done', playlist_id=playlist_id, status='merged', output=output_paths[0], outputs=output_paths, tracks=len(downloaded_files), missing=snapshot.count - len(downloaded_files), failed_tracks=failure_fields(failures))
+        return True
+    finally:
+        # Only a merged run becomes the baseline for the next sync.
+        snapshot.discard()
@@ -0,0 +1,220 @@
+import os
+import shutil
+import sqlite3
+import subprocess
+import threading
+import time
+from collections import namedtuple
+
+from backend.mp3_concat import Mp3FormatError, read_stream
+from tools.logger import get_logger
+
+logger = get_logger()
+
+DEFAULT_INDEX_PATH = './data/library.sqlite3'
+
+KIND_OUTPUT = 'output'
+KIND_TRACK = 'track'
+
+# Paths per query, below SQLite's limit on bound parameters.
+QUERY_BATCH_SIZE = 500
+
+AUDIO_EXTENSIONS = {'.mp3', '.opus', '.m4a', '.ogg', '.aac', '.flac', '.wav', '.webm'}
+
+# Columns ``entries`` can sort by.
+SORT_COLUMNS = {
+    'name': 'name COLLATE NOCASE',
+    'created': 'created_at',
+    'size': 'size',
+    'duration': 'duration',
+}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    duration REAL,
+    playlist_id TEXT,
+    playlist_name TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_by_kind ON files (kind, name);
+'''
+
+LibraryEntry = namedtuple('LibraryEntry', 'path kind name size duration playlist_id playlist_name created_at')
+
+def probe_duration(path):
+    """Return the duration of an audio file in seconds using ffprobe, or None if it is unknown.
+
+    MP3 files are measured by counting their frames when ffprobe is not installed.
+    """
+    if shutil.which('ffprobe') is None:
+        if os.path.splitext(path)[1].lower() != '.mp3':
+            return None
+        try:
+            return read_stream(path).duration
+        except (Mp3FormatError, OSError) as e:
+            logger.debug(f"Could not read the duration of {path}: {e}")
+            return None
+    try:
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', path],
+            capture_output=True, text=True, check=True,
+            creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0,
+        )
+        return float(result.stdout.strip())
+    except (subprocess.CalledProcessError, ValueError, OSError) as e:
+        logger.debug(f"Could not probe the duration of {path}: {e}")
+        return None
+
+class LibraryIndex:
+    """Persistent index of merged outputs and cached tracks with their metadata.
+
+    Files are recorded as the app writes them, so listing the library is a single query
+    instead of a directory listing. ``scan`` reconciles a directory with the index for
+    changes made outside the app, touching only files whose size or mtime changed.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        with self._connection:
+            self._connection.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def record(self, path, kind, duration=None, playlist_id=None, playlist_name=None):
+        """Add or update one file. Metadata that is not given keeps its recorded value."""
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            logger.warning(f"Not indexing missing file {path}: {e}")
+            return
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT INTO files (path, kind, name, size, mtime, duration, playlist_id, playlist_name, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (path) DO UPDATE SET kind = excluded.kind, size = excluded.size, mtime = excluded.mtime, '
+                'duration = COALESCE(excluded.duration, duration), playlist_id = COALESCE(excluded.playlist_id, playlist_id), '
+                'playlist_name = COALESCE(excluded.playlist_name, playlist_name)',
+                (path, kind, os.path.basename(path), stat.st_size, stat.st_mtime, duration, playlist_id, playlist_name, time.time()),
+            )
+
+    def remove(self, path):
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM files WHERE path = ?', (os.path.abspath(path),))
+
+    def tag_playlist(self, paths, playlist_id, playlist_name):
+        """Record ``playlist_name`` as the source playlist of already indexed files."""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'UPDATE files SET playlist_id = COALESCE(?, playlist_id), playlist_name = ? WHERE path = ?',
+                [(playlist_id, playlist_name, os.path.abspath(path)) for path in paths],
+            )
+
+    def durations(self, paths):
+        """Return ``{path: duration}`` for the indexed files among ``paths`` whose duration is known."""
+        paths = [os.path.abspath(path) for path in paths]
+        durations = {}
+        with self._lock:
+            for start in range(0, len(paths), QUERY_BATCH_SIZE):
+                batch = paths[start:start + QUERY_BATCH_SIZE]
+                durations.update(self._connection.execute(
+                    f"SELECT path, duration FROM files WHERE duration IS NOT NULL AND path IN ({', '.join('?' * len(batch))})", batch,
+                ).fetchall())
+        return durations
+
+    def total_duration(self, paths):
+        """Return the summed duration of ``paths``, or None if any of them has no known duration."""
+        paths = [os.path.abspath(path) for path in paths]
+        durations = self.durations(paths)
+        if not paths or any(path not in durations for path in paths):
+            return None
+        return sum(durations[path] for path in paths)
+
+    def scan(self, directory, kind):
+        """Reconcile the index with the audio files in ``directory``."""
+        directory = os.path.abspath(directory)
+        found = {}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS:
+                        stat = entry.stat()
+                        found[entry.path] = (stat.st_size, stat.st_mtime)
+        except FileNotFoundError:
+            pass
+
+        with self._lock, self._connection:
+            known = {
+                path: (size, mtime)
+                for path, size, mtime in self._connection.execute('SELECT path, size, mtime FROM files WHERE kind = ?', (kind,))
+                if os.path.dirname(path) == directory
+            }
+            removed = [(path,) for path in known if path not in found]
+            changed = [(size, mtime, path) for path, (size, mtime) in found.items() if path in known and known[path] != (size, mtime)]
+            added = [
+                (path, kind, os.path.basename(path), size, mtime, mtime)
+                for path, (size, mtime) in found.items() if path not in known
+            ]
+            self._connection.executemany('DELETE FROM files WHERE path = ?', removed)
+            self._connection.executemany('UPDATE files SET size = ?, mtime = ?, duration = NULL WHERE path = ?', changed)
+            self._connection.executemany(
+                'INSERT INTO files (path, kind, name, size, mtime, created_at) VALUES (?, ?, ?, ?, ?, ?)', added,
+            )
+        if removed or changed or added:
+            logger.info(f"Library index of {directory}: {len(added)} added, {len(changed)} changed, {len(removed)} removed.")
+
+    def fill_durations(self, kind):
+        """Probe the files of ``kind`` whose duration is not known yet."""
+        with self._lock:
+            paths = [path for (path,) in self._connection.execute('SELECT path FROM files WHERE kind = ? AND duration IS NULL', (kind,))]
+        if not paths:
+            return
+        for path in paths:
+            duration = probe_duration(path)
+            if duration is not None:
+                with self._lock, self._connection:
+                    self._connection.execute('UPDATE files SET duration = ? WHERE path = ?', (duration, path))
+
+    def entries(self, kind, query='', sort='name', descending=False):
+        """Return the ``LibraryEntry`` rows of ``kind`` whose name or playlist contains ``query``."""
+        order = f"{SORT_COLUMNS[sort]} {'DESC' if descending else 'ASC'}, name COLLATE NOCASE"
+        pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT path, kind, name, size, duration, playlist_id, playlist_name, created_at FROM files '
+                "WHERE kind = ? AND (name LIKE ? ESCAPE '\\' OR playlist_name LIKE ? ESCAPE '\\') "
+                f"ORDER BY {order}",
+                (kind, pattern, pattern),
+            ).fetchall()
+        return [LibraryEntry(*row) for row in rows]
+
+_index = None
+_index_lock = threading.Lock()
+
+def configure_library_index(path=DEFAULT_INDEX_PATH):
+    """Replace the shared library index with one stored at ``path``."""
+    global _index
+    with _index_lock:
+        if _index is not None:
+            _index.close()
+        _index = LibraryIndex(path)
+        return _index
+
+def get_library_index():
+    """Return the shared library index, opening the default database on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = LibraryIndex()
+        return _index
@@ -0,0 +1,99 @@
+import json
+import os
+import re
+import time
+
+from tools.logger import get_logger
+
+logger = get_logger()
+
+DEFAULT_CACHE_DIR = './data/cache/playlists'
+DEFAULT_TTL = 6 * 60 * 60
+
+def playlist_cache_path(playlist_id, cache_dir=DEFAULT_CACHE_DIR):
+    safe_id = re.sub(r'[^\w-]', '_', playlist_id)
+    return os.path.join(cache_dir, f"{safe_id}.json")
+
+def load_playlist(playlist_id, ttl=DEFAULT_TTL, cache_dir=DEFAULT_CACHE_DIR):
+    """Return the cached (name, videos) of a playlist, or None if it is missing or expired."""
+    path = playlist_cache_path(playlist_id, cache_dir)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable playlist cache {path}: {e}")
+        return None
+
+    age = time.time() - entry.get('fetched_at', 0)
+    if ttl is not None and age > ttl:
+        logger.info(f"Playlist cache for {playlist_id} expired ({age:.0f}s old).")
+        return None
+
+    videos = [tuple(video) for video in entry.get('videos', [])]
+    logger.info(f"Loaded playlist {playlist_id} from cache ({len(videos)} videos, {age:.0f}s old).")
+    return entry.get('name'), videos
+
+class VideoListWriter:
+    """Writes a JSON document with a ``videos`` list one video at a time.
+
+    Videos go to a temporary file as they arrive, so a streamed playlist is stored without
+    being held in memory. ``commit`` replaces the file at ``path``; ``discard`` drops the
+    partial file, e.g. when resolution was canceled.
+    """
+
+    def __init__(self, path, fields):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.count = 0
+        self._tmp_path = f"{path}.tmp"
+        self._file = None
+        try:
+            self._file = open(self._tmp_path, 'w', encoding='utf-8')
+            header = json.dumps(fields, ensure_ascii=False)
+            self._file.write(header[:-1] + (', ' if fields else '') + '"videos": [')
+        except OSError as e:
+            logger.error(f"Failed to write {path}: {e}")
+            self.discard()
+
+    def add(self, video):
+        if self._file is None:
+            return
+        try:
+            self._file.write((', ' if self.count else '') + json.dumps(list(video), ensure_ascii=False))
+            self.count += 1
+        except OSError as e:
+            logger.error(f"Failed to write {self.path}: {e}")
+            self.discard()
+
+    def record(self, videos):
+        """Add each video of ``videos`` while passing it through."""
+        for video in videos:
+            self.add(video)
+            yield video
+
+    def commit(self):
+        if self._file is None:
+            return False
+        try:
+            self._file.write(']}')
+            self._file.close()
+            self._file = None
+            os.replace(self._tmp_path, self.path)
+            return True
+        except OSError as e:
+            logger.error(f"Failed to write {self.path}: {e}")
+            self.discard()
+            return False
+
+    def discard(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+def playlist_cache_writer(playlist_id, name, cache_dir=DEFAULT_CACHE_DIR):
+    """Return a ``VideoListWriter`` that replaces the cached entry of a playlist on commit."""
+    return VideoListWriter(playlist_cache_path(playlist_id, cache_dir), {'playlist_id': playlist_id, 'name': name, 'fetched_at': time.time()})
@@ -0,0 +1,306 @@
+import errno
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+from tools.logger import get_logger
+
+logger = get_logger()
+
+# MPEG audio version ids from the frame header, and the layer id of Layer III.
+MPEG_1 = 3
+MPEG_2 = 2
+MPEG_25 = 0
+LAYER_3 = 1
+
+MONO = 3
+
+BITRATES = {
+    MPEG_1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    MPEG_2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+BITRATES[MPEG_25] = BITRATES[MPEG_2]
+
+SAMPLE_RATES = {
+    MPEG_1: (44100, 48000, 32000),
+    MPEG_2: (22050, 24000, 16000),
+    MPEG_25: (11025, 12000, 8000),
+}
+
+XING_FRAMES = 0x1
+XING_BYTES = 0x2
+XING_TOC = 0x4
+
+# 'Xing'/'Info' tag: id, flags, frame count, byte count and a 100-entry seek table.
+XING_TAG_SIZE = 4 + 4 + 4 + 4 + 100
+
+# Bytes copied per call when os.sendfile is not usable.
+COPY_BLOCK_SIZE = 1024 * 1024
+
+FrameHeader = namedtuple('FrameHeader', 'version bitrate_index sample_rate_index channel_mode length samples')
+
+class Mp3Stream(namedtuple('Mp3Stream', 'path ranges frames sample_rate samples_per_frame version channel_mode bitrates')):
+    """Frame layout of one MP3 file: the byte ranges holding audio frames and their format."""
+    __slots__ = ()
+
+    @property
+    def size(self):
+        return sum(end - start for start, end in self.ranges)
+
+    @property
+    def duration(self):
+        return self.frames * self.samples_per_frame / self.sample_rate
+
+class Mp3FormatError(ValueError):
+    """Raised when a file is not an MP3 stream this module can concatenate."""
+
+# Valid headers seen so far; a stream only uses a handful of distinct ones.
+_headers = {}
+
+# Cleared on platforms where os.sendfile only writes to sockets.
+_use_sendfile = hasattr(os, 'sendfile')
+
+def parse_header(data):
+    """Return the ``FrameHeader`` of 4 header bytes, or None if they are not a Layer III frame header."""
+    header = _headers.get(data)
+    if header is not None:
+        return header
+    b0, b1, b2, b3 = data
+    version = (b1 >> 3) & 3
+    layer = (b1 >> 1) & 3
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 3
+    if b0 != 0xFF or b1 & 0xE0 != 0xE0 or version == 1 or layer != LAYER_3 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    sample_rate = SAMPLE_RATES[version][sample_rate_index]
+    samples = 1152 if version == MPEG_1 else 576
+    length = samples // 8 * BITRATES[version][bitrate_index] * 1000 // sample_rate + ((b2 >> 1) & 1)
+    header = _headers[bytes(data)] = FrameHeader(version, bitrate_index, sample_rate_index, b3 >> 6, length, samples)
+    return header
+
+def _side_info_size(version, channel_mode):
+    if version == MPEG_1:
+        return 17 if channel_mode == MONO else 32
+    return 9 if channel_mode == MONO else 17
+
+def _id3v2_size(data):
+    """Return the size of the ID3v2 tag at the start of ``data``, or 0 if there is none."""
+    if len(data) < 10 or data[:3] != b'ID3':
+        return 0
+    size = 0
+    for byte in data[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+def _is_vbr_tag(data, position, header):
+    """Return True if the frame at ``position`` carries a Xing, Info or VBRI tag instead of audio."""
+    crc = 0 if data[position + 1] & 1 else 2
+    offset = position + 4 + crc + _side_info_size(header.version, header.channel_mode)
+    return data[offset:offset + 4] in (b'Xing', b'Info') or data[position + 36:position + 40] == b'VBRI'
+
+def _find_frame(data, position, end):
+    """Return the position of the next frame header that is followed by another one, or None."""
+    while True:
+        position = data.find(b'\xff', position, end - 3)
+        if position < 0:
+            return None
+        header = parse_header(data[position:position + 4])
+        if header is not None:
+            following = position + header.length
+            if following == end or (following + 4 <= end and parse_header(data[following:following + 4]) is not None):
+                return position
+        position += 1
+
+def _scan(path, data):
+    end = len(data)
+    position = _find_frame(data, _id3v2_size(data), end)
+    if position is None:
+        raise Mp3FormatError(f"{path} contains no MPEG Layer III frames.")
+
+    first = parse_header(data[position:position + 4])
+    stream_key = (first.version, first.sample_rate_index, first.channel_mode == MONO)
+    if _is_vbr_tag(data, position, first):
+        position += first.length
+
+    ranges = []
+    frames = 0
+    bitrates = set()
+    start = position
+    while position + 4 <= end:
+        header = parse_header(data[position:position + 4])
+        if header is None or position + header.length > end:
+            # Garbage or a trailing tag (ID3v1, APE): keep what came before and resync.
+            if position > start:
+                ranges.append((start, position))
+            resynced = _find_frame(data, position + 1, end)
+            if resynced is None:
+                start = position = end
+                break
+            start = position = resynced
+            continue
+        if (header.version, header.sample_rate_index, header.channel_mode == MONO) != stream_key:
+            raise Mp3FormatError(f"{path} changes sample rate or channel layout mid-stream.")
+        bitrates.add(header.bitrate_index)
+        frames += 1
+        position += header.length
+    if position > start:
+        ranges.append((start, position))
+
+    return Mp3Stream(
+        path, ranges, frames, SAMPLE_RATES[first.version][first.sample_rate_index], first.samples,
+        first.version, first.channel_mode, bitrates,
+    )
+
+def read_stream(path):
+    """Parse the frame layout of an MP3 file and return it as an ``Mp3Stream``.
+
+    Leading ID3v2 tags, a Xing/Info/VBRI header frame, trailing tags and any bytes between
+    frames are left out of the returned byte ranges.
+    """
+    with open(path, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise Mp3FormatError(f"{path} is empty.") from None
+        with data:
+            return _scan(path, data)
+
+def _xing_frame(stream, frames, size, toc, cbr):
+    """Build a silent frame carrying a Xing (or, for constant bitrate, Info) tag."""
+    side_info = _side_info_size(stream.version, stream.channel_mode)
+    needed = 4 + side_info + XING_TAG_SIZE
+    sample_rate_index = SAMPLE_RATES[stream.version].index(stream.sample_rate)
+    for bitrate_index in range(1, 15):
+        header = bytes((
+            0xFF,
+            0xE0 | (stream.version << 3) | (LAYER_3 << 1) | 1,
+            (bitrate_index << 4) | (sample_rate_index << 2),
+            stream.channel_mode << 6,
+        ))
+        length = parse_header(header).length
+        if length >= needed:
+            break
+    tag = struct.pack('>4sIII', b'Info' if cbr else b'Xing', XING_FRAMES | XING_BYTES | XING_TOC, frames, size + length) + bytes(toc)
+    frame = header + bytes(side_info) + tag
+    return frame + bytes(length - len(frame))
+
+def _seek_table(streams, frames, audio_bytes, tag_length):
+    """Return the 100-entry Xing seek table, interpolated linearly within each input file."""
+    toc = []
+    total = audio_bytes + tag_length
+    index = 0
+    frames_before = 0
+    bytes_before = tag_length
+    for percent in range(100):
+        target = percent * frames / 100
+        while index < len(streams) - 1 and frames_before + streams[index].frames <= target:
+            frames_before += streams[index].frames
+            bytes_before += streams[index].size
+            index += 1
+        stream = streams[index]
+        within = (target - frames_before) / stream.frames if stream.frames else 0
+        toc.append(min(255, int((bytes_before + within * stream.size) * 256 / total)))
+    return toc
+
+def _copy_ranges(out, path, ranges):
+    """Append the byte ranges of ``path`` to the unbuffered file ``out``."""
+    global _use_sendfile
+    ranges = list(ranges)
+    with open(path, 'rb') as f:
+        while ranges and _use_sendfile:
+            start, end = ranges[0]
+            try:
+                sent = os.sendfile(out.fileno(), f.fileno(), start, end - start)
+            except OSError as e:
+                if e.errno not in (errno.EINVAL, errno.ENOSYS, errno.ENOTSOCK, errno.EOPNOTSUPP):
+                    raise
+                _use_sendfile = False
+                break
+            if sent == 0:
+                raise Mp3FormatError(f"{path} was truncated while merging.")
+            ranges[0] = (start + sent, end)
+            if start + sent >= end:
+                ranges.pop(0)
+        if not ranges:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data, memoryview(data) as view:
+            for start, end in ranges:
+                for offset in range(start, end, COPY_BLOCK_SIZE):
+                    out.write(view[offset:min(end, offset + COPY_BLOCK_SIZE)])
+
+def _compatible(stream, first):
+    return (stream.version, stream.sample_rate, stream.channel_mode == MONO) == (first.version, first.sample_rate, first.channel_mode == MONO)
+
+class Mp3Writer:
+    """Appends MP3 streams to one output file as they become available.
+
+    The output starts with a placeholder Xing frame that ``close`` rewrites once the
+    totals are known, so frames can be written before the last input exists.
+    """
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.streams = []
+        self._out = open(output_path, 'wb', buffering=0)
+
+    def append(self, stream):
+        """Copy the frames of an ``Mp3Stream`` to the end of the output."""
+        if self.streams and not _compatible(stream, self.streams[0]):
+            raise Mp3FormatError(f"{stream.path} does not match the format of {self.streams[0].path}.")
+        if not self.streams:
+            self._out.write(_xing_frame(stream, 0, 0, bytes(100), True))
+        _copy_ranges(self._out, stream.path, stream.ranges)
+        self.streams.append(stream)
+
+    def close(self):
+        """Write the Xing header, close the output and return its duration in seconds."""
+        try:
+            if not self.streams:
+                raise Mp3FormatError("No files to concatenate.")
+            first = self.streams[0]
+            frames = sum(stream.frames for stream in self.streams)
+            audio_bytes = sum(stream.size for stream in self.streams)
+            cbr = len(set().union(*(stream.bitrates for stream in self.streams))) <= 1
+            tag_length = len(_xing_frame(first, frames, audio_bytes, bytes(100), cbr))
+            toc = _seek_table(self.streams, frames, audio_bytes, tag_length)
+            self._out.seek(0)
+            self._out.write(_xing_frame(first, frames, audio_bytes, toc, cbr))
+        finally:
+            self._out.close()
+        return frames * first.samples_per_frame / first.sample_rate
+
+    def discard(self):
+        """Close and delete an unfinished output."""
+        self._out.close()
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
+
+def concat_mp3(paths, output_path):
+    """Concatenate MP3 files frame by frame into ``output_path`` and return its duration in seconds.
+
+    Tags and per-file Xing headers are dropped and the output starts with one Xing header
+    describing the whole stream, so players show the right duration and can seek. Frames are
+    copied with ``os.sendfile`` where the platform allows it and from a memory map otherwise.
+    Encoder delay and padding from LAME headers are not carried over. Raises
+    ``Mp3FormatError`` if an input is not Layer III or the inputs differ in MPEG version,
+    sample rate or mono/stereo, which needs a re-encode.
+    """
+    streams = [read_stream(path) for path in paths]
+    if not streams:
+        raise Mp3FormatError("No files to concatenate.")
+    for stream in streams[1:]:
+        if not _compatible(stream, streams[0]):
+            raise Mp3FormatError(f"{stream.path} does not match the format of {streams[0].path}.")
+
+    writer = Mp3Writer(output_path)
+    try:
+        for stream in streams:
+            writer.append(stream)
+    except BaseException:
+        writer.discard()
+        raise
+    duration = writer.close()
+    logger.debug(f"Concatenated {len(streams)} MP3 files ({sum(stream.frames for stream in streams)} frames, {duration:.1f} s) into {output_path}")
+    return duration
@@ -0,0 +1,122 @@
+import bisect
+import json
+import os
+import re
+import time
+from collections import Counter, namedtuple
+
+from backend.metadata_cache import VideoListWriter
+from tools.logger import get_logger
+
+logger = get_logger()
+
+DEFAULT_SNAPSHOT_DIR = './data/cache/snapshots'
+
+class PlaylistDiff(namedtuple('PlaylistDiff', ['added', 'removed', 'moved', 'renamed', 'unchanged'])):
+    __slots__ = ()
+
+    @property
+    def changed(self):
+        return bool(self.added or self.removed or self.moved or self.renamed)
+
+def _snapshot_path(playlist_id, snapshot_dir):
+    safe_id = re.sub(r'[^\w-]', '_', playlist_id)
+    return os.path.join(snapshot_dir, f"{safe_id}.json")
+
+def load_snapshot(playlist_id, snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    """Return the videos recorded by the last sync of a playlist, or None if it was never synced."""
+    path = _snapshot_path(playlist_id, snapshot_dir)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable playlist snapshot {path}: {e}")
+        return None
+    return [tuple(video) for video in snapshot.get('videos', [])]
+
+def snapshot_writer(playlist_id, playlist_name, snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    """Return a ``VideoListWriter`` that records a streamed playlist as the next sync baseline on commit."""
+    return VideoListWriter(_snapshot_path(playlist_id, snapshot_dir), {'playlist_id': playlist_id, 'name': playlist_name, 'synced_at': time.time()})
+
+def save_snapshot(playlist_id, playlist_name, videos, snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    """Record the videos of a playlist as the baseline for the next sync."""
+    writer = snapshot_writer(playlist_id, playlist_name, snapshot_dir)
+    for video in videos:
+        writer.add(video)
+    if writer.commit():
+        logger.info(f"Saved snapshot of playlist {playlist_id} with {writer.count} videos.")
+
+def _longest_increasing_run(positions):
+    """Return the indexes of one longest strictly increasing subsequence of ``positions``."""
+    tails = []
+    tail_indexes = []
+    parents = [-1] * len(positions)
+    for i, position in enumerate(positions):
+        slot = bisect.bisect_left(tails, position)
+        if slot > 0:
+            parents[i] = tail_indexes[slot - 1]
+        if slot == len(tails):
+            tails.append(position)
+            tail_indexes.append(i)
+        else:
+            tails[slot] = position
+            tail_indexes[slot] = i
+
+    kept = set()
+    i = tail_indexes[-1] if tail_indexes else -1
+    while i != -1:
+        kept.add(i)
+        i = parents[i]
+    return kept
+
+def diff_playlists(old_videos, new_videos):
+    """Compare two entry lists by video ID.
+
+    Entries only present in ``new_videos`` are added and entries only present in
+    ``old_videos`` are removed. Of the entries present in both, moved is the smallest set
+    whose relative order changed and renamed holds those whose title or artist changed.
+    """
+    old_videos = old_videos or []
+    remaining = Counter(video_id for _title, _artist, video_id in old_videos)
+    old_positions = {}
+    for position, (_title, _artist, video_id) in enumerate(old_videos):
+        old_positions.setdefault(video_id, []).append(position)
+
+    added = []
+    common = []
+    for video in new_videos:
+        video_id = video[2]
+        if remaining[video_id] > 0:
+            remaining[video_id] -= 1
+            position = old_positions[video_id].pop(0)
+            common.append((position, old_videos[position], video))
+        else:
+            added.append(video)
+
+    removed = []
+    for video in old_videos:
+        if remaining[video[2]] > 0:
+            remaining[video[2]] -= 1
+            removed.append(video)
+
+    in_order = _longest_increasing_run([position for position, _old_video, _video in common])
+    moved = [video for i, (_position, _old_video, video) in enumerate(common) if i not in in_order]
+    renamed = [video for _position, old_video, video in common if tuple(old_video) != tuple(video)]
+    unchanged = [video for i, (_position, old_video, video) in enumerate(common) if i in in_order and tuple(old_video) == tuple(video)]
+    return PlaylistDiff(added, removed, moved, renamed, unchanged)
+
+def plan_sync(playlist_id, videos, snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    """Diff the freshly resolved ``videos`` of a playlist against its last snapshot."""
+    previous = load_snapshot(playlist_id, snapshot_dir)
+    diff = diff_playlists(previous, videos)
+    if previous is None:
+        logger.info(f"No snapshot for playlist {playlist_id}; all {len(videos)} videos are new.")
+    else:
+        logger.info(
+            f"Playlist {playlist_id} changed since last sync: {len(diff.added)} added, "
+            f"{len(diff.removed)} removed, {len(diff.moved)} moved, {len(diff.renamed)} renamed, "
+            f"{len(diff.unchanged)} unchanged."
+        )
+    return diff
@@ -0,0 +1,137 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from tools.logger import get_logger
+
+logger = get_logger()
+
+ERROR_THROTTLED = 'throttled'
+ERROR_TRANSIENT = 'transient'
+ERROR_PERMANENT = 'permanent'
+
+# Lower-cased fragments of yt-dlp and urllib error messages.
+THROTTLE_MARKERS = ('http error 429', 'too many requests', 'rate limit', 'rate-limit', "confirm you're not a bot", 'confirm you’re not a bot')
+TRANSIENT_MARKERS = (
+    'timed out', 'timeout', 'connection reset', 'connection refused', 'connection aborted', 'temporary failure',
+    'http error 5', 'remote end closed', 'incompleteread', 'incomplete read', 'unable to download', 'giving up after',
+    'network is unreachable', 'name resolution',
+)
+
+DEFAULT_BACKOFF_BASE = 1.0
+DEFAULT_BACKOFF_CAP = 60.0
+
+# A download whose throughput falls below the running average divided by this counts as slowed down.
+SLOW_FACTOR = 4.0
+# Concurrency is lowered at most once per interval, so one burst of errors halves it once.
+DECREASE_INTERVAL = 2.0
+
+def classify_error(error):
+    """Return ``ERROR_THROTTLED``, ``ERROR_TRANSIENT`` or ``ERROR_PERMANENT`` for a download error."""
+    message = str(error).lower()
+    if any(marker in message for marker in THROTTLE_MARKERS):
+        return ERROR_THROTTLED
+    if isinstance(error, (TimeoutError, ConnectionError)) or any(marker in message for marker in TRANSIENT_MARKERS):
+        return ERROR_TRANSIENT
+    return ERROR_PERMANENT
+
+def backoff_delay(attempt, base=DEFAULT_BACKOFF_BASE, cap=DEFAULT_BACKOFF_CAP):
+    """Return the delay before retry ``attempt`` (0-based): exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+class AdaptiveLimiter:
+    """Concurrency limit for downloads that adapts to how the server responds (AIMD).
+
+    Every ``limit`` successful downloads raise the limit by one, up to ``max_limit``.
+    Throttling, transient errors or a sharp drop in throughput halve it. Throttling also
+    pauses new downloads for a jittered, growing backoff.
+    """
+
+    def __init__(self, max_limit, initial=None, min_limit=1):
+        self.max_limit = max(min_limit, max_limit)
+        self.min_limit = min_limit
+        self.limit = max(min_limit, min(initial or self.max_limit, self.max_limit))
+        self._active = 0
+        self._successes = 0
+        self._throttles = 0
+        self._throughput = None
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self, cancel_event=None):
+        """Wait for a free slot; return False if ``cancel_event`` was set while waiting."""
+        with self._condition:
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    return False
+                pause = self._paused_until - time.monotonic()
+                if pause <= 0 and self._active < self.limit:
+                    self._active += 1
+                    return True
+                self._condition.wait(min(pause, 0.5) if pause > 0 else 0.5)
+
+    def release(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, cancel_event=None):
+        """Hold a slot for the block; yields False without one if canceled while waiting."""
+        acquired = self.acquire(cancel_event)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self.release()
+
+    def _decrease(self, reason):
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_INTERVAL:
+            return
+        self._last_decrease = now
+        self._successes = 0
+        limit = max(self.min_limit, self.limit // 2)
+        if limit != self.limit:
+            logger.info(f"Download concurrency lowered from {self.limit} to {limit} ({reason}).")
+            self.limit = limit
+
+    def success(self, seconds, size):
+        """Record a finished download of ``size`` bytes that took ``seconds``."""
+        with self._condition:
+            self._throttles = 0
+            throughput = size / seconds if seconds > 0 and size else None
+            if throughput is not None and self._throughput is not None and throughput * SLOW_FACTOR < self._throughput:
+                self._decrease("downloads slowed down")
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_limit:
+                    self._successes = 0
+                    self.limit += 1
+                    logger.debug(f"Download concurrency raised to {self.limit}.")
+            if throughput is not None:
+                self._throughput = throughput if self._throughput is None else 0.8 * self._throughput + 0.2 * throughput
+            self._condition.notify_all()
+
+    def failure(self, kind):
+        """Record a failed download whose error was classified as ``kind``."""
+        with self._condition:
+            if kind == ERROR_THROTTLED:
+                self._decrease("throttled")
+                pause = backoff_delay(self._throttles, base=2 * DEFAULT_BACKOFF_BASE)
+                self._throttles += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+                logger.warning(f"Throttled by the server; pausing new downloads for {pause:.1f} s.")
+            elif kind == ERROR_TRANSIENT:
+                self._decrease("transient errors")
+
+    def wait_for_pause(self, cancel_event=None):
+        """Block until a throttling pause is over."""
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            if cancel_event is not None:
+                cancel_event.wait(pause)
+            else:
+                time.sleep(pause)
@@ -0,0 +1,134 @@
+import threading
+import traceback
+from contextlib import contextmanager
+from queue import Empty, LifoQueue
+
+from tools.logger import get_logger
+
+logger = get_logger()
+
+DEFAULT_POOL_SIZE = 8
+
+def create_youtube_dl(ydl_opts):
+    """Create a YoutubeDL instance, importing yt-dlp on first use."""
+    from yt_dlp import YoutubeDL
+    return YoutubeDL(ydl_opts)
+
+class YoutubeDLSessionPool:
+    """Thread-safe pool of long-lived YoutubeDL instances that share the same options.
+
+    Instances keep their HTTP connections, cookies and extractor state between uses.
+    Each instance is handed to one thread at a time, and at most ``max_size`` exist at once.
+    """
+
+    def __init__(self, ydl_opts, max_size=DEFAULT_POOL_SIZE, factory=create_youtube_dl):
+        self.ydl_opts = dict(ydl_opts)
+        self.max_size = max_size
+        self.factory = factory
+        self._idle = LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._sessions = []
+        self._closed = False
+
+    def _create_session(self):
+        try:
+            session = self.factory(dict(self.ydl_opts))
+        except Exception as e:
+            logger.error(f"Error occurred while creating YoutubeDL session: {e.__class__.__name__}: {e}")
+            logger.debug(traceback.format_exc())
+            raise
+        with self._lock:
+            self._sessions.append(session)
+        logger.debug(f"Created YoutubeDL session {len(self._sessions)}/{self.max_size}.")
+        return session
+
+    def acquire(self):
+        """Check out an idle session, creating one while the pool is below its size."""
+        if self._closed:
+            raise RuntimeError("YoutubeDL session pool is closed.")
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+        try:
+            return self._create_session()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, session, discard=False):
+        """Return a session to the pool, or drop it when ``discard`` is set."""
+        if discard or self._closed:
+            self._close_session(session)
+        else:
+            self._idle.put(session)
+        self._slots.release()
+
+    @contextmanager
+    def session(self):
+        session = self.acquire()
+        try:
+            yield session
+        except BaseException as e:
+            from yt_dlp.utils import DownloadError
+
+            # A session that failed outside of yt-dlp's own error reporting may be left in
+            # an inconsistent state, so it is replaced rather than reused.
+            self.release(session, discard=not isinstance(e, DownloadError))
+            raise
+        else:
+            self.release(session)
+
+    def _close_session(self, session):
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+        try:
+            session.close()
+        except Exception as e:
+            logger.warning(f"Failed to close YoutubeDL session: {e}")
+
+    def close(self):
+        """Close every idle session; sessions still in use are closed when released."""
+        self._closed = True
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except Empty:
+                break
+            self._close_session(session)
+
+_pools = {}
+_pools_lock = threading.Lock()
+_factory = create_youtube_dl
+
+def set_session_factory(factory=create_youtube_dl):
+    """Create the sessions of all shared pools with ``factory(ydl_opts)`` from now on.
+
+    Existing pools are closed. Used to run the backend against a stand-in extractor, as
+    dev/bench_pipeline.py does.
+    """
+    global _factory
+    close_session_pools()
+    with _pools_lock:
+        _factory = factory
+
+def get_session_pool(name, ydl_opts, max_size=DEFAULT_POOL_SIZE):
+    """Return the shared session pool registered under ``name``, creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None or pool._closed:
+            pool = YoutubeDLSessionPool(ydl_opts, max_size=max_size, factory=_factory)
+            _pools[name] = pool
+            logger.info(f"YoutubeDL session pool '{name}' created (max {max_size} sessions).")
+        return pool
+
+def close_session_pools():
+    """Close all shared session pools."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
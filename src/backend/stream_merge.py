@@ -0,0 +1,268 @@
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+from backend.cancellation import OperationCanceled
+from backend.downloader import AUDIO_ENCODERS, DEFAULT_AUDIO_FORMAT, DEFAULT_OUTPUT_FORMAT, merge_volumes, output_filename
+from backend.library_index import KIND_OUTPUT, get_library_index
+from backend.mp3_concat import Mp3FormatError, Mp3Writer, read_stream
+from backend.track_store import get_track_store
+from tools.logger import get_logger
+from tools.metrics import STATUS_FAILED, file_size, measure
+
+logger = get_logger()
+
+# Raw PCM handed from the per-track decoders to the encoder. libopus only takes 48 kHz.
+PIPE_CHANNELS = 2
+PIPE_SAMPLE_RATES = {'opus': 48000}
+DEFAULT_PIPE_SAMPLE_RATE = 44100
+
+PIPE_BUFFER_SIZE = 1024 * 1024
+
+def _creationflags():
+    return subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+
+class _EncoderSink:
+    """One ffmpeg process that encodes the output from raw PCM on its stdin.
+
+    Each track is decoded to PCM by a short-lived ffmpeg whose stdout is copied into the
+    encoder, so the output is encoded once whatever the formats of the tracks.
+    """
+
+    def __init__(self, output_path, output_format):
+        self.output_path = output_path
+        self.pcm_args = ['-f', 's16le', '-ar', str(PIPE_SAMPLE_RATES.get(output_format, DEFAULT_PIPE_SAMPLE_RATE)), '-ac', str(PIPE_CHANNELS)]
+        self.process = subprocess.Popen(
+            ['ffmpeg', '-y', '-loglevel', 'error', *self.pcm_args, '-i', 'pipe:0', '-vn', *AUDIO_ENCODERS[output_format], output_path],
+            stdin=subprocess.PIPE, creationflags=_creationflags(),
+        )
+        self._decoder = None
+        self._interrupted = False
+
+    def append(self, path):
+        decoder = self._decoder = subprocess.Popen(
+            ['ffmpeg', '-loglevel', 'error', '-i', path, '-vn', *self.pcm_args, 'pipe:1'],
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, creationflags=_creationflags(),
+        )
+        try:
+            shutil.copyfileobj(decoder.stdout, self.process.stdin, PIPE_BUFFER_SIZE)
+        except OSError:
+            if not self._interrupted:
+                raise
+        finally:
+            decoder.stdout.close()
+            returncode = decoder.wait()
+            self._decoder = None
+        if self._interrupted:
+            raise OperationCanceled("Streaming merge canceled.")
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, decoder.args)
+
+    def interrupt(self):
+        """Kill the decoder and the encoder, so that a running ``append`` returns at once."""
+        self._interrupted = True
+        for process in (self._decoder, self.process):
+            if process is not None and process.poll() is None:
+                process.kill()
+
+    def close(self):
+        """Finish encoding. The duration is not known here, so None is returned."""
+        self.process.stdin.close()
+        returncode = self.process.wait()
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, self.process.args)
+        return None
+
+    def discard(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
+
+class _FrameSink:
+    """Appends the frames of MP3 tracks to an MP3 output without decoding them."""
+
+    def __init__(self, output_path):
+        self.writer = Mp3Writer(output_path)
+
+    def append(self, path):
+        self.writer.append(read_stream(path))
+
+    def interrupt(self):
+        """Nothing to stop: appending one track is a single short copy."""
+
+    def close(self):
+        return self.writer.close()
+
+    def discard(self):
+        self.writer.discard()
+
+class StreamingMerger:
+    """Builds the merged output of a playlist while its tracks are still being processed.
+
+    Wrap the playlist with ``track_order`` before handing it to ``download_videos`` and
+    pass ``track_ready`` as its ``track_callback``. A feeder thread appends each track to
+    the output as soon as it and every track before it are ready, so the output is
+    complete moments after the last track instead of after a separate merge pass.
+
+    MP3 tracks merged into an MP3 output are appended frame by frame; otherwise every
+    track is decoded into one long-running ffmpeg encoder, and the merger raises
+    RuntimeError up front if ffmpeg is not installed. If the output rejects a track, e.g.
+    an MP3 with another sample rate, streaming stops and ``finish`` merges all tracks with
+    ``merge_volumes`` instead. ``finish`` returns the output path, or None on failure, in
+    which case the tracks are kept; ``abort`` stops the running ffmpeg processes at once
+    and deletes the partial output.
+    """
+
+    def __init__(self, playlist_name, output_dir="./data/output", output_format=DEFAULT_OUTPUT_FORMAT, audio_format=DEFAULT_AUDIO_FORMAT, playlist_id=None):
+        self.frame_copy = output_format == 'mp3' and audio_format == 'mp3'
+        if not self.frame_copy and shutil.which('ffmpeg') is None:
+            raise RuntimeError(f"Merging {audio_format} tracks into {output_format} needs ffmpeg, which is not installed.")
+        os.makedirs(output_dir, exist_ok=True)
+        self.playlist_name = playlist_name
+        self.playlist_id = playlist_id
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.output_path = os.path.abspath(os.path.join(output_dir, output_filename(playlist_name, output_format)))
+        self.fed = []
+        self.failed = False
+        self.fallback = False
+        self._order = []
+        self._ready = {}
+        self._closed = False
+        self._aborted = False
+        self._finished = False
+        self._condition = threading.Condition()
+        self._sink = _FrameSink(self.output_path) if self.frame_copy else _EncoderSink(self.output_path, output_format)
+        self._feeder = threading.Thread(target=self._feed, name="merge-feeder", daemon=True)
+        self._feeder.start()
+        logger.info(f"Streaming merge into {self.output_path} ({'frame copy' if self.frame_copy else 'single encode'}).")
+
+    def track_order(self, videos):
+        """Pass ``videos`` through, recording the playlist order of their IDs."""
+        for video in videos:
+            with self._condition:
+                self._order.append(video[2])
+                self._condition.notify()
+            yield video
+
+    def track_ready(self, video_id, path):
+        """Report the processed file of a track, or None if it failed."""
+        with self._condition:
+            self._ready[video_id] = path
+            self._condition.notify()
+
+    def _next_path(self, position):
+        """Wait for the track at ``position``; return (path, True), or (None, False) when there is none."""
+        with self._condition:
+            while not self._aborted:
+                if position < len(self._order) and self._order[position] in self._ready:
+                    return self._ready[self._order[position]], True
+                if self._closed and position >= len(self._order):
+                    break
+                self._condition.wait()
+            return None, False
+
+    def _feed(self):
+        position = 0
+        while True:
+            path, more = self._next_path(position)
+            if not more:
+                return
+            position += 1
+            if not path:
+                continue
+            try:
+                with measure('feed', streaming=True) as sample:
+                    self._sink.append(path)
+                    sample['bytes'] = file_size(path)
+                self.fed.append(path)
+            except OperationCanceled:
+                return
+            except (Mp3FormatError, subprocess.CalledProcessError) as e:
+                logger.warning(f"Cannot stream {path} into the merged output, merging all tracks once they are ready: {e}")
+                self.fallback = True
+                return
+            except Exception as e:
+                logger.error(f"Streaming merge failed at {path}: {e}")
+                self.failed = True
+                with self._condition:
+                    self._aborted = True
+                return
+
+    def _release_tracks(self, delete):
+        """Unpin the stored tracks and, with ``delete``, remove the ones the track store does not own."""
+        with self._condition:
+            paths = list(dict.fromkeys(path for path in self._ready.values() if path))
+        track_store = get_track_store()
+        if delete:
+            for path in paths:
+                if not track_store.owns(path) and os.path.exists(path):
+                    os.remove(path)
+        track_store.release(paths)
+
+    def finish(self):
+        """Wait for the remaining tracks, complete the output and return its path, or None."""
+        started = time.perf_counter()
+        with self._condition:
+            self._finished = True
+            self._closed = True
+            self._condition.notify()
+        self._feeder.join()
+        if self.fallback:
+            return self._merge_in_one_pass()
+        output_path = None
+        try:
+            with measure('merge', streaming=True, tracks=len(self.fed)) as sample:
+                if self.failed or not self.fed:
+                    sample['status'] = STATUS_FAILED
+                    self._sink.discard()
+                else:
+                    duration = self._sink.close()
+                    sample['bytes'] = file_size(self.output_path)
+                    output_path = self.output_path
+        except (Mp3FormatError, subprocess.CalledProcessError, OSError) as e:
+            logger.error(f"Completing the streaming merge failed: {e}")
+            self._sink.discard()
+
+        try:
+            if output_path:
+                library = get_library_index()
+                library.tag_playlist(self.fed, self.playlist_id, self.playlist_name)
+                if duration is None:
+                    duration = library.total_duration(self.fed)
+                library.record(output_path, KIND_OUTPUT, duration=duration, playlist_id=self.playlist_id, playlist_name=self.playlist_name)
+                logger.info(f"Merged {len(self.fed)} tracks into {output_path}, {time.perf_counter() - started:.2f} s after the last track.")
+        finally:
+            self._release_tracks(delete=output_path is not None)
+        return output_path
+
+    def _merge_in_one_pass(self):
+        """Merge every ready track with ``merge_volumes`` after the streamed output rejected one."""
+        self._sink.discard()
+        with self._condition:
+            paths = [self._ready[video_id] for video_id in self._order if self._ready.get(video_id)]
+        # The output directory doubles as the work directory for ffmpeg's concat lists.
+        output_paths = merge_volumes(self.playlist_name, paths, self.output_dir, self.output_dir, self.output_format, self.playlist_id, keep_tracks=True)
+        if not output_paths:
+            logger.error(f"Merging the tracks of {self.playlist_name} failed; the tracks are kept.")
+        self._release_tracks(delete=bool(output_paths))
+        return output_paths[0] if output_paths else None
+
+    def abort(self):
+        """Stop feeding and delete the partial output. Does nothing once ``finish`` was called."""
+        with self._condition:
+            if self._finished:
+                return
+            self._finished = True
+            self._aborted = True
+            self._condition.notify()
+        self._sink.interrupt()
+        self._feeder.join()
+        self._sink.discard()
+        # Processed tracks stay on disk so that a resumed job can pick them up.
+        self._release_tracks(delete=False)
+        logger.info(f"Streaming merge into {self.output_path} aborted.")
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+
+from tools.logger import get_logger
+
+logger = get_logger()
+
+DEFAULT_STORE_DIR = './data/cache/tracks'
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024 * 1024
+INDEX_FILENAME = 'index.json'
+
+# Seconds between index writes while tracks are only being looked up and added; the index
+# is also written whenever tracks are released and when the store is flushed.
+INDEX_SAVE_INTERVAL = 30.0
+
+def settings_digest(settings):
+    """Return a short, stable digest of a JSON-serializable settings object."""
+    encoded = json.dumps(settings, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()[:12]
+
+class TrackStore:
+    """Persistent store of processed tracks keyed by video ID and audio settings.
+
+    The store is kept under ``max_bytes`` by evicting the least recently used tracks.
+    Tracks handed out by ``get`` or ``put`` are pinned until ``release`` is called, so a
+    running job never loses files it is about to merge. Lookups and inserts update the
+    index in memory; it is written to disk in batches, and stored files the index missed
+    after a crash are picked up again when the store is opened.
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.store_dir = os.path.abspath(store_dir)
+        self.max_bytes = max_bytes
+        self._index_path = os.path.join(self.store_dir, INDEX_FILENAME)
+        self._lock = threading.RLock()
+        self._pins = Counter()
+        self._listeners = []
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._entries = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            entries = {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Rebuilding unreadable track store index {self._index_path}: {e}")
+            entries = {}
+        entries = {key: entry for key, entry in entries.items() if os.path.exists(os.path.join(self.store_dir, entry['filename']))}
+        known = {entry['filename'] for entry in entries.values()}
+        with os.scandir(self.store_dir) as files:
+            for file in files:
+                key = os.path.splitext(file.name)[0]
+                if file.name in known or file.name.startswith(INDEX_FILENAME) or '-' not in key or not file.is_file():
+                    continue
+                stat = file.stat()
+                entries[key] = {'video_id': key.rsplit('-', 1)[0], 'filename': file.name, 'size': stat.st_size, 'last_access': stat.st_mtime}
+                logger.info(f"Recovered cached track {file.name} missing from the index.")
+        return entries
+
+    def _save_index(self):
+        tmp_path = f"{self._index_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self._index_path)
+            self._dirty = False
+            self._saved_at = time.monotonic()
+            self._notify(self._index_path)
+        except OSError as e:
+            logger.error(f"Failed to write track store index {self._index_path}: {e}")
+
+    def _changed(self):
+        """Note an index change and write the index if the last write is old enough. Call with the lock held."""
+        self._dirty = True
+        if time.monotonic() - self._saved_at >= INDEX_SAVE_INTERVAL:
+            self._save_index()
+
+    def flush(self):
+        """Write pending index changes to disk."""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def add_listener(self, callback):
+        """Call ``callback(path)`` whenever a file is added to or evicted from the store, or the index is written."""
+        self._listeners.append(callback)
+
+    def _notify(self, path):
+        for callback in self._listeners:
+            try:
+                callback(path)
+            except Exception as e:
+                logger.error(f"Track store listener failed for {path}: {e}")
+
+    @staticmethod
+    def make_key(video_id, settings):
+        return f"{video_id}-{settings_digest(settings)}"
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return sum(entry['size'] for entry in self._entries.values())
+
+    def owns(self, path):
+        """Return True if ``path`` points into the store directory."""
+        return os.path.dirname(os.path.abspath(path)) == self.store_dir
+
+    def get(self, video_id, settings):
+        """Return the stored path of a track and pin it, or None if it is not stored."""
+        key = self.make_key(video_id, settings)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            path = os.path.join(self.store_dir, entry['filename'])
+            if not os.path.exists(path):
+                del self._entries[key]
+                self._changed()
+                return None
+            entry['last_access'] = time.time()
+            self._pins[key] += 1
+            self._changed()
+            return path
+
+    def put(self, video_id, settings, source_path):
+        """Move a processed track into the store, pin it and return its stored path."""
+        key = self.make_key(video_id, settings)
+        ext = os.path.splitext(source_path)[1]
+        filename = f"{key}{ext}"
+        path = os.path.join(self.store_dir, filename)
+        with self._lock:
+            shutil.move(source_path, path)
+            self._entries[key] = {
+                'video_id': video_id,
+                'filename': filename,
+                'size': os.path.getsize(path),
+                'last_access': time.time(),
+            }
+            self._pins[key] += 1
+            self._evict()
+            self._changed()
+        self._notify(path)
+        return path
+
+    def release(self, paths):
+        """Unpin the stored tracks among ``paths`` and evict down to the disk budget."""
+        with self._lock:
+            for path in paths:
+                if not self.owns(path):
+                    continue
+                key = os.path.splitext(os.path.basename(path))[0]
+                if self._pins[key] > 0:
+                    self._pins[key] -= 1
+                if self._pins[key] <= 0:
+                    del self._pins[key]
+            self._evict()
+            if self._dirty:
+                self._save_index()
+
+    def _evict(self):
+        total = sum(entry['size'] for entry in self._entries.values())
+        if total <= self.max_bytes:
+            return
+        for key, entry in sorted(self._entries.items(), key=lambda item: item[1]['last_access']):
+            if total <= self.max_bytes:
+                break
+            if self._pins.get(key):
+                continue
+            path = os.path.join(self.store_dir, entry['filename'])
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                logger.warning(f"Failed to evict cached track {path}: {e}")
+                continue
+            total -= entry['size']
+            del self._entries[key]
+            self._dirty = True
+            self._notify(path)
+            logger.info(f"Evicted cached track {entry['filename']} ({entry['size']} bytes).")
+
+class PinnedTracks:
+    """Collects the tracks a job has processed, so that they can be unpinned if it never merges them.
+
+    Pass ``track_ready`` as the ``track_callback`` of ``download_videos``; it forwards to
+    ``callback`` if one is given. Call ``handed_off`` once the tracks were passed to a merge,
+    which releases them itself, and ``release`` on every exit path of the job.
+    """
+
+    def __init__(self, callback=None):
+        self.paths = []
+        self._callback = callback
+        self._handed_off = False
+
+    def track_ready(self, video_id, path):
+        if path:
+            self.paths.append(path)
+        if self._callback is not None:
+            self._callback(video_id, path)
+
+    def handed_off(self):
+        self._handed_off = True
+
+    def release(self):
+        if not self._handed_off and self.paths:
+            get_track_store().release(list(dict.fromkeys(self.paths)))
+            self._handed_off = True
+
+_store = None
+_store_lock = threading.Lock()
+
+def configure_track_store(store_dir=DEFAULT_STORE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    """Replace the shared track store with one using the given directory and disk budget."""
+    global _store
+    with _store_lock:
+        _store = TrackStore(store_dir, max_bytes)
+        return _store
+
+def get_track_store():
+    """Return the shared track store, creating it with the default settings on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TrackStore()
+        return _store
+
+def flush_track_store():
+    """Write the pending index changes of the shared track store, if one was created."""
+    with _store_lock:
+        store = _store
+    if store is not None:
+        store.flush()
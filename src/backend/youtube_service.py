@@ -1,76 +1,166 @@
+import time
 import traceback
-from yt_dlp import YoutubeDL
 
+from backend.metadata_cache import DEFAULT_TTL, load_playlist, playlist_cache_writer
+from backend.session_pool import get_session_pool
 from tools.logger import get_logger
+from tools.metrics import STATUS_CANCELED, STATUS_FAILED, STATUS_OK, measure, record
 
 logger = get_logger()
 
-def get_youtube_client():
-    """Create and return a YoutubeDL client."""
+METADATA_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'extract_flat': 'in_playlist',
+}
+
+def get_metadata_pool():
+    """Return the shared pool of YoutubeDL clients used for playlist extraction."""
+    return get_session_pool('metadata', METADATA_OPTS)
+
+def warm_up():
+    """Import yt-dlp and create a metadata client ahead of the first playlist request."""
     try:
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': 'in_playlist',
-        }
-        client = YoutubeDL(ydl_opts)
-        logger.info("YoutubeDL client created successfully.")
-        return client
+        with get_metadata_pool().session():
+            pass
+        logger.info("YoutubeDL warmed up.")
     except Exception as e:
-        error_message = f"Error occurred while creating YoutubeDL client: {e.__class__.__name__}: {e}"
-        detailed_traceback = traceback.format_exc()
-        logger.error(error_message)
-        logger.debug(detailed_traceback)
-        raise
+        logger.warning(f"Failed to warm up YoutubeDL: {e.__class__.__name__}: {e}")
 
-def get_playlist_name(playlist_id):
-    """Fetch the name of a YouTube playlist given its ID."""
-    try:
-        client = get_youtube_client()
-        playlist_url = f'https://www.youtube.com/playlist?list={playlist_id}'
-        info = client.extract_info(playlist_url, download=False)
+MAX_URL_REDIRECTS = 3
+
+def _extract_playlist_info(client, playlist_url):
+    """Extract a playlist without processing it, so its entries stay a lazy page iterator."""
+    info = client.extract_info(playlist_url, download=False, process=False)
+    for _ in range(MAX_URL_REDIRECTS):
+        if not info or info.get('_type') not in ('url', 'url_transparent'):
+            break
+        info = client.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+    return info
+
+def _iter_entries(info):
+    for entry in info.get('entries') or []:
+        if not entry:
+            continue
+        title = entry.get('title') or 'Unknown Title'
+        artist = entry.get('uploader') or entry.get('channel') or 'Unknown Artist'
+        video_id = entry.get('id')
         
-        if info and 'title' in info:
-            playlist_name = info['title']
-            logger.info(f"Playlist name fetched successfully: {playlist_name}")
-            return playlist_name
-        else:
-            logger.warning(f"No playlist found with ID: {playlist_id}")
-            return None
+        if video_id:
+            yield title, artist, video_id
+
+def _cached_entries(playlist_id, videos, progress_callback=None, cancel_event=None):
+    with measure('resolve', playlist_id=playlist_id, cached=True) as sample:
+        for count, video in enumerate(videos, 1):
+            if cancel_event is not None and cancel_event.is_set():
+                sample['status'] = STATUS_CANCELED
+                return
+            if progress_callback is not None:
+                progress_callback(count)
+            sample['entries'] = count
+            yield video
+
+def _fetched_entries(playlist_id, info, pool, client, started, progress_callback=None, cancel_event=None):
+    """Yield the entries of an extracted playlist page by page, caching them as they pass."""
+    from yt_dlp.utils import DownloadError
+
+    writer = playlist_cache_writer(playlist_id, info['title'])
+    status = STATUS_OK
+    count = 0
+    discard = False
+    try:
+        for video in _iter_entries(info):
+            if cancel_event is not None and cancel_event.is_set():
+                logger.info(f"Resolution of playlist {playlist_id} canceled after {count} videos.")
+                status = STATUS_CANCELED
+                return
+            writer.add(video)
+            count += 1
+            if progress_callback is not None:
+                progress_callback(count)
+            yield video
+        if count:
+            writer.commit()
+        logger.info(f"Playlist '{info['title']}' fetched successfully with {count} videos.")
+    except GeneratorExit:
+        status = STATUS_CANCELED
+        raise
     except Exception as e:
-        error_message = f"An error occurred while fetching the playlist name: {e.__class__.__name__}: {e}"
-        detailed_traceback = traceback.format_exc()
-        logger.error(error_message)
-        logger.debug(detailed_traceback)
+        status = STATUS_FAILED
+        discard = not isinstance(e, DownloadError)
+        logger.error(f"An error occurred while fetching the playlist: {e.__class__.__name__}: {e}")
+        logger.debug(traceback.format_exc())
         raise
+    finally:
+        if status != STATUS_OK or not count:
+            writer.discard()
+        pool.release(client, discard=discard)
+        record('resolve', time.perf_counter() - started, status=status, playlist_id=playlist_id, cached=False, entries=count)
+
+def stream_playlist(playlist_id, refresh=False, ttl=DEFAULT_TTL, progress_callback=None, cancel_event=None):
+    """Open a YouTube playlist and return ``(name, entries)`` without waiting for all of its pages.
+
+    ``entries`` is a generator of ``(title, artist, video_id)`` that yields each entry as
+    soon as yt-dlp has read its page, so exporting and downloading can start right away.
+    It holds a metadata session until it is exhausted or closed. Fetched entries are
+    written to the playlist cache as they pass and the cache entry is committed once the
+    last page was read; fresh cache entries are served instead unless ``refresh`` is set.
+    The generator stops early once ``cancel_event`` is set. Returns ``(None, None)`` if
+    the playlist could not be opened.
+    """
+    if not refresh:
+        cached = load_playlist(playlist_id, ttl=ttl)
+        if cached is not None:
+            playlist_name, videos = cached
+            return playlist_name, _cached_entries(playlist_id, videos, progress_callback, cancel_event)
+
+    started = time.perf_counter()
+    pool = get_metadata_pool()
+    try:
+        client = pool.acquire()
+    except Exception as e:
+        logger.error(f"An error occurred while fetching the playlist: {e.__class__.__name__}: {e}")
+        record('resolve', time.perf_counter() - started, status=STATUS_FAILED, playlist_id=playlist_id)
+        return None, None
 
-def get_playlist_items(playlist_id):
-    """Fetch the items (videos) from a YouTube playlist."""
     try:
-        client = get_youtube_client()
         playlist_url = f'https://www.youtube.com/playlist?list={playlist_id}'
-        info = client.extract_info(playlist_url, download=False)
-
-        videos = []
-
-        if 'entries' in info:
-            for entry in info['entries']:
-                title = entry.get('title', 'Unknown Title')
-                artist = entry.get('uploader', 'Unknown Artist')
-                video_id = entry.get('id')
-                
-                if video_id:
-                    videos.append((title, artist, video_id))
-
-        if videos:
-            logger.info(f"Fetched {len(videos)} videos from playlist ID: {playlist_id}")
-            return videos
-        else:
-            logger.warning(f"No videos found in playlist ID: {playlist_id}")
-            return None
+        info = _extract_playlist_info(client, playlist_url)
     except Exception as e:
-        error_message = f"An error occurred while fetching the playlist items: {e.__class__.__name__}: {e}"
-        detailed_traceback = traceback.format_exc()
-        logger.error(error_message)
-        logger.debug(detailed_traceback)
-        return None
\ No newline at end of file
+        from yt_dlp.utils import DownloadError
+
+        pool.release(client, discard=not isinstance(e, DownloadError))
+        logger.error(f"An error occurred while fetching the playlist: {e.__class__.__name__}: {e}")
+        logger.debug(traceback.format_exc())
+        record('resolve', time.perf_counter() - started, status=STATUS_FAILED, playlist_id=playlist_id)
+        return None, None
+
+    if not info or 'title' not in info:
+        pool.release(client)
+        logger.warning(f"No playlist found with ID: {playlist_id}")
+        record('resolve', time.perf_counter() - started, status=STATUS_FAILED, playlist_id=playlist_id)
+        return None, None
+    return info['title'], _fetched_entries(playlist_id, info, pool, client, started, progress_callback, cancel_event)
+
+def get_playlist(playlist_id, refresh=False, ttl=DEFAULT_TTL, progress_callback=None, cancel_event=None):
+    """Fetch the name and items of a YouTube playlist with a single extraction.
+
+    Results are served from the on-disk playlist cache while they are younger than ``ttl``
+    seconds, unless ``refresh`` is set. Entries are read page by page as yt-dlp fetches
+    them; ``progress_callback(count)`` is called with the number of entries read so far,
+    and resolution stops once ``cancel_event`` is set. Returns ``(None, None)`` if the
+    playlist could not be fetched or resolution was canceled.
+    """
+    playlist_name, entries = stream_playlist(playlist_id, refresh, ttl, progress_callback, cancel_event)
+    if playlist_name is None:
+        return None, None
+    try:
+        videos = list(entries)
+    except Exception:
+        return None, None
+    if cancel_event is not None and cancel_event.is_set():
+        return None, None
+
+    if not videos:
+        logger.warning(f"No videos found in playlist ID: {playlist_id}")
+    return playlist_name, videos or None
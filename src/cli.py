@@ -0,0 +1,246 @@
+"""Headless batch entry point.
+
+Run from the repository root with ``python src/cli.py`` or ``PYTHONPATH=src python -m cli``.
+Progress is written to stdout as one JSON object per line, and the exit status is 0 when
+every playlist succeeded, 1 when any failed and 2 on invalid arguments. With ``--daemon``
+the playlists are submitted to a running ``daemon.py`` and its events are printed instead.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from tools.logger import LoggerSetup
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+DOWNLOAD_DIR = './data/downloads'
+OUTPUT_DIR = './data/output'
+LOG_DIR = './logs'
+# The GUI owns latest.log; the CLI logs to its own file so both can run at once.
+CLI_LOG_FILE = 'cli.log'
+DAEMON_HOST = '127.0.0.1'
+DAEMON_PORT = 8765
+
+_emit_lock = threading.Lock()
+
+def emit(event, **fields):
+    """Write one JSON progress event to stdout."""
+    record = {'event': event, 'time': round(time.time(), 3), **fields}
+    with _emit_lock:
+        sys.stdout.write(json.dumps(record, ensure_ascii=False) + '\n')
+        sys.stdout.flush()
+
+def read_playlist_ids(args):
+    playlist_ids = list(args.playlist_ids)
+    for path in args.file or []:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    playlist_ids.append(line)
+    return list(dict.fromkeys(playlist_ids))
+
+def process_batch(playlist_ids, args, succeeded, failed):
+    """Resolve all playlists, process each unique track once and merge every playlist.
+
+    The IDs of finished playlists are appended to ``succeeded`` or ``failed``.
+    """
+    from backend.batch import resolve_batch, run_batch
+    from backend.downloader import output_filename, volume_filename
+    from backend.jobs import failure_fields
+    from backend.playlist_sync import plan_sync
+
+    for playlist_id in playlist_ids:
+        emit('start', playlist_id=playlist_id)
+    plan = resolve_batch(playlist_ids, refresh=args.refresh or args.sync)
+    for playlist_id in plan.failed:
+        emit('error', playlist_id=playlist_id, message="Failed to retrieve playlist.")
+        failed.append(playlist_id)
+    for playlist in list(plan.playlists):
+        emit('resolved', playlist_id=playlist.playlist_id, name=playlist.name, videos=len(playlist.videos))
+        if args.sync:
+            diff = plan_sync(playlist.playlist_id, playlist.videos)
+            existing = [
+                path for path in (
+                    os.path.join(args.output_dir, output_filename(playlist.name, args.output_format)),
+                    os.path.join(args.output_dir, volume_filename(playlist.name, 1, args.output_format)),
+                ) if os.path.exists(path)
+            ]
+            if not diff.changed and existing:
+                emit('done', playlist_id=playlist.playlist_id, status='unchanged', output=os.path.abspath(existing[0]))
+                succeeded.append(playlist.playlist_id)
+                plan.drop(playlist.playlist_id)
+    if not plan.playlists:
+        return
+    emit('batch', playlists=len(plan.playlists), entries=plan.entries, unique=len(plan.unique_videos))
+
+    if args.no_download:
+        from backend.file_handler import write_to_file
+        for playlist in plan.playlists:
+            write_to_file(playlist.videos, playlist.name)
+            emit('done', playlist_id=playlist.playlist_id, status='exported', videos=len(playlist.videos))
+            succeeded.append(playlist.playlist_id)
+        return
+
+    def merged(playlist_id, output_paths):
+        if output_paths:
+            emit('done', playlist_id=playlist_id, status='merged', output=output_paths[0], outputs=output_paths)
+            succeeded.append(playlist_id)
+        else:
+            emit('error', playlist_id=playlist_id, message="Failed to merge tracks.")
+            failed.append(playlist_id)
+
+    failures = []
+    run_batch(
+        plan,
+        download_dir=args.download_dir,
+        output_dir=args.output_dir,
+        max_workers=args.workers,
+        progress_callback=lambda completed, total: emit('progress', completed=completed, total=total),
+        audio_format=args.audio_format,
+        output_format=args.output_format,
+        merge_callback=merged,
+        max_volume_seconds=args.max_volume_minutes * 60 if args.max_volume_minutes else None,
+        max_volume_bytes=args.max_volume_mb * 1024 * 1024 if args.max_volume_mb else None,
+        chunk_size=args.chunk_size,
+        failures=failures,
+    )
+    if failures:
+        emit('failures', failed_tracks=failure_fields(failures))
+
+def process_remotely(playlist_ids, args, address, succeeded, failed):
+    """Submit every playlist to the job server at ``address`` and print the events of each job in turn.
+
+    The server runs the jobs with its own directories. The IDs of finished playlists are
+    appended to ``succeeded`` or ``failed``.
+    """
+    from backend.job_client import JOB_SUCCEEDED, JobClient
+    from backend.job_server import REMOTE_OPTIONS
+
+    client = JobClient(*address)
+    options = {name: getattr(args, name) for name in REMOTE_OPTIONS}
+    jobs = []
+    for playlist_id in playlist_ids:
+        job = client.submit(playlist_id, **options)
+        emit('submitted', playlist_id=playlist_id, job_id=job['job_id'])
+        jobs.append(job)
+    for job in jobs:
+        state = None
+        for event in client.watch(job['job_id']):
+            if event['event'] == 'state':
+                state = event['state']
+            else:
+                emit(**event)
+        (succeeded if state == JOB_SUCCEEDED else failed).append(job['playlist_id'])
+
+def parse_address(value):
+    host, _, port = value.rpartition(':')
+    try:
+        return host or DAEMON_HOST, int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected HOST:PORT or PORT, got {value!r}") from None
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Process YouTube playlists without the GUI.")
+    parser.add_argument('playlist_ids', nargs='*', help="Playlist IDs to process.")
+    parser.add_argument('-f', '--file', action='append', help="File with one playlist ID per line ('#' starts a comment). May be repeated.")
+    parser.add_argument('--no-download', action='store_true', help="Only write the text export.")
+    parser.add_argument('--sync', action='store_true', help="Only process playlists that changed since their last run.")
+    parser.add_argument('--refresh', action='store_true', help="Ignore cached playlist metadata.")
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent downloads (default: 4).")
+    parser.add_argument('--audio-format', choices=['mp3', 'native'], default='mp3', help="Per-track audio format (default: mp3).")
+    parser.add_argument('--output-format', choices=['mp3', 'opus', 'm4a'], default='mp3', help="Merged output format (default: mp3).")
+    parser.add_argument('--batch', action='store_true', help="Process all playlists as one batch that downloads each shared track once.")
+    parser.add_argument('--stream-merge', action='store_true', help="Build the merged output while tracks are still downloading.")
+    parser.add_argument('--chunk-size', type=int, default=200, help="Merge larger playlists in parallel chunks of this many tracks (default: 200).")
+    parser.add_argument('--max-volume-minutes', type=float, help="Split the merged output into volumes of at most this many minutes.")
+    parser.add_argument('--max-volume-mb', type=float, help="Split the merged output into volumes of at most this many megabytes.")
+    parser.add_argument('--download-dir', default=DOWNLOAD_DIR)
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    parser.add_argument(
+        '--daemon', nargs='?', type=parse_address, const=f"{DAEMON_HOST}:{DAEMON_PORT}", metavar='HOST:PORT',
+        help=f"Submit the playlists to a running daemon.py (default: {DAEMON_HOST}:{DAEMON_PORT}), which uses its own directories.",
+    )
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        playlist_ids = read_playlist_ids(args)
+    except OSError as e:
+        emit('error', message=f"Failed to read playlist file: {e}")
+        return EXIT_USAGE
+    if not playlist_ids:
+        parser.print_usage(sys.stderr)
+        emit('error', message="No playlist IDs given.")
+        return EXIT_USAGE
+    if args.batch and args.stream_merge:
+        emit('error', message="--batch and --stream-merge cannot be combined.")
+        return EXIT_USAGE
+    if args.daemon and args.batch:
+        emit('error', message="--batch cannot be used with --daemon.")
+        return EXIT_USAGE
+    if args.daemon and (args.download_dir != DOWNLOAD_DIR or args.output_dir != OUTPUT_DIR):
+        emit('error', message="--daemon uses the daemon's directories; --download-dir and --output-dir cannot be set.")
+        return EXIT_USAGE
+    from backend.jobs import validate_options
+    message = validate_options(args)
+    if message:
+        emit('error', message=message)
+        return EXIT_USAGE
+
+    LoggerSetup.initialize_logger(CLI_LOG_FILE, LOG_DIR, redirect_output=False)
+    from backend.jobs import process_playlist
+    from backend.session_pool import close_session_pools
+    from backend.track_store import flush_track_store
+    from tools.logger import get_logger
+    from tools.metrics import job_metrics
+    logger = get_logger()
+
+    succeeded = []
+    failed = []
+    try:
+        if args.daemon:
+            from backend.job_client import JobServerError
+            try:
+                process_remotely(playlist_ids, args, args.daemon, succeeded, failed)
+            except JobServerError as e:
+                logger.error(f"Processing playlists with the job server failed: {e}")
+                emit('error', message=str(e))
+                failed.extend([playlist_id for playlist_id in playlist_ids if playlist_id not in succeeded + failed])
+        elif args.batch:
+            with job_metrics(f"batch of {len(playlist_ids)} playlists") as metrics:
+                try:
+                    process_batch(playlist_ids, args, succeeded, failed)
+                except Exception as e:
+                    logger.error(f"Processing the batch failed: {e}")
+                    emit('error', message=str(e))
+                    failed.extend([playlist_id for playlist_id in playlist_ids if playlist_id not in succeeded + failed])
+            emit('metrics', **metrics.summary())
+        else:
+            for playlist_id in playlist_ids:
+                emit('start', playlist_id=playlist_id)
+                with job_metrics(f"playlist {playlist_id}") as metrics:
+                    try:
+                        ok = process_playlist(playlist_id, args, emit)
+                    except Exception as e:
+                        logger.error(f"Processing playlist {playlist_id} failed: {e}")
+                        emit('error', playlist_id=playlist_id, message=str(e))
+                        ok = False
+                emit('metrics', playlist_id=playlist_id, **metrics.summary())
+                (succeeded if ok else failed).append(playlist_id)
+    finally:
+        close_session_pools()
+        flush_track_store()
+        emit('summary', succeeded=succeeded, failed=failed)
+        LoggerSetup.shutdown()
+    return EXIT_OK if not failed else EXIT_FAILED
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""Background job server.
+
+Run from the repository root with ``python src/daemon.py``. The server accepts playlist
+jobs from the GUI and from ``cli.py --daemon`` over newline-delimited JSON on a local TCP
+port, runs them in this one process and keeps the yt-dlp sessions, caches and track
+store warm between jobs. Stop it with Ctrl+C; running jobs are canceled.
+"""
+import argparse
+import sys
+import threading
+
+from tools.logger import LoggerSetup
+
+LOG_DIR = './logs'
+DAEMON_LOG_FILE = 'daemon.log'
+
+def build_parser():
+    from backend.job_client import DEFAULT_HOST, DEFAULT_PORT
+    from backend.job_server import DEFAULT_MAX_JOBS
+    parser = argparse.ArgumentParser(description="Serve playlist jobs to the GUI and the CLI.")
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"Address to listen on (default: {DEFAULT_HOST}).")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT}).")
+    parser.add_argument('--jobs', type=int, default=DEFAULT_MAX_JOBS, help=f"Playlists processed at the same time (default: {DEFAULT_MAX_JOBS}).")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.jobs < 1:
+        print("--jobs must be at least 1.", file=sys.stderr)
+        return 2
+
+    LoggerSetup.initialize_logger(DAEMON_LOG_FILE, LOG_DIR, redirect_output=False)
+    from backend.job_server import JobQueue, JobServer
+    from backend.session_pool import close_session_pools
+    from backend.track_store import flush_track_store
+    from backend.youtube_service import warm_up
+    from tools.logger import get_logger
+    logger = get_logger()
+
+    queue = JobQueue(max_jobs=args.jobs)
+    try:
+        server = JobServer(queue, args.host, args.port)
+    except OSError as e:
+        logger.error(f"Cannot listen on {args.host}:{args.port}: {e}")
+        queue.close()
+        LoggerSetup.shutdown()
+        return 1
+
+    logger.info(f"Job server listening on {args.host}:{args.port}.")
+    try:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Job server stopping.")
+    finally:
+        server.server_close()
+        queue.close()
+        close_session_pools()
+        flush_track_store()
+        LoggerSetup.shutdown()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
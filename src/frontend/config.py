@@ -1,7 +1,27 @@
 import os
 
+DATA_DIR = './data'
 DOWNLOAD_DIR = './data/downloads'
 OUTPUT_DIR = './data/output'
 LOG_DIR = './logs'
 ROOT_DIR = '.'
-LATEST_LOG_FILE = os.path.join(LOG_DIR, 'latest.log')
\ No newline at end of file
+TRACK_CACHE_DIR = './data/cache/tracks'
+JOB_JOURNAL_PATH = './data/jobs.sqlite3'
+LIBRARY_INDEX_PATH = './data/library.sqlite3'
+LATEST_LOG_FILE = os.path.join(LOG_DIR, 'latest.log')
+# Logs that a running GUI or daemon may still be writing to.
+ACTIVE_LOG_FILES = tuple(
+    os.path.join(LOG_DIR, name) for name in (
+        'latest.log', 'cli.log', 'daemon.log', 'metrics-latest.jsonl', 'metrics-cli.jsonl', 'metrics-daemon.jsonl',
+    )
+)
+
+DOWNLOAD_WORKERS = 4
+OUTPUT_FORMAT = 'mp3'
+# Build the merged output while tracks are still downloading.
+STREAMING_MERGE = True
+TRACK_CACHE_MAX_BYTES = 10 * 1024 * 1024 * 1024
+# Hand playlists to a running daemon.py when one answers at startup.
+USE_DAEMON = True
+DAEMON_HOST = '127.0.0.1'
+DAEMON_PORT = 8765
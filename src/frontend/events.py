@@ -0,0 +1,82 @@
+import queue
+
+from tools.logger import get_logger
+
+logger = get_logger()
+
+DRAIN_INTERVAL_MS = 50
+
+CALL_EVENT = 'call'
+
+class UIEventChannel:
+    """Carries progress and status events from worker threads to the Tk main thread.
+
+    Workers ``publish`` events from any thread; they never touch widgets themselves. The Tk
+    thread drains the queue every ``interval_ms`` and dispatches each event to its handler.
+    For kinds registered with ``coalesce=True`` only the latest event of a burst is
+    delivered, so a flood of progress updates costs one repaint per drain.
+    """
+
+    def __init__(self, root, interval_ms=DRAIN_INTERVAL_MS):
+        self.root = root
+        self.interval_ms = interval_ms
+        self._queue = queue.SimpleQueue()
+        self._handlers = {CALL_EVENT: lambda func, *args: func(*args)}
+        self._coalesced = set()
+        self._after_id = None
+
+    def register(self, kind, handler, coalesce=False):
+        self._handlers[kind] = handler
+        if coalesce:
+            self._coalesced.add(kind)
+
+    def publish(self, kind, *args):
+        self._queue.put((kind, args))
+
+    def call(self, func, *args):
+        """Run ``func(*args)`` on the Tk thread."""
+        self.publish(CALL_EVENT, func, *args)
+
+    def start(self):
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _drain(self):
+        pending = {}
+        try:
+            while True:
+                try:
+                    kind, args = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if kind in self._coalesced:
+                    pending.pop(kind, None)
+                    pending[kind] = args
+                    continue
+                # Deliver coalesced events first so a status event never overtakes the
+                # progress that preceded it.
+                self._dispatch_pending(pending)
+                self._dispatch(kind, args)
+            self._dispatch_pending(pending)
+        finally:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def _dispatch_pending(self, pending):
+        for kind, args in pending.items():
+            self._dispatch(kind, args)
+        pending.clear()
+
+    def _dispatch(self, kind, args):
+        handler = self._handlers.get(kind)
+        if handler is None:
+            logger.warning(f"No handler registered for UI event '{kind}'.")
+            return
+        try:
+            handler(*args)
+        except Exception as e:
+            logger.error(f"UI event '{kind}' failed: {e}")
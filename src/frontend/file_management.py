@@ -4,30 +4,77 @@ import shutil
 import subprocess
 from tkinter import ACTIVE, END, filedialog, messagebox
 
-from frontend.config import DOWNLOAD_DIR, OUTPUT_DIR
-from frontend.utils import clear_directory
+from backend.library_index import KIND_OUTPUT, KIND_TRACK, get_library_index
+from frontend.config import DOWNLOAD_DIR, OUTPUT_DIR, TRACK_CACHE_DIR
+from frontend.utils import clear_directory, format_duration, format_size
 from tools.logger import get_logger
 
 logger = get_logger()
 
+# Sort choices shown in the file panel, mapped to (library index column, descending).
+SORT_OPTIONS = {
+    "Name": ('name', False),
+    "Newest": ('created', True),
+    "Largest": ('size', True),
+    "Longest": ('duration', True),
+}
+
+# Library sections shown in the file panel, mapped to library index kinds.
+LIBRARY_VIEWS = {
+    "Merged outputs": KIND_OUTPUT,
+    "Cached tracks": KIND_TRACK,
+}
+
+def format_entry(entry):
+    details = [format_size(entry.size)]
+    if entry.duration:
+        details.insert(0, format_duration(entry.duration))
+    if entry.playlist_name:
+        details.append(entry.playlist_name)
+    return f"  {entry.name}   ({', '.join(details)})"
+
 def list_files(app):
-    logger.info("Listing files in the output directory.")
-    app.file_listbox.delete(0, END)
-    pad_spaces = 2
+    """Fill the file panel from the library index with the current view, sort and filter."""
+    sort, descending = SORT_OPTIONS[app.file_sort_var.get()]
+    kind = LIBRARY_VIEWS[app.library_view_var.get()]
     try:
-        files = os.listdir(OUTPUT_DIR)
-        for file in files:
-            pad = ' ' * pad_spaces
-            app.file_listbox.insert(END, f"{pad}{file}")
-        logger.info(f"Listed {len(files)} files.")
-    except FileNotFoundError:
-        logger.error(f"The directory {OUTPUT_DIR} does not exist.")
-        messagebox.showerror("Error", f"The directory {OUTPUT_DIR} does not exist.")
+        app.file_entries = get_library_index().entries(kind, query=app.file_filter_entry.get().strip(), sort=sort, descending=descending)
+    except Exception as e:
+        logger.error(f"Failed to read the library index: {e}")
+        messagebox.showerror("Error", f"Failed to read the library index: {e}")
+        return
+    app.file_listbox.delete(0, END)
+    if app.file_entries:
+        app.file_listbox.insert(END, *(format_entry(entry) for entry in app.file_entries))
+    logger.debug(f"Listed {len(app.file_entries)} library entries.")
+
+def schedule_list_files(app, delay_ms=150):
+    """Refresh the file panel once typing in the filter pauses."""
+    if app.list_files_after_id is not None:
+        app.root.after_cancel(app.list_files_after_id)
+
+    def refresh():
+        app.list_files_after_id = None
+        list_files(app)
+
+    app.list_files_after_id = app.root.after(delay_ms, refresh)
+
+def scan_library():
+    """Reconcile the library index with the output and track cache directories."""
+    library = get_library_index()
+    library.scan(OUTPUT_DIR, KIND_OUTPUT)
+    library.scan(TRACK_CACHE_DIR, KIND_TRACK)
+
+def selected_entry(app):
+    if not app.file_entries:
+        return None
+    index = app.file_listbox.index(ACTIVE)
+    return app.file_entries[index] if index < len(app.file_entries) else None
 
 def open_file(app):
-    selected_file = app.file_listbox.get(ACTIVE).strip()
-    file_path = os.path.join(OUTPUT_DIR, selected_file)
-    if os.path.isfile(file_path):
+    entry = selected_entry(app)
+    if entry and os.path.isfile(entry.path):
+        file_path = entry.path
         try:
             logger.info(f"Opening file {file_path}")
             if platform.system() == 'Windows':
@@ -40,14 +87,28 @@ def open_file(app):
             logger.error(f"Failed to open file {file_path}: {str(e)}")
             messagebox.showerror("Error", f"Failed to open file: {str(e)}")
 
+def selected_output(app):
+    """Return the selected entry if it is a merged output; cached tracks belong to the track store."""
+    entry = selected_entry(app)
+    if entry and entry.kind != KIND_OUTPUT:
+        messagebox.showerror("Error", "Cached tracks are managed by the track cache and cannot be moved or deleted here.")
+        return None
+    return entry
+
 def move_file(app):
-    selected_file = app.file_listbox.get(ACTIVE).strip()
-    if selected_file:
+    entry = selected_output(app)
+    if entry:
+        selected_file = entry.name
         dest_dir = filedialog.askdirectory()
         if dest_dir:
             try:
                 logger.info(f"Moving file {selected_file} to {dest_dir}.")
-                shutil.move(os.path.join(OUTPUT_DIR, selected_file), os.path.join(dest_dir, selected_file))
+                source_path = entry.path
+                dest_path = os.path.join(dest_dir, selected_file)
+                shutil.move(source_path, dest_path)
+                get_library_index().remove(source_path)
+                app.size_index.record(source_path)
+                app.size_index.record(dest_path)
                 messagebox.showinfo("Success", f"File {selected_file} moved successfully.")
                 list_files(app)
                 app.update_directory_sizes()
@@ -57,11 +118,15 @@ def move_file(app):
                 messagebox.showerror("Error", f"Failed to move file: {str(e)}")
 
 def delete_file(app):
-    selected_file = app.file_listbox.get(ACTIVE).strip()
-    if selected_file:
+    entry = selected_output(app)
+    if entry:
+        selected_file = entry.name
         try:
             logger.info(f"Deleting file {selected_file}.")
-            os.remove(os.path.join(OUTPUT_DIR, selected_file))
+            file_path = entry.path
+            os.remove(file_path)
+            get_library_index().remove(file_path)
+            app.size_index.record(file_path)
             messagebox.showinfo("Success", f"File {selected_file} deleted successfully.")
             list_files(app)
             app.update_directory_sizes()
@@ -84,8 +149,6 @@ def open_directory(directory):
 def clear_download_directory(app):
     logger.info("Clearing download directory.")
     clear_directory(DOWNLOAD_DIR)
+    app.size_index.refresh(DOWNLOAD_DIR)
     app.update_directory_sizes()
     logger.info("Download directory cleared.")
-
-def cleanup_partial_downloads(self):
-        clear_download_directory(self)
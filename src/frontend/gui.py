@@ -4,20 +4,32 @@ from tkinter import messagebox
 
 from customtkinter import *
 
-from backend.downloader import download_videos, merge_files
-from backend.file_handler import write_to_file
-from backend.youtube_service import get_playlist_items, get_playlist_name
-from frontend.config import DOWNLOAD_DIR, LATEST_LOG_FILE, LOG_DIR, OUTPUT_DIR, ROOT_DIR
-from frontend.file_management import cleanup_partial_downloads, list_files
+from backend.downloader import download_videos, existing_output, merge_files
+from backend.file_handler import export_entries, export_path, write_to_file
+from backend.job_client import JobClient, JobServerError
+from backend.job_journal import configure_job_journal, get_job_journal
+from backend.library_index import KIND_OUTPUT, KIND_TRACK, configure_library_index, get_library_index
+from backend.metadata_cache import playlist_cache_path
+from backend.playlist_sync import plan_sync, snapshot_writer
+from backend.stream_merge import StreamingMerger
+from backend.track_store import PinnedTracks, configure_track_store
+from backend.youtube_service import get_playlist, stream_playlist, warm_up
+from frontend.config import ACTIVE_LOG_FILES, DAEMON_HOST, DAEMON_PORT, DATA_DIR, DOWNLOAD_DIR, DOWNLOAD_WORKERS, JOB_JOURNAL_PATH, LATEST_LOG_FILE, LIBRARY_INDEX_PATH, LOG_DIR, OUTPUT_DIR, OUTPUT_FORMAT, ROOT_DIR, STREAMING_MERGE, TRACK_CACHE_DIR, TRACK_CACHE_MAX_BYTES, USE_DAEMON
+from frontend.events import UIEventChannel
+from frontend.file_management import list_files, scan_library
 from frontend.layout import create_main_layout
-from frontend.utils import calculate_directory_size, cancel_download, create_directories, reset_button, reset_progress, update_progress, trim_logs_directory
+from frontend.size_index import DirectorySizeIndex
+from frontend.utils import cancel_download, create_directories, format_size, reset_button, reset_progress, update_progress, trim_logs_directory
+from tools.log_tail import LogTail, read_last_lines
 from tools.logger import get_logger
-
-create_directories([DOWNLOAD_DIR, OUTPUT_DIR, LOG_DIR])
-trim_logs_directory(LOG_DIR)
+from tools.metrics import job_metrics
 
 logger = get_logger()
 
+LOG_VIEW_BACKLOG = 200
+LOG_VIEW_MAX_LINES = 1000
+LOG_VIEW_INTERVAL_MS = 500
+
 class YouTubeDownloaderGUI:
     def __init__(self):
         self.root = CTk()
@@ -29,21 +41,99 @@ class YouTubeDownloaderGUI:
         self.root.iconbitmap(icon_path)
 
         self.cancel_event = threading.Event()
+        # Set once a job server answers; playlists are then processed by the daemon.
+        self.job_client = None
+        self.events = UIEventChannel(self.root)
+        # A streamed playlist is still being read while its tracks download.
+        self.resolved_entries = None
+        self.download_progress = None
+        self.events.register('progress', self.show_progress, coalesce=True)
+        self.events.register('resolve_progress', self.show_resolve_progress, coalesce=True)
 
         self.download_dir = os.path.abspath(DOWNLOAD_DIR)
         self.output_dir = os.path.abspath(OUTPUT_DIR)
         self.overall_dir = os.path.abspath(ROOT_DIR)
+        self.size_index = DirectorySizeIndex({'download': DOWNLOAD_DIR, 'output': OUTPUT_DIR, 'overall': ROOT_DIR})
+        self.log_tail = LogTail(LATEST_LOG_FILE)
 
+        create_directories([DOWNLOAD_DIR, OUTPUT_DIR, LOG_DIR])
+        configure_library_index(LIBRARY_INDEX_PATH)
         create_main_layout(self)
 
         reset_progress(self)
         list_files(self)
+        self.events.start()
+        self.root.after_idle(self.finish_startup)
+
+    def finish_startup(self):
+        """Run the startup work that is not needed to draw the first frame."""
+        trim_logs_directory(LOG_DIR, ACTIVE_LOG_FILES)
+        configure_track_store(TRACK_CACHE_DIR, TRACK_CACHE_MAX_BYTES).add_listener(self.size_index.record)
+        configure_job_journal(JOB_JOURNAL_PATH)
         self.update_directory_sizes()
+        self.append_log_lines(self.log_tail.open(LOG_VIEW_BACKLOG))
+        self.root.after(LOG_VIEW_INTERVAL_MS, self.follow_log)
+        threading.Thread(target=self.connect_job_server if USE_DAEMON else warm_up, name="warm-up", daemon=True).start()
+        threading.Thread(target=self.build_size_index, name="size-index", daemon=True).start()
+        threading.Thread(target=self.update_library, name="library-scan", daemon=True).start()
+
+    def connect_job_server(self):
+        """Use a running job server if there is one; otherwise warm up yt-dlp for local jobs."""
+        client = JobClient(DAEMON_HOST, DAEMON_PORT)
+        if client.ping():
+            logger.info(f"Playlists will be processed by the job server at {DAEMON_HOST}:{DAEMON_PORT}.")
+            self.job_client = client
+        else:
+            warm_up()
+
+    def follow_log(self):
+        """Append what was logged since the last poll to the log view."""
+        try:
+            self.append_log_lines(self.log_tail.read_new())
+        except Exception as e:
+            logger.error(f"Failed to read the log file: {e}")
+        self.root.after(LOG_VIEW_INTERVAL_MS, self.follow_log)
+
+    def append_log_lines(self, lines):
+        if not lines:
+            return
+        at_bottom = self.log_view.yview()[1] >= 1.0
+        self.log_view.configure(state="normal")
+        self.log_view.insert("end", "".join(f"{line}\n" for line in lines))
+        excess = int(self.log_view.index("end-1c").split('.')[0]) - 1 - LOG_VIEW_MAX_LINES
+        if excess > 0:
+            self.log_view.delete("1.0", f"{excess + 1}.0")
+        self.log_view.configure(state="disabled")
+        if at_bottom:
+            self.log_view.see("end")
+
+    def update_library(self):
+        """Pick up files changed outside the app and probe durations that are still unknown."""
+        try:
+            scan_library()
+            self.events.call(list_files, self)
+            library = get_library_index()
+            library.fill_durations(KIND_OUTPUT)
+            library.fill_durations(KIND_TRACK)
+        except Exception as e:
+            logger.error(f"Failed to update the library index: {e}")
+        self.events.call(list_files, self)
+
+    def build_size_index(self):
+        """Scan the directories once in the background, then keep the sizes current incrementally."""
+        try:
+            self.size_index.build()
+            self.size_index.start_watching()
+        except Exception as e:
+            logger.error(f"Failed to build the directory size index: {e}")
+        self.events.call(self.update_directory_sizes)
 
     def download_and_process(self):
         if not hasattr(self, 'canceling') or not self.canceling:
             self.canceling = False
             self.cancel_event.clear()
+            self.resolved_entries = None
+            self.download_progress = None
             self.download_button.configure(text="Cancel Process", command=lambda:cancel_download(self))
             playlist_id = self.playlist_entry.get().strip()
             
@@ -53,92 +143,290 @@ class YouTubeDownloaderGUI:
                 reset_button(self)
                 return
             
-            logger.info(f"Retrieving playlist name using Playlist ID: '{playlist_id}'")
-            playlist_name = get_playlist_name(playlist_id)
-            if not playlist_name:
-                logger.error("Error: Failed to retrieve playlist name.")
-                messagebox.showerror("Error", "Failed to retrieve playlist name.")
-                reset_button(self)
-                return
-            
-            logger.info(f"Playlist '{playlist_name}' found. Retrieving playlist items...")
-            videos = get_playlist_items(playlist_id)
-            if videos is None:
-                logger.error("Error: Failed to retrieve playlist items.")
-                messagebox.showerror("Error", "Failed to retrieve playlist items.")
-                reset_button(self)
+            sync_mode = bool(self.sync_mode_var.get())
+            refresh = sync_mode or bool(self.refresh_playlist_var.get())
+            logger.info(f"Retrieving playlist using Playlist ID: '{playlist_id}'")
+            self.progress_info_frame.pack(pady=10)
+            self.progress_bar.set(0)
+            self.progress_label.configure(text="Resolving playlist...")
+
+            if self.job_client is not None:
+                self.process_remotely(playlist_id, sync_mode, refresh)
                 return
-            
-            logger.info(f"Retrieved {len(videos)} videos from playlist '{playlist_name}'.")
-        
-            write_to_file(videos, playlist_name)
-            if messagebox.askyesno("Confirmation", "Do you want to download the songs?"):
-                self.progress_info_frame.pack(pady=10)
-                self.download_button.configure(text="Cancel Process", command=lambda: cancel_download(self))
+
+            def resolve_task():
+                # A sync compares the whole playlist with its snapshot before anything is
+                # downloaded; otherwise the entries are streamed into the export and the
+                # downloads while yt-dlp is still reading later pages.
+                if sync_mode:
+                    playlist_name, videos = get_playlist(
+                        playlist_id,
+                        refresh=refresh,
+                        progress_callback=lambda count: self.events.publish('resolve_progress', count),
+                        cancel_event=self.cancel_event,
+                    )
+                    self.events.call(self.on_playlist_resolved, playlist_id, playlist_name, videos)
+                else:
+                    playlist_name, entries = stream_playlist(
+                        playlist_id,
+                        refresh=refresh,
+                        progress_callback=lambda count: self.events.publish('resolve_progress', count),
+                        cancel_event=self.cancel_event,
+                    )
+                    self.events.call(self.on_playlist_opened, playlist_id, playlist_name, entries)
+
+            threading.Thread(target=resolve_task, name="resolver", daemon=True).start()
+        else:
+            cancel_download(self)
+
+    def show_progress(self, completed, total):
+        """Show the download progress, next to the entries read so far while the playlist streams in."""
+        self.download_progress = (completed, total)
+        update_progress(self, completed, total)
+        if self.resolved_entries is not None:
+            self.progress_label.configure(text=f"{completed / total:.2%} ({self.resolved_entries} entries resolved)")
+
+    def show_resolve_progress(self, count):
+        self.resolved_entries = count
+        if self.download_progress is None:
+            self.progress_label.configure(text=f"Resolving playlist... {count} entries")
+        else:
+            self.show_progress(*self.download_progress)
+
+    def resolution_failed(self, playlist_name, videos):
+        """Report a canceled or failed resolution and return True if there is nothing to process."""
+        if self.cancel_event.is_set():
+            logger.info("Playlist resolution canceled by user.")
+        elif not playlist_name:
+            logger.error("Error: Failed to retrieve playlist name.")
+            messagebox.showerror("Error", "Failed to retrieve playlist name.")
+        elif videos is None:
+            logger.error("Error: Failed to retrieve playlist items.")
+            messagebox.showerror("Error", "Failed to retrieve playlist items.")
+        else:
+            return False
+        reset_button(self)
+        reset_progress(self)
+        return True
+
+    def on_playlist_opened(self, playlist_id, playlist_name, entries):
+        if self.resolution_failed(playlist_name, entries):
+            if entries is not None:
+                entries.close()
+            return
+
+        logger.info(f"Opened playlist '{playlist_name}'.")
+        if messagebox.askyesno("Confirmation", f"Do you want to download the songs of '{playlist_name}'?"):
+            self.start_download(playlist_id, playlist_name, entries, export=True)
+        else:
+            # The export is still written; it reads the remaining pages in the background.
+            threading.Thread(target=write_to_file, args=(entries, playlist_name), name="exporter", daemon=True).start()
+            messagebox.showinfo("Cancelled", "Download canceled.")
+            reset_button(self)
+            reset_progress(self)
+
+    def on_playlist_resolved(self, playlist_id, playlist_name, videos):
+        if self.resolution_failed(playlist_name, videos):
+            return
         
-                def background_task():
+        logger.info(f"Retrieved {len(videos)} videos from playlist '{playlist_name}'.")
+        self.resolved_entries = None
+
+        diff = plan_sync(playlist_id, videos)
+        if not diff.changed and existing_output(playlist_name, OUTPUT_DIR, OUTPUT_FORMAT):
+            messagebox.showinfo("Up to date", f"Playlist '{playlist_name}' has not changed since the last sync.")
+            reset_button(self)
+            reset_progress(self)
+            return
+        confirmation = (
+            f"{len(diff.added)} added, {len(diff.removed)} removed and {len(diff.moved)} moved "
+            f"entries since the last sync. Do you want to update the download?"
+        )
+    
+        write_to_file(videos, playlist_name)
+        if messagebox.askyesno("Confirmation", confirmation):
+            self.start_download(playlist_id, playlist_name, videos, export=False)
+        else:
+            messagebox.showinfo("Cancelled", "Download canceled.")
+            list_files(self)
+            self.update_directory_sizes()
+            reset_button(self)
+            reset_progress(self)
+
+    def start_download(self, playlist_id, playlist_name, videos, export):
+        """Download and merge ``videos`` in a worker thread; ``export`` also writes the text export as they pass."""
+        self.progress_info_frame.pack(pady=10)
+        self.progress_label.configure(text="0%")
+        self.download_button.configure(text="Cancel Process", command=lambda: cancel_download(self))
+
+        audio_format = 'native' if self.native_audio_var.get() else 'mp3'
+
+        def background_task():
+            with job_metrics(f"playlist {playlist_id}"):
+                snapshot = snapshot_writer(playlist_id, playlist_name)
+                try:
+                    self.events.call(self.progress_bar.set, 0)
+                    entries = snapshot.record(videos)
+                    if export:
+                        entries = export_entries(entries, playlist_name)
+                    merger = StreamingMerger(playlist_name, OUTPUT_DIR, OUTPUT_FORMAT, audio_format, playlist_id) if STREAMING_MERGE else None
+                    journal = get_job_journal()
+                    job_id = journal.start_job(playlist_id, playlist_name, (), audio_format, OUTPUT_FORMAT)
+                    pinned = PinnedTracks() if merger is None else None
                     try:
-                        total_videos = len(videos)
-                        self.progress_bar.set(0)
-                        downloaded_files = []
-                        for i, video in enumerate(videos, start=1):
-                            if self.cancel_event.is_set():
-                                logger.info("Download canceled by user.")
-                                cleanup_partial_downloads(self)
-                                messagebox.showinfo("Cancelled", "Download has been canceled.")
-                                reset_button(self)
-                                reset_progress(self)
-                                return
-                            
-                            video_files = download_videos([video])
-                            downloaded_files.extend(video_files)
-                            update_progress(self, i, total_videos)
-                        merge_files(playlist_name, downloaded_files)
-                        messagebox.showinfo("Success", "Videos downloaded and processed successfully.")
-                        list_files(self)
-                        self.update_directory_sizes()
-                        reset_progress(self)
-                    except Exception as e:
-                        logger.error(f"An error occurred: {str(e)}")
-                        messagebox.showerror("Error", f"An error occurred: {str(e)}")
+                        downloaded_files = download_videos(
+                            merger.track_order(entries) if merger else entries,
+                            max_workers=DOWNLOAD_WORKERS,
+                            progress_callback=lambda completed, total: self.events.publish('progress', completed, total),
+                            cancel_event=self.cancel_event,
+                            audio_format=audio_format,
+                            journal=journal,
+                            job_id=job_id,
+                            track_callback=merger.track_ready if merger else pinned.track_ready,
+                        )
+                        if self.cancel_event.is_set():
+                            logger.info("Download canceled by user.")
+                            self.events.call(self.on_download_canceled)
+                            return
+                        if not snapshot.count:
+                            logger.error("Error: Failed to retrieve playlist items.")
+                            self.events.call(messagebox.showerror, "Error", "Failed to retrieve playlist items.")
+                            self.events.call(reset_progress, self)
+                            return
+
+                        if merger:
+                            merged = merger.finish()
+                        else:
+                            pinned.handed_off()
+                            merged = merge_files(playlist_name, downloaded_files, output_format=OUTPUT_FORMAT, playlist_id=playlist_id, cancel_event=self.cancel_event)
                     finally:
-                        reset_button(self)
-        
-                thread = threading.Thread(target=background_task)
-                thread.start()
-            else:
-                messagebox.showinfo("Cancelled", "Download canceled.")
-                list_files(self)
-                self.update_directory_sizes()
-                reset_button(self)
-                reset_progress(self)
+                        if merger:
+                            merger.abort()
+                        else:
+                            pinned.release()
+                    if self.cancel_event.is_set():
+                        logger.info("Download canceled by user.")
+                        self.events.call(self.on_download_canceled)
+                        return
+                    if merged:
+                        journal.finish_job(job_id)
+                        snapshot.commit()
+                    scan_library()
+                    self.record_job_files([
+                        *downloaded_files, merged, snapshot.path, export_path(playlist_name),
+                        playlist_cache_path(playlist_id),
+                    ])
+                    self.events.call(self.on_download_finished)
+                except Exception as e:
+                    logger.error(f"An error occurred: {str(e)}")
+                    self.events.call(messagebox.showerror, "Error", f"An error occurred: {str(e)}")
+                finally:
+                    snapshot.discard()
+                    self.events.call(reset_button, self)
+
+        thread = threading.Thread(target=background_task)
+        thread.start()
+
+    def process_remotely(self, playlist_id, sync_mode, refresh):
+        """Submit the playlist to the job server and follow its events in a worker thread."""
+        options = {
+            'sync': sync_mode,
+            'refresh': refresh,
+            'workers': DOWNLOAD_WORKERS,
+            'audio_format': 'native' if self.native_audio_var.get() else 'mp3',
+            'output_format': OUTPUT_FORMAT,
+            'stream_merge': STREAMING_MERGE,
+        }
+
+        def watch_task():
+            outcome = None
+            try:
+                job = self.job_client.submit(playlist_id, **options)
+                logger.info(f"Submitted playlist '{playlist_id}' to the job server as job {job['job_id']}.")
+                for event in self.job_client.watch(job['job_id'], cancel_event=self.cancel_event):
+                    if event['event'] == 'progress':
+                        self.events.publish('progress', event['completed'], event['total'])
+                    elif event['event'] == 'resolved':
+                        logger.info(f"Job {job['job_id']} opened playlist '{event['name']}'.")
+                    elif event['event'] in ('done', 'error', 'canceled'):
+                        outcome = event
+                if outcome is not None and outcome['event'] == 'done':
+                    scan_library()
+                    self.record_job_files(outcome.get('outputs') or [outcome.get('output')])
+            except JobServerError as e:
+                logger.error(f"Error: The job server failed: {e}")
+                outcome = {'event': 'error', 'message': str(e)}
+            except Exception as e:
+                logger.error(f"An error occurred: {str(e)}")
+                outcome = {'event': 'error', 'message': str(e)}
+            self.events.call(self.on_remote_job_finished, outcome)
+
+        threading.Thread(target=watch_task, name="job-watcher", daemon=True).start()
+
+    def on_remote_job_finished(self, outcome):
+        reset_button(self)
+        if outcome is None or outcome['event'] == 'canceled':
+            # The daemon cleans up after its own canceled jobs.
+            logger.info("Download canceled by user.")
+            messagebox.showinfo("Cancelled", "Download has been canceled.")
+            reset_progress(self)
+        elif outcome['event'] == 'error':
+            messagebox.showerror("Error", f"An error occurred: {outcome['message']}")
+            reset_progress(self)
+        elif outcome.get('status') == 'unchanged':
+            messagebox.showinfo("Up to date", "The playlist has not changed since the last sync.")
+            reset_progress(self)
         else:
-            cancel_download(self)
+            self.on_download_finished()
+
+    def record_job_files(self, paths):
+        """Update the size index with the files a job wrote or deleted instead of rescanning ./data.
+
+        Files added to or evicted from the track store are reported by its listener. Only
+        the top level of the data directory (the journal and library databases), the
+        transient download directory and the trimmed log directory are rescanned.
+        """
+        if self.size_index.watching:
+            return
+        for path in paths:
+            if path:
+                self.size_index.record(path)
+        self.size_index.refresh(DATA_DIR, recursive=False)
+        self.size_index.refresh(DOWNLOAD_DIR)
+        self.size_index.refresh(LOG_DIR)
+
+    def on_download_canceled(self):
+        # The pipeline deletes the partial files of the tracks it interrupted; finished
+        # tracks stay for a resumed job.
+        self.size_index.refresh(DOWNLOAD_DIR)
+        self.update_directory_sizes()
+        messagebox.showinfo("Cancelled", "Download has been canceled.")
+        reset_button(self)
+        reset_progress(self)
+
+    def on_download_finished(self):
+        messagebox.showinfo("Success", "Videos downloaded and processed successfully.")
+        list_files(self)
+        self.update_directory_sizes()
+        reset_progress(self)
 
     def run(self):
         self.root.mainloop()
 
     def update_directory_sizes(self):
-        def format_size(size_bytes):
-            size_mb = size_bytes / (1024 * 1024)
-            if size_mb >= 1024:
-                size_gb = size_mb / 1024
-                return f"{size_gb:.2f} GB"
-            else:
-                return f"{size_mb:.2f} MB"
-
-        download_size = calculate_directory_size(DOWNLOAD_DIR)
-        output_size = calculate_directory_size(OUTPUT_DIR)
-        overall_size = calculate_directory_size(ROOT_DIR)
-
-        self.download_size_label.configure(text=f"Download Directory Size: {format_size(download_size)}")
-        self.output_size_label.configure(text=f"Output Directory Size: {format_size(output_size)}")
-        self.overall_size_label.configure(text=f"Overall Size: {format_size(overall_size)}")
+        if not self.size_index.ready:
+            self.download_size_label.configure(text="Download Directory Size: calculating...")
+            self.output_size_label.configure(text="Output Directory Size: calculating...")
+            self.overall_size_label.configure(text="Overall Size: calculating...")
+            return
+
+        self.download_size_label.configure(text=f"Download Directory Size: {format_size(self.size_index.total('download'))}")
+        self.output_size_label.configure(text=f"Output Directory Size: {format_size(self.size_index.total('output'))}")
+        self.overall_size_label.configure(text=f"Overall Size: {format_size(self.size_index.total('overall'))}")
 
     def get_latest_log_entries(self, num_lines=10):
         try:
-            with open(LATEST_LOG_FILE, 'r') as f:
-                return ''.join(f.readlines()[-num_lines:])
+            return ''.join(f"{line}\n" for line in read_last_lines(LATEST_LOG_FILE, num_lines))
         except Exception as e:
             logger.error(f"An error occurred: {str(e)}")
             return f"An error occurred: {str(e)}"
@@ -1,7 +1,7 @@
 from tkinter import Listbox
 
 from customtkinter import *
-from frontend.file_management import clear_download_directory, delete_file, list_files, move_file, open_directory, open_file
+from frontend.file_management import LIBRARY_VIEWS, SORT_OPTIONS, clear_download_directory, delete_file, list_files, move_file, open_directory, open_file, schedule_list_files
 from tools.logger import get_logger
 
 logger = get_logger()
@@ -19,6 +19,7 @@ def create_main_layout(app):
     create_progress_section(app, main_frame)
     create_file_management_section(app, main_frame)
     create_size_labels(app, main_frame)
+    create_log_section(app, main_frame)
 
 def create_playlist_section(app, parent):
     logger.info("Creating playlist section")
@@ -33,7 +34,46 @@ def create_playlist_section(app, parent):
         border_width=2,
         border_color="#FF3366"
     )
-    app.playlist_entry.pack(pady=(5, 15), padx=15)
+    app.playlist_entry.pack(pady=(5, 5), padx=15)
+
+    app.refresh_playlist_var = IntVar(value=0)
+    refresh_checkbox = CTkCheckBox(
+        parent,
+        text="Ignore cached playlist",
+        variable=app.refresh_playlist_var,
+        text_color="#F5E6F7",
+        font=ENTRY_FONT,
+        fg_color="#C2185B",
+        hover_color="#880E4F",
+        border_color="#FF3366"
+    )
+    refresh_checkbox.pack(pady=(0, 5), padx=15)
+
+    app.sync_mode_var = IntVar(value=0)
+    sync_checkbox = CTkCheckBox(
+        parent,
+        text="Sync only changes since last run",
+        variable=app.sync_mode_var,
+        text_color="#F5E6F7",
+        font=ENTRY_FONT,
+        fg_color="#C2185B",
+        hover_color="#880E4F",
+        border_color="#FF3366"
+    )
+    sync_checkbox.pack(pady=(0, 5), padx=15)
+
+    app.native_audio_var = IntVar(value=0)
+    native_audio_checkbox = CTkCheckBox(
+        parent,
+        text="Keep native audio per track (encode once when merging)",
+        variable=app.native_audio_var,
+        text_color="#F5E6F7",
+        font=ENTRY_FONT,
+        fg_color="#C2185B",
+        hover_color="#880E4F",
+        border_color="#FF3366"
+    )
+    native_audio_checkbox.pack(pady=(0, 15), padx=15)
 
 def create_progress_section(app, parent):
     logger.info("Creating progress section")
@@ -73,13 +113,61 @@ def update_scrollbar_visibility(app, scrollbar):
     else:
         scrollbar.grid() 
 
+def create_library_controls(app, parent):
+    app.file_entries = []
+    app.list_files_after_id = None
+    controls = CTkFrame(parent, fg_color="#1e1e28")
+    controls.grid(row=0, column=0, columnspan=2, sticky="ew", padx=5, pady=(5, 0))
+    controls.grid_columnconfigure(0, weight=1)
+
+    app.file_filter_entry = CTkEntry(
+        controls,
+        placeholder_text="Filter by name or playlist",
+        text_color="#F5E6F7",
+        font=ENTRY_FONT,
+        border_width=2,
+        border_color="#FF3366"
+    )
+    app.file_filter_entry.grid(row=0, column=0, sticky="ew", padx=(0, 5))
+    app.file_filter_entry.bind("<KeyRelease>", lambda _event: schedule_list_files(app))
+
+    app.file_sort_var = StringVar(value=next(iter(SORT_OPTIONS)))
+    sort_menu = CTkOptionMenu(
+        controls,
+        values=list(SORT_OPTIONS),
+        variable=app.file_sort_var,
+        command=lambda _choice: list_files(app),
+        fg_color="#C2185B",
+        button_color="#C2185B",
+        button_hover_color="#880E4F",
+        font=ENTRY_FONT,
+        width=110
+    )
+    sort_menu.grid(row=0, column=1, padx=(0, 5))
+
+    app.library_view_var = StringVar(value=next(iter(LIBRARY_VIEWS)))
+    view_menu = CTkOptionMenu(
+        controls,
+        values=list(LIBRARY_VIEWS),
+        variable=app.library_view_var,
+        command=lambda _choice: list_files(app),
+        fg_color="#C2185B",
+        button_color="#C2185B",
+        button_hover_color="#880E4F",
+        font=ENTRY_FONT,
+        width=150
+    )
+    view_menu.grid(row=0, column=2)
+
 def create_file_management_section(app, parent):
     logger.info("Creating file management section")
     file_management_frame = CTkFrame(parent, fg_color="#1e1e28", corner_radius=10, border_color="#FF3366", border_width=2)
     file_management_frame.pack(padx=10, pady=10, fill="both", expand=True)
-    file_management_frame.grid_rowconfigure(0, weight=1)
+    file_management_frame.grid_rowconfigure(1, weight=1)
     file_management_frame.grid_columnconfigure(0, weight=1)
 
+    create_library_controls(app, file_management_frame)
+
     app.file_listbox = Listbox(
         file_management_frame,
         bg="#1d1d33", 
@@ -92,7 +180,7 @@ def create_file_management_section(app, parent):
     )
 
     app.file_listbox.bind("<Double-Button-1>", lambda _event: open_file(app))
-    app.file_listbox.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+    app.file_listbox.grid(row=1, column=0, sticky="nsew", padx=5, pady=5)
 
     file_scrollbar = CTkScrollbar(
         file_management_frame,
@@ -101,7 +189,7 @@ def create_file_management_section(app, parent):
         button_color="#C2185B",
         button_hover_color="#880E4F",
     )
-    file_scrollbar.grid(row=0, column=1, sticky="ns")
+    file_scrollbar.grid(row=1, column=1, sticky="ns")
     app.file_listbox.configure(yscrollcommand=file_scrollbar.set)
 
     app.file_listbox.bind("<Configure>", lambda event: update_scrollbar_visibility(app, file_scrollbar))
@@ -158,3 +246,18 @@ def create_size_labels(app, parent):
     app.overall_size_label = CTkLabel(parent, text="", text_color="#FF3366", font=LABEL_FONT)
     app.overall_size_label.pack(pady=5, padx=15)
     app.overall_size_label.bind("<Button-1>", lambda event: open_directory(app.overall_dir))
+
+def create_log_section(app, parent):
+    logger.info("Creating log section")
+    app.log_view = CTkTextbox(
+        parent,
+        height=120,
+        fg_color="#1d1d33",
+        text_color="#F5E6F7",
+        font=("Consolas", 11),
+        border_width=2,
+        border_color="#FF3366",
+        wrap="none",
+        state="disabled"
+    )
+    app.log_view.pack(pady=(5, 15), padx=15, fill="x")
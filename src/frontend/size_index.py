@@ -0,0 +1,159 @@
+import os
+import threading
+
+from tools.logger import get_logger
+
+logger = get_logger()
+
+class DirectorySizeIndex:
+    """Keeps the total size of a few directories current without walking them again.
+
+    The index is built once with ``os.scandir``. After that, the app reports the paths it
+    touches through ``record`` (single files) or ``refresh`` (directory subtrees), and an
+    optional watchdog observer reports changes made by other programs.
+    """
+
+    def __init__(self, roots):
+        self.roots = {name: os.path.abspath(path) for name, path in roots.items()}
+        self._sizes = {}
+        self._totals = dict.fromkeys(self.roots, 0)
+        self._lock = threading.Lock()
+        self._observer = None
+        self.ready = False
+
+    def _roots_containing(self, path):
+        return [name for name, root in self.roots.items() if path == root or path.startswith(root + os.sep)]
+
+    def _scan(self, directory):
+        sizes = {}
+        pending = [directory]
+        while pending:
+            current = pending.pop()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                pending.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                sizes[entry.path] = entry.stat(follow_symlinks=False).st_size
+                        except OSError:
+                            continue
+            except OSError as e:
+                logger.debug(f"Skipping unreadable directory {current}: {e}")
+        return sizes
+
+    def _apply(self, path, size):
+        """Set the size of one file (None removes it) and adjust the totals. Call with the lock held."""
+        previous = self._sizes.pop(path, 0)
+        if size is not None:
+            self._sizes[path] = size
+        delta = (size or 0) - previous
+        if delta:
+            for name in self._roots_containing(path):
+                self._totals[name] += delta
+
+    def build(self):
+        """Scan every root once. Nested roots share a single scan of their files."""
+        scan_roots = []
+        for root in sorted(set(self.roots.values()), key=len):
+            if not any(root == outer or root.startswith(outer + os.sep) for outer in scan_roots):
+                scan_roots.append(root)
+        sizes = {}
+        for root in scan_roots:
+            sizes.update(self._scan(root))
+
+        with self._lock:
+            self._sizes = {}
+            self._totals = dict.fromkeys(self.roots, 0)
+            for path, size in sizes.items():
+                self._apply(path, size)
+            self.ready = True
+        logger.info(f"Directory size index built with {len(sizes)} files.")
+
+    def record(self, path):
+        """Update the index for one file that was created, changed or removed."""
+        path = os.path.abspath(path)
+        try:
+            size = os.stat(path).st_size if os.path.isfile(path) else None
+        except OSError:
+            size = None
+        with self._lock:
+            self._apply(path, size)
+
+    def _scan_files(self, directory):
+        sizes = {}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file(follow_symlinks=False):
+                            sizes[entry.path] = entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.debug(f"Skipping unreadable directory {directory}: {e}")
+        return sizes
+
+    def refresh(self, directory, recursive=True):
+        """Rescan one directory subtree, or only the files directly in it, for changes made in bulk."""
+        directory = os.path.abspath(directory)
+        if not os.path.isdir(directory):
+            sizes = {}
+        else:
+            sizes = self._scan(directory) if recursive else self._scan_files(directory)
+        prefix = directory + os.sep
+        with self._lock:
+            for path in [path for path in self._sizes if path.startswith(prefix)]:
+                if not recursive and os.sep in path[len(prefix):]:
+                    continue
+                if path not in sizes:
+                    self._apply(path, None)
+            for path, size in sizes.items():
+                self._apply(path, size)
+
+    def total(self, name):
+        with self._lock:
+            return self._totals[name]
+
+    def start_watching(self):
+        """Follow changes made outside the app with watchdog, if it is installed."""
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            logger.info("watchdog is not installed; directory sizes follow the app's own file operations only.")
+            return False
+
+        index = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    if event.event_type in ('deleted', 'moved'):
+                        index.refresh(event.src_path)
+                    if event.event_type == 'moved':
+                        index.refresh(event.dest_path)
+                    return
+                index.record(event.src_path)
+                if getattr(event, 'dest_path', None):
+                    index.record(event.dest_path)
+
+        observer = Observer()
+        observer.daemon = True
+        for root in set(self.roots.values()):
+            if os.path.isdir(root):
+                observer.schedule(Handler(), root, recursive=True)
+        observer.start()
+        self._observer = observer
+        logger.info("Watching directories for size changes.")
+        return True
+
+    @property
+    def watching(self):
+        return self._observer is not None
+
+    def stop_watching(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
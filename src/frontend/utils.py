@@ -6,15 +6,18 @@ from tools.logger import get_logger
 
 logger = get_logger()
 
-def calculate_directory_size(directory):
-    logger.info(f"Calculating size for directory: {directory}")
-    total_size = 0
-    for dirpath, dirnames, filenames in os.walk(directory):
-        for f in filenames:
-            fp = os.path.join(dirpath, f)
-            total_size += os.path.getsize(fp)
-    logger.info(f"Total size for directory {directory}: {total_size} bytes")
-    return total_size
+def format_size(size_bytes):
+    size_mb = size_bytes / (1024 * 1024)
+    if size_mb >= 1024:
+        size_gb = size_mb / 1024
+        return f"{size_gb:.2f} GB"
+    else:
+        return f"{size_mb:.2f} MB"
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
 
 def clear_directory(directory):
     try:
@@ -47,7 +50,6 @@ def update_progress(self, current, total):
     percentage = (current / total) * 100
     self.progress_bar.set(current / total)
     self.progress_label.configure(text=f"{percentage:.2f}%")
-    self.root.update_idletasks()
 
 def reset_progress(self):
     self.progress_bar.set(0)
@@ -55,9 +57,11 @@ def reset_progress(self):
     self.root.update_idletasks()
     self.progress_info_frame.pack_forget() 
     
-def trim_logs_directory(directory):
+def trim_logs_directory(directory, active=()):
+    """Delete all but the four newest log files, never touching the ``active`` logs or the files they link to."""
     logger.info(f"Trimming logs in directory: {directory}")
-    files = glob.glob(os.path.join(directory, "*"))
+    active = {os.path.realpath(path) for path in active} | {os.path.abspath(path) for path in active}
+    files = [path for path in glob.glob(os.path.join(directory, "*")) if os.path.abspath(path) not in active and os.path.realpath(path) not in active]
     files.sort(key=os.path.getmtime)
     
     while len(files) > 4:
@@ -1,13 +1,38 @@
+import json
+import os
+import time
+
+from backend.session_pool import close_session_pools
+from backend.track_store import flush_track_store
 from frontend.gui import YouTubeDownloaderGUI
 from tools.logger import LoggerSetup
 
+# Set by dev/bench_startup.py: the app records when its first frame is shown to this
+# file and exits.
+STARTUP_BENCHMARK_ENV = 'YTMT_STARTUP_BENCHMARK'
+
 def initialize_logging():
     LATEST_LOG_FILE = 'latest.log'
     LOG_DIR = 'logs'
     LoggerSetup.initialize_logger(LATEST_LOG_FILE, LOG_DIR)
 
+def report_first_frame(app, report_path):
+    def record(_event=None):
+        app.root.unbind('<Map>')
+        app.root.update_idletasks()
+        with open(report_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'first_frame': time.time()}) + '\n')
+        app.root.after(0, app.root.destroy)
+    app.root.bind('<Map>', record)
+
 if __name__ == '__main__':
     initialize_logging()
     app = YouTubeDownloaderGUI()
-    app.run()
-    
\ No newline at end of file
+    report_path = os.environ.get(STARTUP_BENCHMARK_ENV)
+    if report_path:
+        report_first_frame(app, report_path)
+    try:
+        app.run()
+    finally:
+        close_session_pools()
+        flush_track_store()
@@ -0,0 +1,97 @@
+import codecs
+import os
+
+BLOCK_SIZE = 8192
+
+def _last_lines(f, num_lines, encoding):
+    """Return the last ``num_lines`` lines of the binary file ``f`` by reading blocks backward from its end."""
+    end = f.seek(0, os.SEEK_END)
+    position = end
+    data = b''
+    while position > 0 and data.count(b'\n') <= num_lines:
+        step = min(BLOCK_SIZE, position)
+        position -= step
+        f.seek(position)
+        data = f.read(step) + data
+    f.seek(end)
+    lines = data.decode(encoding, errors='replace').splitlines()
+    return lines[-num_lines:] if num_lines > 0 else []
+
+def read_last_lines(path, num_lines=10, encoding='utf-8'):
+    """Return the last ``num_lines`` lines of a text file without reading all of it."""
+    with open(path, 'rb') as f:
+        return _last_lines(f, num_lines, encoding)
+
+class LogTail:
+    """Follows a log file the way ``tail -F`` does.
+
+    ``read_new`` returns the complete lines written since the previous call. When the log
+    is rotated (the path now names a different file, or the file was truncated) the rest
+    of the old file is read first and the new file is then followed from its start.
+    """
+
+    def __init__(self, path, encoding='utf-8'):
+        self.path = path
+        self.encoding = encoding
+        self._file = None
+        self._decoder = None
+        self._partial = ''
+
+    def open(self, num_lines=0):
+        """Start following at the end of the file and return its last ``num_lines`` lines."""
+        self.close()
+        try:
+            self._file = open(self.path, 'rb')
+        except OSError:
+            return []
+        self._decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+        lines = _last_lines(self._file, num_lines + 1, self.encoding)
+        end = self._file.tell()
+        if end:
+            # A line that is still being written is completed by the next read_new.
+            self._file.seek(end - 1)
+            if self._file.read(1) != b'\n' and lines:
+                self._partial = lines.pop()
+        return lines[-num_lines:] if num_lines > 0 else []
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._partial = ''
+
+    def _read_available(self):
+        text = self._partial + self._decoder.decode(self._file.read())
+        lines = text.split('\n')
+        self._partial = lines.pop()
+        return [line.rstrip('\r') for line in lines]
+
+    def _rotated(self):
+        try:
+            current = os.stat(self.path)
+        except OSError:
+            return False
+        opened = os.fstat(self._file.fileno())
+        if (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino):
+            return True
+        return current.st_size < self._file.tell()
+
+    def read_new(self):
+        """Return the complete lines appended since the last call."""
+        if self._file is None:
+            self.open()
+            if self._file is None:
+                return []
+            self._file.seek(0)
+        lines = self._read_available()
+        if self._rotated():
+            if self._partial:
+                lines.append(self._partial)
+            self.close()
+            try:
+                self._file = open(self.path, 'rb')
+            except OSError:
+                return lines
+            self._decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+            lines.extend(self._read_available())
+        return lines
@@ -1,11 +1,29 @@
+import json
 import logging
 import os
 import sys
 import uuid
-from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
 from queue import Queue
 
+LOGGER_NAME = 'YouTubeDownloaderLogger'
+METRICS_LOGGER_NAME = f'{LOGGER_NAME}.metrics'
+# Each process writes its own metrics file, named after its log (metrics-latest.jsonl,
+# metrics-cli.jsonl, metrics-daemon.jsonl), so no two processes roll over the same file.
+METRICS_LOG_FILE = 'metrics-{name}.jsonl'
+# A metrics file is rolled over to .1, .2, ... once it reaches this size.
+METRICS_MAX_BYTES = 10 * 1024 * 1024
+METRICS_BACKUP_COUNT = 3
+
 class LoggerSetup:
+    listener = None
+
+    class JsonLinesFormatter(logging.Formatter):
+        """Formats records that carry a ``metric`` dict as one JSON object per line."""
+
+        def format(self, record):
+            return json.dumps({'time': round(record.created, 3), **record.metric}, ensure_ascii=False)
+
     class CustomTimedRotatingFileHandler(TimedRotatingFileHandler):
         def __init__(self, filename, **kwargs):
             super().__init__(filename, encoding='utf-8', **kwargs)
@@ -17,13 +35,20 @@ class LoggerSetup:
             unique_id = uuid.uuid4()
             new_filename = f"{baseFilename}_{unique_id}{ext}"
         
-            if os.path.exists(self.baseFilename):
+            # Close the file the base class reopened before replacing it, so records keep
+            # going to a file that readers such as LogTail can find through baseFilename.
+            if self.stream:
+                self.stream.close()
+                self.stream = None
+            if os.path.lexists(self.baseFilename):
                 os.remove(self.baseFilename)
         
             try:
                 os.symlink(new_filename, self.baseFilename)
+                self.stream = open(new_filename, 'a', encoding=self.encoding)
             except OSError as e:
                 print(f"Symlink creation failed: {e}. Consider running with appropriate privileges.")
+                self.stream = self._open()
 
     class StreamToLogger:
         def __init__(self, logger, log_level):
@@ -48,17 +73,21 @@ class LoggerSetup:
             while os.path.exists(new_name):
                 new_name = f"{base_filename}_{unique_id}{ext}"
 
-            os.rename(log_file, new_name)
+            try:
+                os.rename(log_file, new_name)
+            except OSError as e:
+                # Another process still has the log open (Windows); append to it instead.
+                print(f"Could not rotate {log_file}: {e}", file=sys.stderr)
 
     @staticmethod
-    def initialize_logger(LATEST_LOG_FILE, LOG_DIR):
+    def initialize_logger(LATEST_LOG_FILE, LOG_DIR, redirect_output=True):
         if not os.path.exists(LOG_DIR):
             os.makedirs(LOG_DIR)
 
         LATEST_LOG_FILE = os.path.join(LOG_DIR, LATEST_LOG_FILE)
         LoggerSetup.rename_with_unique_id(LATEST_LOG_FILE)
 
-        logger = logging.getLogger('YouTubeDownloaderLogger')
+        logger = logging.getLogger(LOGGER_NAME)
         logger.setLevel(logging.DEBUG)
 
         log_queue = Queue(-1)
@@ -67,20 +96,37 @@ class LoggerSetup:
 
         file_handler = LoggerSetup.CustomTimedRotatingFileHandler(LATEST_LOG_FILE)
         file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(filename)s - %(message)s'))
+        file_handler.addFilter(lambda record: record.name != METRICS_LOGGER_NAME)
 
-        listener = QueueListener(log_queue, file_handler)
+        # Stage timings from tools.metrics share the queue and listener thread but are
+        # written to their own JSONL file, which the daemon appends to for as long as it runs.
+        metrics_log_file = METRICS_LOG_FILE.format(name=os.path.splitext(os.path.basename(LATEST_LOG_FILE))[0])
+        metrics_handler = RotatingFileHandler(os.path.join(LOG_DIR, metrics_log_file), maxBytes=METRICS_MAX_BYTES, backupCount=METRICS_BACKUP_COUNT, encoding='utf-8')
+        metrics_handler.setFormatter(LoggerSetup.JsonLinesFormatter())
+        metrics_handler.addFilter(logging.Filter(METRICS_LOGGER_NAME))
+
+        listener = QueueListener(log_queue, file_handler, metrics_handler)
         listener.start()
+        LoggerSetup.listener = listener
 
-        sys.stdout = LoggerSetup.StreamToLogger(logger, logging.INFO)
-        sys.stderr = LoggerSetup.StreamToLogger(logger, logging.ERROR)
+        if redirect_output:
+            sys.stdout = LoggerSetup.StreamToLogger(logger, logging.INFO)
+            sys.stderr = LoggerSetup.StreamToLogger(logger, logging.ERROR)
 
-        try:
-            sys.stdout = open(sys.stdout.fileno(), mode='w', encoding='utf-8', buffering=1)
-            sys.stderr = open(sys.stderr.fileno(), mode='w', encoding='utf-8', buffering=1)
-        except Exception:
-            pass
+            try:
+                sys.stdout = open(sys.stdout.fileno(), mode='w', encoding='utf-8', buffering=1)
+                sys.stderr = open(sys.stderr.fileno(), mode='w', encoding='utf-8', buffering=1)
+            except Exception:
+                pass
 
         return logger
 
+    @staticmethod
+    def shutdown():
+        """Flush queued log records and stop the listener thread."""
+        if LoggerSetup.listener is not None:
+            LoggerSetup.listener.stop()
+            LoggerSetup.listener = None
+
 def get_logger():
-    return logging.getLogger('YouTubeDownloaderLogger')
\ No newline at end of file
+    return logging.getLogger(LOGGER_NAME)
\ No newline at end of file
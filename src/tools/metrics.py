@@ -0,0 +1,116 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from tools.logger import METRICS_LOGGER_NAME, get_logger
+
+logger = get_logger()
+metrics_logger = logging.getLogger(METRICS_LOGGER_NAME)
+
+STATUS_OK = 'ok'
+STATUS_FAILED = 'failed'
+STATUS_CANCELED = 'canceled'
+
+PERCENTILES = (50, 90, 99)
+
+_collectors = set()
+_collectors_lock = threading.Lock()
+
+def file_size(path):
+    """Return the size of ``path`` in bytes, or 0 if it does not exist."""
+    try:
+        return os.path.getsize(path) if path else 0
+    except OSError:
+        return 0
+
+def record(stage, seconds, status=STATUS_OK, bytes=0, **fields):
+    """Write one stage measurement as a JSONL record and add it to the running job summaries."""
+    sample = {'event': 'stage', 'stage': stage, 'seconds': round(seconds, 6), 'status': status, 'bytes': bytes, **fields}
+    metrics_logger.info(stage, extra={'metric': sample})
+    with _collectors_lock:
+        collectors = list(_collectors)
+    for collector in collectors:
+        collector.add(stage, seconds, status, bytes)
+
+@contextmanager
+def measure(stage, **fields):
+    """Time the enclosed block as one ``stage`` sample.
+
+    The yielded dict is recorded with the sample; set ``status`` and ``bytes`` in it to
+    describe the outcome. An exception marks the sample as failed and is re-raised.
+    """
+    sample = {'status': STATUS_OK, 'bytes': 0, **fields}
+    start = time.perf_counter()
+    try:
+        yield sample
+    except BaseException:
+        sample['status'] = STATUS_FAILED
+        raise
+    finally:
+        record(stage, time.perf_counter() - start, **sample)
+
+def _percentile(values, percent):
+    """Nearest-rank percentile of sorted ``values``."""
+    rank = max(1, -(-len(values) * percent // 100))
+    return values[rank - 1]
+
+class JobMetrics:
+    """Collects the stage samples recorded while a job runs and summarizes them."""
+
+    def __init__(self, label):
+        self.label = label
+        self.started = time.perf_counter()
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds, status, size):
+        with self._lock:
+            self._samples.setdefault(stage, []).append((seconds, status, size))
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        stages = {}
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self._samples.items()}
+        for stage, values in samples.items():
+            durations = sorted(seconds for seconds, _status, _bytes in values)
+            total_bytes = sum(size for _seconds, _status, size in values)
+            busy = sum(durations)
+            stages[stage] = {
+                'count': len(values),
+                'failed': sum(1 for _seconds, status, _bytes in values if status == STATUS_FAILED),
+                'canceled': sum(1 for _seconds, status, _bytes in values if status == STATUS_CANCELED),
+                **{f"p{percent}_ms": round(_percentile(durations, percent) * 1000, 1) for percent in PERCENTILES},
+                'max_ms': round(durations[-1] * 1000, 1),
+                'total_s': round(busy, 3),
+                'bytes': total_bytes,
+                'mb_per_s': round(total_bytes / busy / (1024 * 1024), 2) if busy and total_bytes else None,
+            }
+        return {'job': self.label, 'seconds': round(elapsed, 3), 'stages': stages}
+
+@contextmanager
+def job_metrics(label):
+    """Collect the stage samples recorded during the block and log their summary at the end."""
+    collector = JobMetrics(label)
+    with _collectors_lock:
+        _collectors.add(collector)
+    try:
+        yield collector
+    finally:
+        with _collectors_lock:
+            _collectors.discard(collector)
+        summary = collector.summary()
+        metrics_logger.info('job_summary', extra={'metric': {'event': 'job_summary', **summary}})
+        log_summary(summary)
+
+def log_summary(summary):
+    logger.info(f"Timing summary for {summary['job']} ({summary['seconds']:.1f} s):")
+    for stage, stats in summary['stages'].items():
+        throughput = f", {stats['mb_per_s']} MB/s" if stats['mb_per_s'] else ""
+        logger.info(
+            f"  {stage}: {stats['count']} runs, {stats['failed']} failed, "
+            f"p50 {stats['p50_ms']} ms, p90 {stats['p90_ms']} ms, p99 {stats['p99_ms']} ms, "
+            f"max {stats['max_ms']} ms, {stats['bytes'] / (1024 * 1024):.1f} MB{throughput}"
+        )
@@ -0,0 +1,114 @@
+import struct
+
+import pytest
+
+from backend.mp3_concat import Mp3FormatError, Mp3Stream, _seek_table, concat_mp3, read_stream
+
+# MPEG-1 Layer III, no CRC, 44.1 kHz, no padding; the bitrate index selects 128 or 256 kbit/s.
+STEREO = 0x00
+MONO = 0xC0
+FRAME_SIZES = {0x9: 417, 0xD: 835}
+SAMPLES_PER_FRAME = 1152
+
+def frame(bitrate_index=0x9, channel_mode=STEREO, payload=b''):
+    header = bytes((0xFF, 0xFB, bitrate_index << 4, channel_mode))
+    body = payload + b'\x55' * (FRAME_SIZES[bitrate_index] - len(header) - len(payload))
+    return header + body
+
+def tag_frame(tag, channel_mode=STEREO):
+    """A frame that carries a Xing/Info tag after the side info, or a VBRI tag at offset 36."""
+    side_info = 17 if channel_mode == MONO else 32
+    offset = 32 if tag == b'VBRI' else side_info
+    return frame(channel_mode=channel_mode, payload=bytes(offset) + tag + bytes(12))
+
+def id3v2(size):
+    return b'ID3\x04\x00\x00' + bytes((size >> 21 & 0x7F, size >> 14 & 0x7F, size >> 7 & 0x7F, size & 0x7F)) + bytes(size)
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+def test_skips_id3v2_and_trailing_id3v1_tags(tmp_path):
+    tag = id3v2(100)
+    path = write(tmp_path, 'tagged.mp3', tag + frame() * 10 + b'TAG' + bytes(125))
+
+    stream = read_stream(path)
+
+    assert stream.frames == 10
+    assert stream.ranges == [(len(tag), len(tag) + 10 * 417)]
+
+def test_resyncs_after_garbage_between_frames(tmp_path):
+    garbage = b'\xff\x00junk\xff\xfb' + bytes(30)
+    path = write(tmp_path, 'garbage.mp3', frame() * 3 + garbage + frame() * 4)
+
+    stream = read_stream(path)
+
+    assert stream.frames == 7
+    second = 3 * 417 + len(garbage)
+    assert stream.ranges == [(0, 3 * 417), (second, second + 4 * 417)]
+
+@pytest.mark.parametrize('tag, channel_mode', [(b'Xing', STEREO), (b'Info', MONO), (b'VBRI', STEREO)])
+def test_skips_vbr_header_frame(tmp_path, tag, channel_mode):
+    path = write(tmp_path, 'vbr.mp3', tag_frame(tag, channel_mode) + frame(channel_mode=channel_mode) * 5)
+
+    stream = read_stream(path)
+
+    assert stream.frames == 5
+    assert stream.ranges == [(417, 6 * 417)]
+
+def test_rejects_files_without_frames(tmp_path):
+    with pytest.raises(Mp3FormatError):
+        read_stream(write(tmp_path, 'text.mp3', b'not an mp3 file' * 100))
+
+def test_concat_writes_one_header_for_the_whole_stream(tmp_path):
+    first = write(tmp_path, 'a.mp3', tag_frame(b'Xing') + frame() * 20)
+    second = write(tmp_path, 'b.mp3', id3v2(50) + frame() * 30)
+    output = str(tmp_path / 'out.mp3')
+
+    duration = concat_mp3([first, second], output)
+
+    assert duration == pytest.approx(50 * SAMPLES_PER_FRAME / 44100)
+    merged = read_stream(output)
+    assert merged.frames == 50
+    with open(output, 'rb') as f:
+        data = f.read()
+    tag, _flags, frames, size = struct.unpack('>4sIII', data[36:52])
+    assert tag == b'Info'
+    assert frames == 50
+    assert size == len(data)
+
+def test_concat_marks_mixed_bitrates_as_vbr(tmp_path):
+    first = write(tmp_path, 'a.mp3', frame(0x9) * 4)
+    second = write(tmp_path, 'b.mp3', frame(0xD) * 4)
+    output = str(tmp_path / 'out.mp3')
+
+    concat_mp3([first, second], output)
+
+    with open(output, 'rb') as f:
+        assert f.read(40)[36:40] == b'Xing'
+
+def test_concat_rejects_mono_and_stereo_mix(tmp_path):
+    first = write(tmp_path, 'a.mp3', frame() * 4)
+    second = write(tmp_path, 'b.mp3', frame(channel_mode=MONO) * 4)
+
+    with pytest.raises(Mp3FormatError):
+        concat_mp3([first, second], str(tmp_path / 'out.mp3'))
+
+def stream(frames, frame_size):
+    return Mp3Stream('', [(0, frames * frame_size)], frames, 44100, SAMPLES_PER_FRAME, 3, 0, {0x9})
+
+def test_seek_table_follows_the_byte_offsets_of_each_file():
+    streams = [stream(100, 417), stream(100, 835)]
+    audio_bytes = 100 * 417 + 100 * 835
+    tag_length = 417
+    total = audio_bytes + tag_length
+
+    toc = _seek_table(streams, 200, audio_bytes, tag_length)
+
+    assert len(toc) == 100
+    assert toc == sorted(toc)
+    assert toc[0] == int(tag_length * 256 / total)
+    assert toc[25] == int((tag_length + 50 * 417) * 256 / total)
+    assert toc[50] == int((tag_length + 100 * 417) * 256 / total)
+    assert toc[75] == int((tag_length + 100 * 417 + 50 * 835) * 256 / total)
@@ -0,0 +1,71 @@
+from backend.downloader import existing_output
+from backend.playlist_sync import diff_playlists, load_snapshot, save_snapshot
+
+def videos(*ids):
+    return [(f"Title {video_id}", f"Artist {video_id}", video_id) for video_id in ids]
+
+def ids(entries):
+    return [video_id for _title, _artist, video_id in entries]
+
+def test_first_sync_adds_everything():
+    diff = diff_playlists(None, videos('a', 'b'))
+
+    assert ids(diff.added) == ['a', 'b']
+    assert not diff.removed and not diff.moved and not diff.renamed
+    assert diff.changed
+
+def test_unchanged_playlist():
+    diff = diff_playlists(videos('a', 'b', 'c'), videos('a', 'b', 'c'))
+
+    assert ids(diff.unchanged) == ['a', 'b', 'c']
+    assert not diff.changed
+
+def test_added_and_removed():
+    diff = diff_playlists(videos('a', 'b', 'c'), videos('a', 'c', 'd'))
+
+    assert ids(diff.added) == ['d']
+    assert ids(diff.removed) == ['b']
+    assert not diff.moved
+
+def test_moving_one_entry_to_the_end_moves_only_that_entry():
+    diff = diff_playlists(videos('a', 'b', 'c', 'd', 'e'), videos('b', 'c', 'd', 'e', 'a'))
+
+    assert ids(diff.moved) == ['a']
+    assert ids(diff.unchanged) == ['b', 'c', 'd', 'e']
+
+def test_reversed_playlist_keeps_one_entry_in_place():
+    diff = diff_playlists(videos('a', 'b', 'c', 'd'), videos('d', 'c', 'b', 'a'))
+
+    assert len(diff.moved) == 3
+    assert len(diff.unchanged) == 1
+
+def test_renamed_entry_is_not_moved():
+    old = videos('a', 'b')
+    new = [old[0], ("New title", "Artist b", 'b')]
+
+    diff = diff_playlists(old, new)
+
+    assert ids(diff.renamed) == ['b']
+    assert not diff.moved
+    assert ids(diff.unchanged) == ['a']
+
+def test_duplicate_entries_are_matched_one_to_one():
+    diff = diff_playlists(videos('a', 'b', 'a'), videos('a', 'b'))
+
+    assert ids(diff.removed) == ['a']
+    assert not diff.added and not diff.moved
+
+def test_snapshot_round_trip(tmp_path):
+    save_snapshot('PL1', 'Playlist', videos('a', 'b'), snapshot_dir=str(tmp_path))
+
+    assert load_snapshot('PL1', snapshot_dir=str(tmp_path)) == videos('a', 'b')
+    assert load_snapshot('PL2', snapshot_dir=str(tmp_path)) is None
+
+def test_existing_output_finds_single_file_or_first_volume(tmp_path):
+    assert existing_output('Playlist', str(tmp_path), 'mp3') is None
+
+    (tmp_path / 'Playlist - Vol. 1.mp3').write_bytes(b'')
+    assert existing_output('Playlist', str(tmp_path), 'mp3') == str(tmp_path / 'Playlist - Vol. 1.mp3')
+
+    (tmp_path / 'Playlist.mp3').write_bytes(b'')
+    assert existing_output('Playlist', str(tmp_path), 'mp3') == str(tmp_path / 'Playlist.mp3')
@@ -0,0 +1,122 @@
+import threading
+
+import pytest
+
+from backend import rate_limit
+from backend.rate_limit import DECREASE_INTERVAL, ERROR_PERMANENT, ERROR_THROTTLED, ERROR_TRANSIENT, AdaptiveLimiter, backoff_delay, classify_error
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, 'time', clock)
+    return clock
+
+@pytest.mark.parametrize('error, kind', [
+    (Exception("ERROR: HTTP Error 429: Too Many Requests"), ERROR_THROTTLED),
+    (Exception("Sign in to confirm you're not a bot"), ERROR_THROTTLED),
+    (TimeoutError("read"), ERROR_TRANSIENT),
+    (Exception("HTTP Error 503: Service Unavailable"), ERROR_TRANSIENT),
+    (Exception("Connection reset by peer"), ERROR_TRANSIENT),
+    (Exception("Video unavailable. This video is private"), ERROR_PERMANENT),
+])
+def test_classify_error(error, kind):
+    assert classify_error(error) == kind
+
+def test_backoff_delay_is_capped():
+    assert all(0 <= backoff_delay(attempt, base=1.0, cap=5.0) <= 5.0 for attempt in range(20))
+
+def test_failures_halve_the_limit(clock):
+    limiter = AdaptiveLimiter(8)
+
+    limiter.failure(ERROR_TRANSIENT)
+
+    assert limiter.limit == 4
+
+def test_burst_of_failures_halves_once_per_cooldown(clock):
+    limiter = AdaptiveLimiter(8)
+
+    for _ in range(5):
+        limiter.failure(ERROR_TRANSIENT)
+    assert limiter.limit == 4
+
+    clock.now += DECREASE_INTERVAL
+    limiter.failure(ERROR_TRANSIENT)
+    assert limiter.limit == 2
+
+def test_limit_never_drops_below_minimum(clock):
+    limiter = AdaptiveLimiter(2, min_limit=1)
+
+    for _ in range(4):
+        limiter.failure(ERROR_TRANSIENT)
+        clock.now += DECREASE_INTERVAL
+
+    assert limiter.limit == 1
+
+def test_permanent_errors_keep_the_limit(clock):
+    limiter = AdaptiveLimiter(8)
+
+    limiter.failure(ERROR_PERMANENT)
+
+    assert limiter.limit == 8
+
+def test_successes_raise_the_limit_by_one_per_window(clock):
+    limiter = AdaptiveLimiter(8, initial=2)
+
+    limiter.success(1.0, 1000)
+    assert limiter.limit == 2
+    limiter.success(1.0, 1000)
+    assert limiter.limit == 3
+    for _ in range(3):
+        limiter.success(1.0, 1000)
+    assert limiter.limit == 4
+
+def test_limit_stays_at_maximum(clock):
+    limiter = AdaptiveLimiter(3)
+
+    for _ in range(10):
+        limiter.success(1.0, 1000)
+
+    assert limiter.limit == 3
+
+def test_sharp_throughput_drop_halves_the_limit(clock):
+    limiter = AdaptiveLimiter(8)
+
+    limiter.success(1.0, 100000)
+    limiter.success(1.0, 1000)
+
+    assert limiter.limit == 4
+
+def test_throttling_pauses_new_downloads(clock):
+    limiter = AdaptiveLimiter(4)
+    canceled = threading.Event()
+    canceled.set()
+
+    limiter.failure(ERROR_THROTTLED)
+
+    assert limiter.limit == 2
+    assert limiter._paused_until >= clock.now
+    limiter.wait_for_pause()
+    assert limiter.acquire() is True
+    limiter.release()
+    assert limiter.acquire(canceled) is False
+
+def test_acquire_respects_the_limit(clock):
+    limiter = AdaptiveLimiter(2)
+    canceled = threading.Event()
+
+    assert limiter.acquire(canceled) and limiter.acquire(canceled)
+    canceled.set()
+    assert limiter.acquire(canceled) is False
+    limiter.release()
+    with limiter.slot() as acquired:
+        assert acquired
@@ -0,0 +1,76 @@
+import subprocess
+
+import pytest
+
+from backend import downloader
+from backend.library_index import configure_library_index
+from backend.mp3_concat import read_stream
+from backend.stream_merge import StreamingMerger
+from backend.track_store import configure_track_store
+
+# MPEG-1 Layer III, 128 kbit/s, no CRC; the sample rate index selects 44.1 or 48 kHz.
+FRAMES = {
+    44100: bytes((0xFF, 0xFB, 0x90, 0x00)) + b'\x55' * 413,
+    48000: bytes((0xFF, 0xFB, 0x94, 0x00)) + b'\x55' * 380,
+}
+
+@pytest.fixture(autouse=True)
+def stores(tmp_path):
+    configure_track_store(str(tmp_path / 'store'))
+    configure_library_index(str(tmp_path / 'library.sqlite3'))
+
+def write_tracks(tmp_path, sample_rates):
+    tracks = []
+    for number, sample_rate in enumerate(sample_rates):
+        path = tmp_path / f'track{number}.mp3'
+        path.write_bytes(FRAMES[sample_rate] * 10)
+        tracks.append((f"Title {number}", "Artist", f'video{number}', str(path)))
+    return tracks
+
+def merge(tmp_path, tracks):
+    merger = StreamingMerger('Playlist', str(tmp_path / 'output'), 'mp3', 'mp3', 'PL1')
+    try:
+        for _video in merger.track_order(track[:3] for track in tracks):
+            pass
+        for _title, _artist, video_id, path in tracks:
+            merger.track_ready(video_id, path)
+        return merger.finish()
+    finally:
+        merger.abort()
+
+def test_matching_tracks_are_streamed(tmp_path):
+    tracks = write_tracks(tmp_path, [44100, 44100])
+
+    output = merge(tmp_path, tracks)
+
+    assert read_stream(output).frames == 20
+
+def test_mixed_sample_rates_are_merged_by_ffmpeg(tmp_path, monkeypatch):
+    concatenated = []
+
+    def fake_ffmpeg(args, cancel_event=None):
+        with open(args[args.index('-i') + 1], encoding='utf-8') as f:
+            concatenated.extend(line.strip() for line in f)
+        with open(args[-1], 'wb') as f:
+            f.write(FRAMES[44100])
+
+    monkeypatch.setattr(downloader, '_run_ffmpeg', fake_ffmpeg)
+    tracks = write_tracks(tmp_path, [44100, 48000, 44100])
+
+    output = merge(tmp_path, tracks)
+
+    assert output is not None
+    assert concatenated == [f"file '{path}'" for *_video, path in tracks]
+    assert not any((tmp_path / f'track{number}.mp3').exists() for number in range(3))
+
+def test_failed_fallback_keeps_the_tracks(tmp_path, monkeypatch):
+    def failing_ffmpeg(args, cancel_event=None):
+        raise subprocess.CalledProcessError(1, args)
+
+    monkeypatch.setattr(downloader, '_run_ffmpeg', failing_ffmpeg)
+    tracks = write_tracks(tmp_path, [44100, 48000, 44100])
+
+    output = merge(tmp_path, tracks)
+
+    assert output is None
+    assert all((tmp_path / f'track{number}.mp3').exists() for number in range(3))